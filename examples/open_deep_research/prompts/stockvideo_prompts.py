@@ -469,3 +469,38 @@ You're a helpful agent.
   {{task}}
   ---
 """
+
+# Batch chart planning prompt (one call per paragraph instead of one agent run per sentence prefix)
+GRAPH_MARK_BATCH_PROMPT = """
+# Paragraph-level Technical Chart Planning
+
+You plan the technical analysis charts for one paragraph of a stock video script.
+The paragraph is shown line by line. While a line is on screen, the video shows one chart.
+Return one chart specification per line.
+
+## Rules:
+1. Return EXACTLY one entry per line, in line order, with the line number in the "line" field.
+2. Each line's chart shows the technical elements mentioned in that line AND in the earlier lines of the
+   paragraph (the chart builds up as the narration progresses). If a line mentions nothing new, repeat the
+   previous line's chart.
+3. Include ONLY elements that are explicitly mentioned in the text:
+   - Support levels -> "support_level", resistance levels -> "resistance_level" (comma-separated prices)
+   - Specific dates or times -> the highlight parameter listed below
+   - Moving averages, RSI, Bollinger Bands -> the matching show_* flag set to true
+4. NEVER use Bollinger Band or moving average values as support or resistance levels.
+5. When a date is mentioned without a year (e.g., "March 21" or "3월 21일"), use the year 2025.
+6. "tickers" is required in every entry.
+
+## Chart parameters:
+{parameters}
+
+## Output format:
+Return ONLY a JSON array, with no other text. Example for a two-line paragraph:
+[
+  {{"line": 1, "tickers": "NVDA", "support_level": "117,115", "resistance_level": "122"}},
+  {{"line": 2, "tickers": "NVDA", "support_level": "117,115", "resistance_level": "122", "show_rsi": true}}
+]
+
+## Paragraph:
+{lines}
+"""
@@ -0,0 +1,49 @@
+"""
+서로 의존하지 않는 에이전트 실행을 동시에 처리하는 도우미
+
+stock_analysis_video.main의 중기/단기 스크립트 변환, 문단별 최종 스크립트 다듬기, 중기/단기 차트
+마킹은 같은 입력을 받지만 서로의 결과를 쓰지 않는데도 차례로 실행되어, 대부분의 시간을 LLM 응답을
+기다리는 데 썼습니다. run_parallel은 이런 호출들을 스레드 풀에서 동시에 실행하고 결과를 입력 순서대로
+돌려주므로, 호출하는 쪽에서는 순차 실행과 같은 결과를 얻습니다.
+
+에이전트는 실행 중에 메모리(대화 기록)를 갖고 있으므로 작업마다 에이전트를 새로 만들어야 합니다.
+(한 에이전트 인스턴스를 여러 스레드에서 동시에 run하지 않음)
+작업은 호출한 쪽의 실행(RunContext) 안에서 실행되므로 도구가 만드는 파일도 같은 작업 디렉토리에 저장됩니다.
+
+환경 변수:
+- AGENT_MAX_CONCURRENCY: 동시에 실행할 에이전트 수 (기본값: 4)
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .run_context import bind_run_context
+
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "4"))
+
+
+def run_parallel(tasks, max_workers=None, label="agent tasks"):
+    """
+    인자 없는 함수들을 동시에 실행하고 결과를 입력 순서대로 반환합니다.
+
+    Args:
+        tasks (list[callable]): 실행할 작업 (각 작업은 자기 에이전트를 직접 만들어 사용)
+        max_workers (int): 동시에 실행할 작업 수 (기본값: AGENT_MAX_CONCURRENCY)
+        label (str): 로그에 표시할 작업 이름
+
+    Returns:
+        list: tasks와 같은 순서의 결과. 작업이 하나라도 실패하면 (입력 순서상 첫 번째) 예외를 전달
+    """
+    if not tasks:
+        return []
+    max_workers = max(1, min(max_workers or DEFAULT_MAX_CONCURRENCY, len(tasks)))
+    print(f"Running {len(tasks)} {label} with up to {max_workers} at a time...")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(bind_run_context(task)) for task in tasks]
+        results = [future.result() for future in futures]
+    print(f"Finished {len(tasks)} {label} in {time.perf_counter() - start:.1f}s")
+    return results
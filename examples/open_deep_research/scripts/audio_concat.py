@@ -0,0 +1,43 @@
+"""
+대사별 음성 파일을 하나의 오디오 파일로 이어붙이는 도우미
+
+팟캐스트는 대사마다 AudioSegment.from_mp3로 MP3 전체를 디코딩해 메모리에 올리고 combined +=로
+이어붙였는데, 이어붙일 때마다 커진 버퍼 전체를 복사하므로 시간과 메모리가 에피소드 길이의 제곱에
+비례해 늘었고, 마지막 export에서 다시 전체를 인코딩했습니다.
+
+concat_audio는 ffmpeg concat demuxer로 대사 파일들을 스트림 단위로 차례로 읽어 한 번만 인코딩합니다.
+파일을 메모리에 올리지 않으므로 메모리 사용량은 일정하고 시간은 길이에 비례합니다.
+(대사 파일들은 같은 TTS 백엔드가 만든 같은 형식이어야 합니다)
+"""
+
+import os
+import subprocess
+import tempfile
+import time
+
+from .ffmpeg_utils import FFMPEG_BINARY, write_concat_list
+
+
+def concat_audio(audio_paths, output_path, bitrate="128k"):
+    """
+    오디오 파일들을 순서대로 이어붙여 MP3 하나로 인코딩합니다.
+
+    Args:
+        audio_paths (list[str]): 이어붙일 오디오 파일 (재생 순서)
+        output_path (str): 저장할 MP3 경로
+        bitrate (str): MP3 비트레이트
+    """
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="audio_concat_") as list_dir:
+        list_path = write_concat_list(audio_paths, os.path.join(list_dir, "audio.txt"))
+        subprocess.run(
+            [
+                FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-vn", "-c:a", "libmp3lame", "-b:a", bitrate,
+                output_path,
+            ],
+            check=True,
+        )
+    print(f"Joined {len(audio_paths)} audio files into {output_path} in {time.perf_counter() - start:.1f}s")
+    return output_path
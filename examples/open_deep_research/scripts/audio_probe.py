@@ -0,0 +1,144 @@
+"""
+오디오 파일 헤더만 읽어 길이를 구하는 도우미
+
+자막(SRT) 시간과 클립 길이를 계산하려고 세그먼트 MP3마다 moviepy AudioFileClip을 열면 파일마다
+ffmpeg 리더 프로세스가 뜨고 파일 핸들이 끝까지 열려 있습니다. probe_duration은 오디오를
+디코딩하지 않고 헤더만 읽습니다.
+- MP3: 첫 프레임의 Xing/Info/VBRI 헤더에 기록된 프레임 수를 사용하고, 없으면 프레임 헤더를 따라가며
+  프레임 수를 셉니다. 길이 = 프레임 수 * 프레임당 샘플 수 / 샘플레이트
+- WAV: fmt 청크의 초당 바이트 수와 data 청크 크기로 계산합니다.
+"""
+
+import os
+import struct
+
+
+# 비트레이트 표 (kbps) - [MPEG1 여부][레이어]
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# 샘플레이트 표 - 버전 비트(3: MPEG1, 2: MPEG2, 0: MPEG2.5)
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _parse_frame_header(data, pos):
+    """
+    pos 위치의 MP3 프레임 헤더를 해석합니다.
+
+    Returns:
+        (프레임 길이(바이트), 프레임당 샘플 수, 샘플레이트, MPEG1 여부, 모노 여부) 또는 헤더가 아니면 None
+    """
+    if pos + 4 > len(data):
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    mono = (b3 >> 6) & 0x03 == 3
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, mpeg1, mono
+    samples = 1152 if layer == 2 or mpeg1 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate, mpeg1, mono
+
+
+def _skip_id3v2(data):
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size + (10 if data[5] & 0x10 else 0)
+    return 0
+
+
+def _find_first_frame(data, pos):
+    # 헤더 뒤에 이어지는 프레임까지 확인해 데이터 속의 우연한 0xFF 바이트를 걸러냄
+    while pos < len(data) - 4:
+        header = _parse_frame_header(data, pos)
+        if header and (pos + header[0] >= len(data) or _parse_frame_header(data, pos + header[0])):
+            return pos, header
+        pos += 1
+    return None, None
+
+
+def mp3_duration(path):
+    """MP3 파일의 길이(초)를 프레임 헤더로 계산합니다."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    pos, header = _find_first_frame(data, _skip_id3v2(data))
+    if header is None:
+        raise ValueError(f"MP3 프레임을 찾을 수 없습니다: {path}")
+    frame_length, samples, sample_rate, mpeg1, mono = header
+
+    # Xing/Info(CBR/VBR 공통) 또는 VBRI 헤더에 전체 프레임 수가 기록되어 있으면 그대로 사용
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = pos + 4 + side_info
+    if data[xing : xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4 : xing + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", data[xing + 8 : xing + 12])[0]
+            return frames * samples / sample_rate
+    vbri = pos + 4 + 32
+    if data[vbri : vbri + 4] == b"VBRI":
+        frames = struct.unpack(">I", data[vbri + 14 : vbri + 18])[0]
+        return frames * samples / sample_rate
+
+    # 정보 헤더가 없으면 프레임 헤더를 따라가며 셈 (오디오 데이터는 디코딩하지 않음)
+    frames = 0
+    while header is not None:
+        frames += 1
+        pos += header[0]
+        header = _parse_frame_header(data, pos)
+    return frames * samples / sample_rate
+
+
+def wav_duration(path):
+    """WAV 파일의 길이(초)를 RIFF 헤더로 계산합니다."""
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise ValueError(f"WAV 파일이 아닙니다: {path}")
+        byte_rate = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError(f"WAV data 청크를 찾을 수 없습니다: {path}")
+            chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                byte_rate = struct.unpack("<I", fmt[8:12])[0]
+                if chunk_size % 2:
+                    f.read(1)
+            elif chunk_id == b"data":
+                # 스트리밍으로 받은 WAV는 data 크기가 0xFFFFFFFF(미정)일 수 있으므로 파일 크기로 보정
+                available = os.path.getsize(path) - f.tell()
+                if byte_rate is None:
+                    raise ValueError(f"WAV fmt 청크가 data 청크보다 뒤에 있습니다: {path}")
+                return min(chunk_size, available) / byte_rate
+            else:
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def probe_duration(path):
+    """
+    오디오 파일의 길이(초)를 디코딩하지 않고 헤더로 계산합니다. (MP3, WAV)
+    """
+    with open(path, "rb") as f:
+        magic = f.read(12)
+    if magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+        return wav_duration(path)
+    return mp3_duration(path)
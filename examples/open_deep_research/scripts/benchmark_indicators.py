@@ -0,0 +1,106 @@
+"""
+indicators.compute_indicators와 기존 ta 라이브러리 계산 방식을 비교하는 스크립트
+
+1. 수치 동등성 검사: 여러 종류의 가격 시계열에서 두 방식의 결과가 같은지 확인
+2. 속도 비교: 도구들이 실제로 쓰는 길이(15일 시간봉, 150/250일 일봉)로 반복 실행 시간 측정
+
+사용법 (examples/open_deep_research 디렉토리에서):
+    python -m scripts.benchmark_indicators --repeat 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import ta
+
+from .indicators import compute_indicators
+
+
+SMA_WINDOWS = (5, 20, 60, 120)
+
+
+def compute_with_ta(close_series):
+    """기존 도구들과 같은 방식으로 ta 지표를 하나씩 계산합니다."""
+    columns = {}
+    for window in SMA_WINDOWS:
+        columns[f"SMA{window}"] = ta.trend.SMAIndicator(close=close_series, window=window).sma_indicator()
+    columns["RSI"] = ta.momentum.RSIIndicator(close=close_series, window=14).rsi()
+    bollinger = ta.volatility.BollingerBands(close=close_series, window=20, window_dev=2)
+    columns["BB_High"] = bollinger.bollinger_hband()
+    columns["BB_Middle"] = bollinger.bollinger_mavg()
+    columns["BB_Low"] = bollinger.bollinger_lband()
+    return columns
+
+
+def make_price_series(kind, n, seed=0):
+    """테스트용 가격 시계열 생성"""
+    rng = np.random.default_rng(seed)
+    if kind == "random_walk":
+        values = 100 + np.cumsum(rng.normal(0, 1, n))
+    elif kind == "krw":  # 원화 종목처럼 큰 가격
+        values = 70000 + np.cumsum(rng.normal(0, 500, n))
+    elif kind == "penny":  # 아주 작은 가격
+        values = 0.5 + np.abs(np.cumsum(rng.normal(0, 0.01, n)))
+    elif kind == "flat":  # 변화가 없는 구간 (RSI 분모 0)
+        values = np.full(n, 42.0)
+    elif kind == "rising":  # 하락이 전혀 없는 구간
+        values = np.linspace(10, 20, n)
+    else:
+        raise ValueError(f"Unknown series kind: {kind}")
+    index = pd.date_range("2024-01-01", periods=n, freq="D")
+    return pd.Series(values, index=index, name="Close")
+
+
+def check_equivalence(rtol=1e-9, atol=1e-7):
+    """두 방식의 결과가 같은지 확인하고, 다르면 AssertionError를 발생시킵니다."""
+    checked = 0
+    for kind in ["random_walk", "krw", "penny", "flat", "rising"]:
+        for n in [1, 5, 14, 20, 60, 105, 150, 250, 1000]:
+            close_series = make_price_series(kind, n, seed=n)
+            expected = compute_with_ta(close_series)
+            actual = compute_indicators(close_series.to_numpy(), sma_windows=SMA_WINDOWS).columns()
+            for name, expected_values in expected.items():
+                np.testing.assert_allclose(
+                    actual[name],
+                    expected_values.to_numpy(dtype=float),
+                    rtol=rtol,
+                    atol=atol,
+                    equal_nan=True,
+                    err_msg=f"{name} mismatch for {kind} series of length {n}",
+                )
+                checked += 1
+    print(f"Equivalence check passed ({checked} indicator series compared)")
+
+
+def benchmark(repeat):
+    """도구들이 실제로 쓰는 데이터 길이에서 두 방식의 실행 시간을 비교합니다."""
+    print(f"{'bars':>6} | {'ta (ms)':>10} | {'numpy (ms)':>10} | {'speedup':>8}")
+    for n in [105, 150, 250, 1000]:
+        close_series = make_price_series("random_walk", n)
+        close = close_series.to_numpy()
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            compute_with_ta(close_series)
+        ta_ms = (time.perf_counter() - start) / repeat * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            compute_indicators(close, sma_windows=SMA_WINDOWS)
+        numpy_ms = (time.perf_counter() - start) / repeat * 1000
+
+        print(f"{n:>6} | {ta_ms:>10.3f} | {numpy_ms:>10.3f} | {ta_ms / numpy_ms:>7.1f}x")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=100, help="벤치마크 반복 횟수")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    check_equivalence()
+    benchmark(args.repeat)
@@ -0,0 +1,168 @@
+"""
+음성 이후의 영상/팟캐스트 조립 과정(음성 합성 -> 타임라인 -> 인코딩 -> 이어붙이기)을 측정하는 스크립트
+
+LocalTTSBackend로 텍스트 길이에 비례한 음성을 만들기 때문에 네트워크와 API 비용 없이 항상 같은
+입력으로 측정할 수 있습니다. 차트 이미지도 PIL로 미리 만들어 두므로 에이전트는 실행하지 않습니다.
+
+1. stream: stock_analysis_video.main의 ffmpeg 경로와 같은 StreamingVideoPipeline
+2. batch: 모든 음성을 먼저 합성한 뒤 문단 조각을 render_video로 인코딩 (create_investment_video와 같은 순서)
+3. podcast: 스크립트의 각 라인을 두 진행자가 번갈아 읽는 대사로 합성한 뒤 concat_audio로 이어붙임
+   (stock_podcast.main과 같은 순서)
+
+사용법 (examples/open_deep_research 디렉토리에서):
+    python -m scripts.benchmark_media --paragraphs 8 --mode stream batch podcast
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from .audio_concat import concat_audio
+from .chart_manifest import ChartManifest
+from .run_context import RunContext, run_path, use_run_context
+from .tts import LocalTTSBackend, SpeechSegment, synthesize_segments
+from .video_pipeline import StreamingVideoPipeline, group_paragraphs, plan_script_lines
+from .video_render import TimelineEntry, render_video
+
+
+# 고정 스크립트 - 문단을 반복해 원하는 길이로 늘림 (문단 사이는 빈 줄)
+SCRIPT_PARAGRAPHS = [
+    "애플의 중기 추세를 살펴보겠습니다.\n"
+    "주가는 120일 이동평균선 위에서 움직이고 있고, 20일선이 60일선을 상향 돌파했습니다.\n"
+    "RSI는 58로 과열 구간에는 아직 들어서지 않았습니다.",
+    "거래량은 최근 두 달 평균보다 조금 늘었습니다.\n"
+    "볼린저 밴드 상단에 가까워지면서, 단기 조정 가능성도 함께 보입니다.",
+    "단기 흐름을 보면 시간봉 기준으로 5일선 지지가 이어지고 있습니다.\n"
+    "다만 장 마감 직전 매도 물량이 늘어나는 모습입니다.\n"
+    "다음 주 실적 발표 전까지는 변동성에 유의해야 합니다.",
+]
+
+
+def make_script(paragraphs):
+    """고정 문단을 반복해 paragraphs개 문단의 자막 스크립트를 만듭니다."""
+    return "\n\n".join(SCRIPT_PARAGRAPHS[i % len(SCRIPT_PARAGRAPHS)] for i in range(paragraphs)) + "\n\n"
+
+
+def make_chart_manifest(workdir, subtitle_script, size=(1280, 720)):
+    """라인마다 차트 이미지를 하나씩 그려 렌더링 완료 상태로 기록한 ChartManifest를 만듭니다."""
+    manifest = ChartManifest(path=os.path.join(workdir, "chart_manifest.jsonl"), prefix="chart", reset=True)
+    lines = [line for line in subtitle_script.split("\n") if line.strip()]
+    for i in range(len(lines)):
+        manifest.set_context(section="bench", paragraph=0, line=i)
+        filename, index = manifest.allocate(ticker="BENCH", interval="1d")
+        image = Image.new("RGB", size, (20 + index * 37 % 200, 40, 80))
+        ImageDraw.Draw(image).rectangle([100, 100, 100 + index * 29 % 1000, 600], fill=(230, 230, 230))
+        image.save(filename)
+        manifest.mark(filename, "rendered")
+    manifest.clear_context()
+    manifest.mark_ready()
+    return manifest
+
+
+def run_stream(tts_backend, chart_manifest, subtitle_script, output_path, encode_workers=None):
+    pipeline = StreamingVideoPipeline(tts_backend, chart_manifest, encode_workers=encode_workers)
+    pipeline.start(lambda: (subtitle_script, subtitle_script))
+    pipeline.finish(output_path)
+
+
+def run_batch(tts_backend, chart_manifest, subtitle_script, output_path, encode_workers=None, video_backend=None):
+    plans = plan_script_lines(subtitle_script, subtitle_script)
+    segments = {
+        plan.index: [
+            SpeechSegment(text=text, path=run_path(f"audio_{plan.index}_{j}.mp3"))
+            for j, text in enumerate(plan.audio_segments)
+        ]
+        for plan in plans
+    }
+    synthesize_segments(tts_backend, [segment for line in segments.values() for segment in line])
+
+    chunks = []
+    for paragraph in group_paragraphs(plans, subtitle_script):
+        chunk = []
+        for plan in paragraph:
+            image_path = chart_manifest.chart_for_line(plan.index)
+            for segment, subtitle in zip(segments[plan.index], plan.subtitle_segments):
+                chunk.append(TimelineEntry(image_path, segment.path, segment.duration, subtitle))
+        chunks.append(chunk)
+    try:
+        render_video(chunks, output_path, backend=video_backend, max_workers=encode_workers)
+    finally:
+        for line in segments.values():
+            for segment in line:
+                if os.path.exists(segment.path):
+                    os.remove(segment.path)
+
+
+def run_podcast(tts_backend, subtitle_script, output_path):
+    lines = [line for line in subtitle_script.split("\n") if line.strip()]
+    segments = [
+        SpeechSegment(text=line, path=run_path(f"temp_speech_{i}.mp3"), voice=["nova", "onyx"][i % 2], model="tts-1")
+        for i, line in enumerate(lines)
+    ]
+    try:
+        concat_audio(synthesize_segments(tts_backend, segments), output_path)
+    finally:
+        for segment in segments:
+            if os.path.exists(segment.path):
+                os.remove(segment.path)
+
+
+def benchmark(modes, paragraphs, repeat, encode_workers=None, video_backend=None, keep=False):
+    subtitle_script = make_script(paragraphs)
+    tts_backend = LocalTTSBackend()
+    plans = plan_script_lines(subtitle_script, subtitle_script)
+    media_seconds = sum(tts_backend.duration_for(text) for plan in plans for text in plan.audio_segments)
+    print(f"Script: {paragraphs} paragraphs, {len(plans)} lines, {media_seconds:.1f}s of speech")
+
+    workdir = tempfile.mkdtemp(prefix="benchmark_media_")
+    try:
+        # 측정 파일은 모두 임시 실행 작업 디렉토리에 만듦 (현재 작업 디렉토리는 바꾸지 않음)
+        with use_run_context(RunContext("benchmark", root=workdir)) as context:
+            chart_manifest = make_chart_manifest(context.dir, subtitle_script)
+            results = []
+            for mode in modes:
+                for i in range(repeat):
+                    output_path = run_path(f"{mode}_{i}.mp3" if mode == "podcast" else f"{mode}_{i}.mp4")
+                    start = time.perf_counter()
+                    if mode == "podcast":
+                        run_podcast(tts_backend, subtitle_script, output_path)
+                    elif mode == "stream":
+                        run_stream(tts_backend, chart_manifest, subtitle_script, output_path, encode_workers)
+                    else:
+                        run_batch(
+                            tts_backend, chart_manifest, subtitle_script, output_path, encode_workers, video_backend
+                        )
+                    results.append((mode, i, time.perf_counter() - start))
+    finally:
+        if keep:
+            print(f"Kept benchmark files in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'mode':>8} | {'run':>4} | {'seconds':>8} | {'x realtime':>10}")
+    for mode, i, seconds in results:
+        print(f"{mode:>8} | {i:>4} | {seconds:>8.2f} | {media_seconds / seconds:>9.1f}x")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--mode", nargs="+", choices=["stream", "batch", "podcast"], default=["stream", "batch", "podcast"]
+    )
+    parser.add_argument("--paragraphs", type=int, default=6, help="고정 스크립트 문단 수")
+    parser.add_argument("--repeat", type=int, default=1, help="방식별 반복 횟수")
+    parser.add_argument("--encode-workers", type=int, default=None, help="동시에 인코딩할 문단 조각 수")
+    parser.add_argument(
+        "--video-backend", choices=["ffmpeg", "moviepy"], default=None, help="batch 방식의 인코딩 방식"
+    )
+    parser.add_argument("--keep", action="store_true", help="측정에 쓴 파일과 영상을 지우지 않음")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    benchmark(args.mode, args.paragraphs, args.repeat, args.encode_workers, args.video_backend, args.keep)
@@ -0,0 +1,248 @@
+"""
+실행(run) 단위의 차트 매니페스트
+
+차트 표시 도구는 technical_analysis0.png, 1.png, ...를 하나씩 os.path.exists로 확인하며
+빈 파일 이름을 찾는 대신, 이 매니페스트의 카운터에서 다음 번호를 받습니다.
+- 번호 할당은 잠금 안에서 카운터를 하나 올리는 O(1) 연산이라, 여러 렌더링이 동시에 진행되어도
+  같은 파일 이름을 두 번 받지 않습니다.
+- 각 차트는 어느 문단/라인을 위해 만들어졌는지 함께 기록되므로, 영상 제작 단계에서는 파일
+  이름을 추측하지 않고 라인에 해당하는 차트를 매니페스트에서 찾습니다.
+
+매니페스트는 JSON Lines 로그 파일로 저장됩니다. 번호 할당, 렌더링 결과 기록, 라인 기록 삭제마다
+레코드 한 줄만 덧붙이므로 차트 하나를 기록하는 비용이 지금까지 만든 차트 수와 관계없이 일정합니다.
+(매번 전체 목록을 다시 쓰면 차트 n개짜리 영상에서 디스크 쓰기가 n²에 비례해 늘어남)
+같은 파일을 다시 열면 로그를 처음부터 재생해 카운터와 기록을 이어서 사용하고, 재생한 상태를
+한 번 압축해 다시 씁니다(임시 파일에 쓴 뒤 교체). 중간에 끊겨 불완전한 마지막 줄은 무시합니다.
+차트 파일은 할당한 실행(RunContext)의 작업 디렉토리에 만들어집니다.
+
+스트리밍 영상 파이프라인에서는 차트 마킹이 끝난 라인까지를 mark_ready로 알리고, 영상 쪽은
+wait_for_line으로 해당 라인의 차트가 준비될 때까지 기다린 뒤 문단을 인코딩합니다.
+
+환경 변수:
+- CHART_MANIFEST_PATH: 기본 매니페스트 파일 경로 (기본값: 현재 실행의 작업 디렉토리의 chart_manifest.jsonl)
+"""
+
+import json
+import os
+import threading
+import weakref
+
+from .run_context import current_run_context, run_path
+
+
+DEFAULT_MANIFEST_PATH = os.getenv("CHART_MANIFEST_PATH", "chart_manifest.jsonl")
+
+
+class ChartManifest:
+    """
+    차트 파일 번호를 할당하고, 차트별 (구간, 문단, 라인) 정보를 기록하는 매니페스트
+
+    Args:
+        path (str): 매니페스트 로그(JSON Lines) 파일 경로 (기본값: 현재 실행의 작업 디렉토리 기준 CHART_MANIFEST_PATH)
+        prefix (str): 차트 파일 이름 접두사 ({prefix}{번호}.png)
+        reset (bool): True면 기존 매니페스트를 무시하고 새로 시작
+    """
+
+    def __init__(self, path=None, prefix="technical_analysis", reset=False):
+        self.path = path or run_path(DEFAULT_MANIFEST_PATH)
+        self.prefix = prefix
+        self.next_index = 0
+        self.entries = []
+        self._by_filename = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self.ready_line = -1
+        self._ready_ranges = []
+        self._context = threading.local()
+
+        if not reset and os.path.exists(self.path):
+            try:
+                self._replay()
+            except OSError as e:
+                print(f"Failed to read chart manifest {self.path}: {str(e)}")
+        self._compact()
+
+    def set_context(self, section=None, paragraph=None, line=None):
+        """
+        현재 스레드에서 이후에 할당되는 차트가 속할 위치를 지정합니다.
+
+        Args:
+            section (str): 스크립트 구간 (예: "mid", "short")
+            paragraph (int): 구간 안의 문단 번호
+            line (int): 영상 전체 기준 라인 번호 (create_investment_video의 라인 순서)
+        """
+        self._context.value = {"section": section, "paragraph": paragraph, "line": line}
+
+    def clear_context(self):
+        self._context.value = None
+
+    def _apply(self, record):
+        """로그 레코드 하나를 메모리의 상태에 반영합니다."""
+        op = record["op"]
+        if op == "allocate":
+            entry = record["entry"]
+            self.entries.append(entry)
+            self._by_filename[entry["filename"]] = entry
+            self.next_index = max(self.next_index, entry["index"] + 1)
+        elif op == "mark":
+            entry = self._by_filename.get(record["filename"])
+            if entry is not None:
+                entry["status"] = record["status"]
+        elif op == "counter":
+            self.next_index = max(self.next_index, record["next_index"])
+        elif op == "discard":
+            first, last = record["first"], record["last"]
+            self.entries = [e for e in self.entries if e["line"] is None or not first <= e["line"] <= last]
+            self._by_filename = {e["filename"]: e for e in self.entries}
+
+    def _replay(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    # 기록 도중 끊긴 마지막 줄 등은 건너뜀
+                    continue
+
+    def _compact(self):
+        """
+        현재 상태를 카운터와 할당 레코드만으로 이루어진 로그로 다시 씁니다. (열 때 한 번만 호출)
+        기록이 지워진 차트의 번호도 다시 할당하지 않도록 카운터를 따로 기록합니다.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "counter", "next_index": self.next_index}) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps({"op": "allocate", "entry": entry}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def _append(self, record):
+        """레코드 한 줄을 로그 끝에 덧붙이고 상태에 반영합니다. (잠금 안에서 호출)"""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._apply(record)
+
+    def allocate(self, ticker=None, interval=None):
+        """
+        다음 차트 파일 이름과 번호를 할당하고 매니페스트에 기록합니다.
+
+        Returns:
+            (현재 실행의 작업 디렉토리 안의 파일 경로, 번호)
+        """
+        context = getattr(self._context, "value", None) or {}
+        with self._lock:
+            index = self.next_index
+            filename = run_path(f"{self.prefix}{index}.png")
+            entry = {
+                "index": index,
+                "filename": filename,
+                "ticker": ticker,
+                "interval": interval,
+                "section": context.get("section"),
+                "paragraph": context.get("paragraph"),
+                "line": context.get("line"),
+                "status": "pending",
+            }
+            self._append({"op": "allocate", "entry": entry})
+        return filename, index
+
+    def mark(self, filename, status):
+        """차트의 렌더링 결과("rendered" 또는 "failed")를 기록합니다."""
+        with self._lock:
+            self._append({"op": "mark", "filename": filename, "status": status})
+
+    def mark_ready(self, line=None, first=None):
+        """
+        line번 라인까지의 차트가 모두 렌더링되었음을 알립니다. (None이면 모든 라인)
+        first를 주면 first~line번 라인만 준비된 것으로 기록하고, 앞 라인들이 모두 준비되었을 때
+        ready_line을 넘겨줍니다. (중기/단기 구간의 차트를 동시에 마킹할 때 사용)
+        """
+        with self._ready:
+            if line is None:
+                self.ready_line = float("inf")
+            elif first is None:
+                self.ready_line = max(self.ready_line, line)
+            else:
+                self._ready_ranges.append((first, line))
+            # 이어지는 구간이 준비되어 있으면 ready_line을 계속 늘림
+            advanced = True
+            while advanced:
+                advanced = False
+                for ready_range in list(self._ready_ranges):
+                    if ready_range[0] <= self.ready_line + 1:
+                        self.ready_line = max(self.ready_line, ready_range[1])
+                        self._ready_ranges.remove(ready_range)
+                        advanced = True
+            self._ready.notify_all()
+
+    def wait_for_line(self, line, timeout=None):
+        """line번 라인까지의 차트가 준비될 때까지 기다립니다. 준비되면 True를 반환합니다."""
+        with self._ready:
+            return self._ready.wait_for(lambda: self.ready_line >= line, timeout=timeout)
+
+    def filenames_for_lines(self, first, last):
+        """first~last번 라인을 위해 렌더링된 차트 파일 이름 목록"""
+        with self._lock:
+            return [
+                e["filename"]
+                for e in self.entries
+                if e["status"] == "rendered" and e["line"] is not None and first <= e["line"] <= last
+            ]
+
+    def discard_lines(self, first, last):
+        """
+        first~last번 라인의 차트 기록을 지웁니다. (재실행 시 해당 문단의 차트를 다시 만들기 전에 호출)
+        """
+        with self._lock:
+            self._append({"op": "discard", "first": first, "last": last})
+
+    def rendered_entries(self):
+        with self._lock:
+            return [dict(entry) for entry in self.entries if entry["status"] == "rendered"]
+
+    def chart_for_line(self, line):
+        """
+        라인에 해당하는 차트 파일을 반환합니다.
+
+        한 라인에 여러 차트가 있으면 마지막 차트를 사용하고, 차트가 없는 라인은 직전 라인의
+        차트를 이어서 사용합니다. 앞선 라인에도 차트가 없으면 가장 먼저 만들어진 차트를 사용합니다.
+        """
+        entries = [e for e in self.rendered_entries() if os.path.exists(e["filename"])]
+        if not entries:
+            return None
+        located = [e for e in entries if e["line"] is not None and e["line"] <= line]
+        if located:
+            nearest = max(e["line"] for e in located)
+            return [e for e in located if e["line"] == nearest][-1]["filename"]
+        return entries[0]["filename"]
+
+    def remove(self):
+        """매니페스트 파일을 삭제합니다. (차트 파일은 그대로 둠)"""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+_default_manifest = None
+_run_manifests = weakref.WeakKeyDictionary()  # 실행(RunContext)별 기본 매니페스트 (실행이 끝나면 함께 정리됨)
+_default_manifest_lock = threading.Lock()
+
+
+def get_chart_manifest():
+    """
+    현재 실행의 기본 차트 매니페스트를 반환합니다.
+    실행마다 따로 만들어지므로 동시에 진행되는 실행끼리 차트 번호와 매니페스트 파일을 공유하지 않고,
+    지정된 실행이 없으면 프로세스 전체에서 공유하는 (현재 작업 디렉토리의) 매니페스트를 사용합니다.
+    """
+    global _default_manifest
+    context = current_run_context()
+    with _default_manifest_lock:
+        if context is None:
+            if _default_manifest is None:
+                _default_manifest = ChartManifest()
+            return _default_manifest
+        if context not in _run_manifests:
+            _run_manifests[context] = ChartManifest()
+        return _run_manifests[context]
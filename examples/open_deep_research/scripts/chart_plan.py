@@ -0,0 +1,118 @@
+"""
+문단 단위 배치 차트 계획
+
+기존 차트 마킹은 문단의 문장이 늘어날 때마다(ex[:1], ex[:2], ...) 누적 텍스트 전체를 차트 마킹 에이전트에
+넘겨서, 문장마다 LLM 호출 한 번과 차트 한 장이 생기고 프롬프트 길이는 문단 길이의 제곱에 비례했습니다.
+
+ChartPlanner는 문단 전체를 한 번의 모델 호출로 넘기고, 라인별 차트 사양(도구 인자: 티커, 강조 날짜,
+지지/저항선, 지표 표시 여부)을 JSON 목록으로 받습니다. 각 라인의 사양은 그 라인까지 문단에서 언급된
+요소를 누적해서 표시하므로 기존 누적 방식과 같은 차트가 만들어지며, 도구(Mid/ShortStockMarkTool)의
+forward_batch가 목록 전체를 한 번에 차트 대기열에 넣습니다. 영상 한 편의 LLM 호출 수가 문장 수에서
+문단 수로 줄어듭니다.
+"""
+
+import json
+import re
+
+
+class ChartPlanner:
+    """
+    문단 하나의 라인별 차트 사양을 한 번의 모델 호출로 만드는 계획기
+
+    Args:
+        model: messages(list[dict]) -> ChatMessage를 반환하는 모델 (예: LiteLLMModel)
+        tool: 차트를 만들 도구 (MidStockMarkTool 또는 ShortStockMarkTool). tool.inputs로 인자를 안내하고 검증
+        prompt_template (str): {parameters}, {lines} 자리가 있는 프롬프트 (GRAPH_MARK_BATCH_PROMPT)
+        max_attempts (int): 응답을 해석하지 못했을 때 다시 요청할 횟수
+    """
+
+    def __init__(self, model, tool, prompt_template, max_attempts=2):
+        self.model = model
+        self.tool = tool
+        self.prompt_template = prompt_template
+        self.max_attempts = max_attempts
+        self.calls = 0
+
+    def describe_parameters(self):
+        return "\n".join(
+            f'- "{name}" ({spec["type"]}): {spec["description"]}' for name, spec in self.tool.inputs.items()
+        )
+
+    def plan(self, lines):
+        """
+        문단의 라인별 차트 사양을 만듭니다.
+
+        Args:
+            lines (list[str]): 문단의 (빈 줄을 제외한) 라인
+
+        Returns:
+            list[dict]: 라인마다 하나씩, {"line": 문단 안의 라인 번호(0부터), 도구 인자...}
+        """
+        if not lines:
+            return []
+        prompt = self.prompt_template.format(
+            parameters=self.describe_parameters(),
+            lines="\n".join(f"{i + 1}: {line}" for i, line in enumerate(lines)),
+        )
+        messages = [{"role": "user", "content": prompt}]
+
+        error = None
+        for attempt in range(self.max_attempts):
+            self.calls += 1
+            response = self.model(messages)
+            try:
+                return self.parse(response.content, len(lines))
+            except ValueError as e:
+                error = e
+                print(f"Could not parse chart plan ({str(e)}), retrying ({attempt + 1}/{self.max_attempts})")
+        raise ValueError(f"차트 계획 응답을 해석할 수 없습니다: {str(error)}")
+
+    def parse(self, text, line_count):
+        """
+        모델 응답에서 JSON 목록을 꺼내 라인마다 하나의 도구 인자로 정리합니다.
+        - 도구에 없는 인자는 버리고, 목록 값은 쉼표 문자열로, "true"/"false" 문자열은 bool로 바꿈
+        - 응답에 빠진 라인은 앞 라인의 차트를 이어서 사용 (첫 라인부터 빠지면 그 라인들은 차트 없음)
+        """
+        match = re.search(r"\[.*\]", text or "", re.DOTALL)
+        if match is None:
+            raise ValueError("JSON 목록이 없습니다")
+        entries = json.loads(match.group(0))
+        if not isinstance(entries, list):
+            raise ValueError("응답이 목록이 아닙니다")
+
+        by_line = {}
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get("tickers"):
+                continue
+            try:
+                line = int(entry.get("line")) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= line < line_count:
+                by_line[line] = self._tool_arguments(entry)
+        if not by_line:
+            raise ValueError("티커가 있는 차트 사양이 없습니다")
+
+        plan = []
+        previous = None
+        for line in range(line_count):
+            arguments = by_line.get(line, previous)
+            if arguments is not None:
+                plan.append({"line": line, **arguments})
+            previous = arguments
+        return plan
+
+    def _tool_arguments(self, entry):
+        arguments = {}
+        for name, spec in self.tool.inputs.items():
+            value = entry.get(name)
+            if value is None:
+                continue
+            if spec["type"] == "boolean":
+                value = value if isinstance(value, bool) else str(value).strip().lower() == "true"
+            elif isinstance(value, (list, tuple)):
+                value = ",".join(str(v) for v in value)
+            else:
+                value = str(value)
+            arguments[name] = value
+        return arguments
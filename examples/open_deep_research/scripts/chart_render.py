@@ -0,0 +1,528 @@
+"""
+차트 표시 도구(Mid/ShortStockMarkTool)가 공유하는 기본 차트 렌더링 캐시
+
+그래프 마킹 에이전트는 문단의 문장이 늘어날 때마다 같은 종목 차트를 다시 그리는데,
+매번 mpf.plot으로 캔들/거래량/지표 패널 전체를 그리면 영상 하나에 (문장 수)^2 번의
+전체 렌더링이 발생합니다.
+
+이 모듈은 (티커, 봉 간격, 봉 구간, 지표 패널 구성) 단위로 기본 차트를 한 번만 그리고
+비트맵을 보관해 둡니다. 문장마다 바뀌는 이동평균선, 지지/저항선, 강조 마커는 보관한
+비트맵 위에 덧그리기(blitting)만 하므로, 차트 한 장을 만드는 비용이 선 몇 개를 그리는
+수준으로 줄어듭니다.
+
+덧그릴 값이 기본 차트의 y축 범위를 벗어나면(mpf.plot이라면 축 범위를 넓혔을 경우)
+결과가 달라지지 않도록 기존처럼 전체 차트를 다시 그립니다.
+
+차트 한 장은 ChartSpec(티커, 봉 간격, 표시할 지표, 지지/저항선, 강조 봉, 출력 파일)으로
+표현됩니다. 도구가 ChartQueue를 받으면 차트를 바로 그리지 않고 사양만 쌓아 두며,
+render_charts가 쌓인 사양을 작업자 프로세스(Agg 백엔드) 풀에서 나누어 그립니다.
+봉 데이터는 작업자마다 한 번만 전달하고, 출력 파일 이름은 사양을 쌓을 때 차트
+매니페스트(chart_manifest.py)에서 할당받으므로 실행 순서와 관계없이 결과가 같습니다.
+
+환경 변수:
+- CHART_CACHE_SIZE: 보관할 기본 차트 개수 (기본값: 16)
+- CHART_RENDER_WORKERS: 차트 렌더링 작업자 프로세스 수 (기본값: CPU 코어 수)
+"""
+
+import math
+import os
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+import matplotlib.pyplot as plt
+import mplfinance as mpf
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.lines import Line2D
+
+from .chart_manifest import get_chart_manifest
+
+
+DEFAULT_CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "16"))
+DEFAULT_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "0")) or os.cpu_count() or 1
+
+SUPPORT_COLOR = (0, 0, 1, 0.8)  # RGB 파란색에 80% 불투명도
+RESISTANCE_COLOR = (1, 0, 0, 0.8)  # RGB 빨간색에 80% 불투명도
+HIGHLIGHT_COLOR = (0, 0, 1, 0.1)
+
+
+@dataclass
+class OverlayLine:
+    """기본 차트 위에 덧그리는 지표 선 (예: 이동평균선). 범례에 표시됩니다."""
+
+    values: np.ndarray
+    color: str
+    label: str
+    width: float = 1
+    linestyle: str = "-"
+
+
+@dataclass
+class ChartOverlay:
+    """
+    문장마다 달라지는 차트 요소
+
+    - lines: 이동평균선처럼 범례에 표시되는 지표 선 (메인 패널)
+    - support_levels / resistance_levels: 지지선(파란색) / 저항선(빨간색) 가격
+    - highlight_points: (봉 위치, y값) 강조 마커 목록
+    """
+
+    lines: List[OverlayLine] = field(default_factory=list)
+    support_levels: List[float] = field(default_factory=list)
+    resistance_levels: List[float] = field(default_factory=list)
+    highlight_points: List[Tuple[int, float]] = field(default_factory=list)
+
+    def y_values(self):
+        """기본 차트의 y축 범위 안에 들어와야 하는 값들 (이동평균선은 종가 범위 안이므로 제외)"""
+        values = list(self.support_levels) + list(self.resistance_levels)
+        values += [y for _, y in self.highlight_points]
+        return [float(v) for v in values if not pd.isna(v)]
+
+    def addplots(self, n):
+        """
+        mpf.plot으로 전체 차트를 다시 그릴 때 쓰는 addplot 목록을 반환합니다.
+
+        Returns:
+            (지표 선 addplot 목록, 지지/저항선과 강조 마커 addplot 목록)
+        """
+        line_plots = [
+            mpf.make_addplot(line.values, panel=0, color=line.color, width=line.width, linestyle=line.linestyle,
+                             label=line.label)
+            for line in self.lines
+        ]
+        mark_plots = []
+        for level in self.support_levels:
+            mark_plots.append(mpf.make_addplot([level] * n, panel=0, color=SUPPORT_COLOR, width=2, linestyle='-'))
+        for level in self.resistance_levels:
+            mark_plots.append(mpf.make_addplot([level] * n, panel=0, color=RESISTANCE_COLOR, width=2, linestyle='-'))
+        if self.highlight_points:
+            points = [np.nan] * n
+            for idx, y in self.highlight_points:
+                points[idx] = y
+            mark_plots.append(mpf.make_addplot(points, panel=0, type='scatter', marker='*', markersize=900,
+                                               color=HIGHLIGHT_COLOR))
+        return line_plots, mark_plots
+
+
+def make_base_key(ticker, interval, df, *panel_options):
+    """
+    기본 차트 캐시 키를 만듭니다.
+    봉 구간(첫/마지막 봉 시각, 봉 개수)과 마지막 봉의 OHLCV를 포함하므로,
+    아직 만들어지는 중인 봉이 바뀌면 다른 키가 됩니다.
+    """
+    last_bar = tuple(float(v) for v in df[['Open', 'High', 'Low', 'Close', 'Volume']].iloc[-1])
+    return (ticker.upper(), interval, str(df.index[0]), str(df.index[-1]), len(df), last_bar) + panel_options
+
+
+class _BaseChart:
+    """렌더링된 기본 차트 figure와 배경 비트맵"""
+
+    def __init__(self, fig, axes, bar_count):
+        plt.close(fig)  # pyplot 목록에서는 제거하고, Agg 캔버스를 직접 붙여 계속 사용
+        self.canvas = FigureCanvasAgg(fig)
+        self.fig = fig
+        self.main_ax = axes[0]
+        self.bar_count = bar_count
+        # mplfinance가 라벨이 있는 addplot에 자동으로 붙인 범례는 덧그릴 때 다시 그리므로 제거
+        if self.main_ax.get_legend() is not None:
+            self.main_ax.get_legend().remove()
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(fig.bbox)
+        self.ylim = self.main_ax.get_ylim()
+        self.xlim = self.main_ax.get_xlim()
+
+    def fits(self, overlay):
+        low, high = min(self.ylim), max(self.ylim)
+        return all(low <= y <= high for y in overlay.y_values())
+
+    def save_with_overlay(self, overlay, filename):
+        ax = self.main_ax
+        self.canvas.restore_region(self.background)
+
+        artists = []
+        handles = []
+        for line in overlay.lines:
+            artist = Line2D(np.arange(len(line.values)), line.values, color=line.color, linewidth=line.width,
+                            linestyle=line.linestyle, label=line.label)
+            ax.add_line(artist)
+            artists.append(artist)
+            handles.append(artist)
+
+        # mplfinance는 봉을 0, 1, 2, ... 위치에 그리므로 addplot([level] * n)과 같은 구간에 수평선을 그림
+        levels = [(v, SUPPORT_COLOR) for v in overlay.support_levels]
+        levels += [(v, RESISTANCE_COLOR) for v in overlay.resistance_levels]
+        for level, color in levels:
+            artist = Line2D([0, self.bar_count - 1], [level, level], color=color, linewidth=2, linestyle='-')
+            ax.add_line(artist)
+            artists.append(artist)
+
+        if overlay.highlight_points:
+            xs, ys = zip(*overlay.highlight_points)
+            # make_addplot의 기본 alpha(1)가 색상의 투명도를 덮어쓰므로 mpf.plot과 같게 alpha=1로 그림
+            artists.append(ax.scatter(xs, ys, marker='*', s=900, color=HIGHLIGHT_COLOR, alpha=1))
+
+        # 범례: 덧그린 지표 선 + 기본 차트에 있는 지표 선 (볼린저 밴드 등)
+        base_handles, _ = ax.get_legend_handles_labels()
+        base_handles = [h for h in base_handles if h not in artists]
+        legend_handles = handles + base_handles
+        if legend_handles:
+            artists.append(ax.legend(handles=legend_handles, loc='upper left'))
+
+        ax.set_xlim(self.xlim)
+        ax.set_ylim(self.ylim)
+        for artist in artists:
+            ax.draw_artist(artist)
+
+        plt.imsave(filename, np.asarray(self.canvas.buffer_rgba()))
+
+        for artist in artists:
+            artist.remove()
+
+
+class BaseChartCache:
+    """
+    기본 차트(캔들, 거래량, 볼린저 밴드, RSI 패널)를 LRU로 보관하고,
+    문장마다 달라지는 요소만 덧그려 차트 이미지를 저장합니다.
+
+    Args:
+        maxsize (int): 보관할 기본 차트 개수
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = DEFAULT_CHART_CACHE_SIZE if maxsize is None else maxsize
+        self.renders = 0  # mpf.plot 전체 렌더링 횟수
+        self.overlays = 0  # 덧그리기로 만든 차트 수
+        self._charts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_base(self, key, build, bar_count):
+        chart = self._charts.get(key)
+        if chart is not None:
+            self._charts.move_to_end(key)
+            return chart
+
+        fig, axes = build([], [], False)
+        self.renders += 1
+        chart = _BaseChart(fig, axes, bar_count)
+        self._charts[key] = chart
+        while len(self._charts) > self.maxsize:
+            self._charts.popitem(last=False)
+        return chart
+
+    def save(self, key, build, overlay, filename, bar_count):
+        """
+        기본 차트에 overlay를 덧그려 filename에 저장합니다.
+
+        Args:
+            key: make_base_key로 만든 기본 차트 키
+            build: build(지표 선 addplot 목록, 마크 addplot 목록, 메인 범례 표시 여부) -> (fig, axes)
+                mpf.plot을 호출해 차트를 그리는 함수 (기본 차트와 전체 렌더링 모두에 사용)
+            overlay (ChartOverlay): 덧그릴 요소
+            filename (str): 저장할 파일 경로
+            bar_count (int): 봉 개수
+        """
+        with self._lock:
+            chart = self._get_base(key, build, bar_count)
+            if chart.fits(overlay):
+                chart.save_with_overlay(overlay, filename)
+                self.overlays += 1
+                return
+
+        # 덧그릴 값이 축 범위를 벗어나면 mpf.plot 전체 렌더링으로 기존과 같은 차트를 생성
+        print(f"Overlay outside cached chart range, rendering full chart for {filename}")
+        line_plots, mark_plots = overlay.addplots(bar_count)
+        fig, _ = build(line_plots, mark_plots, True)
+        fig.savefig(filename)
+        plt.close(fig)
+        with self._lock:
+            self.renders += 1
+
+    def clear(self):
+        with self._lock:
+            self._charts.clear()
+
+
+_default_chart_cache = None
+_default_chart_cache_lock = threading.Lock()
+
+
+def get_chart_cache():
+    """프로세스 전체에서 공유하는 기본 차트 캐시를 반환합니다."""
+    global _default_chart_cache
+    with _default_chart_cache_lock:
+        if _default_chart_cache is None:
+            _default_chart_cache = BaseChartCache()
+        return _default_chart_cache
+
+
+@dataclass
+class ChartSpec:
+    """
+    차트 한 장을 그리는 데 필요한 정보
+
+    data_key는 봉 데이터(OHLCV + 지표 컬럼)를 가리키는 키이며, 실제 데이터는
+    render_chart에 함께 전달하거나 ChartQueue가 키별로 한 번만 보관합니다.
+    """
+
+    ticker: str
+    interval: str
+    filename: str
+    index: int
+    data_key: tuple
+    show_sma5: bool = False
+    show_sma20: bool = False
+    show_sma60: bool = False
+    show_rsi: bool = False
+    show_bollinger: bool = False
+    support_levels: List[float] = field(default_factory=list)
+    resistance_levels: List[float] = field(default_factory=list)
+    highlight_indices: List[int] = field(default_factory=list)
+
+
+def has_valid_data(series, min_valid_points=5):
+    """
+    시리즈에 최소한의 유효한 데이터 포인트가 있는지 확인합니다.
+    min_valid_points: 시리즈가 유효하다고 판단할 최소 데이터 포인트 수
+    """
+    valid_count = (~pd.isna(series)).sum()
+    print(f"Series {series.name} has {valid_count} valid data points out of {len(series)} total")
+    return valid_count >= min_valid_points
+
+
+def render_chart(spec, df, cache=None):
+    """
+    ChartSpec에 따라 캔들차트를 그려 spec.filename에 저장합니다.
+
+    Args:
+        spec (ChartSpec): 그릴 차트 사양
+        df (DataFrame): OHLCV와 지표 컬럼(SMA5/20/60, RSI, BB_High/Middle/Low)이 있는 봉 데이터
+        cache (BaseChartCache): 기본 차트 캐시 (기본값: 프로세스 공유 캐시)
+    """
+    cache = cache or get_chart_cache()
+    print(f"Creating chart for {spec.ticker}... Saving as {spec.filename}")
+
+    # 캔들차트를 위한 데이터 준비
+    # 기본 차트에 들어가는 addplot 리스트 (볼린저 밴드, RSI)
+    apds = []
+
+    # 문장마다 바뀌는 요소(이동평균선, 지지/저항선, 강조 마커)는 캐시된 기본 차트 위에 덧그림
+    overlay = ChartOverlay()
+
+    # 각 지표에 대해 유효한 데이터가 있는 경우에만 그래프에 추가 (범례 라벨 추가)
+    for window, enabled, color in ((5, spec.show_sma5, 'green'), (20, spec.show_sma20, 'purple'),
+                                   (60, spec.show_sma60, 'orange')):
+        column = f"SMA{window}"
+        if enabled and has_valid_data(df[column]):
+            overlay.lines.append(OverlayLine(df[column].to_numpy(), color=color, label=column))
+        elif enabled:
+            print(f"{column} has no valid data points, skipping in plot")
+        else:
+            print(f"{column} skipped as per user request")
+
+    # 볼린저 밴드는 옵션이 활성화된 경우에만 추가
+    if spec.show_bollinger:
+        if has_valid_data(df['BB_High']):
+            apds.append(mpf.make_addplot(df['BB_High'], panel=0, color='gray', width=1, linestyle='--',
+                                         label='BB High'))
+        else:
+            print("BB_High has no valid data points, skipping in plot")
+
+        if has_valid_data(df['BB_Middle']):
+            apds.append(mpf.make_addplot(df['BB_Middle'], panel=0, color='black', width=1, label='BB Middle'))
+        else:
+            print("BB_Middle has no valid data points, skipping in plot")
+
+        if has_valid_data(df['BB_Low']):
+            apds.append(mpf.make_addplot(df['BB_Low'], panel=0, color='gray', width=1, linestyle='--',
+                                         label='BB Low'))
+        else:
+            print("BB_Low has no valid data points, skipping in plot")
+
+    # 지지선(파란색), 저항선(빨간색) 추가 - 범례에서 제외
+    for level in spec.support_levels:
+        overlay.support_levels.append(level)
+        print(f"Added support line at price: {level} with blue color")
+    for level in spec.resistance_levels:
+        overlay.resistance_levels.append(level)
+        print(f"Added resistance line at price: {level} with red color")
+
+    # RSI 패널을 옵션에 따라 추가 또는 생략
+    has_rsi = False
+    if spec.show_rsi and has_valid_data(df['RSI'], min_valid_points=10):
+        # RSI를 패널 2로 변경 (거래량과 분리)
+        apds.append(mpf.make_addplot(df['RSI'], panel=2, color='orange', ylabel='RSI', label='RSI'))
+        apds.append(mpf.make_addplot([70] * len(df), panel=2, color='red', linestyle='dashed',
+                                     label='Overbought (70)'))
+        apds.append(mpf.make_addplot([30] * len(df), panel=2, color='green', linestyle='dashed',
+                                     label='Oversold (30)'))
+        has_rsi = True
+        print("Added RSI panel to chart")
+    elif spec.show_rsi:
+        print("RSI has no valid data points or insufficient points, skipping in plot")
+    else:
+        print("RSI panel skipped as per user request")
+
+    # 강조할 봉에 마커 표시 - 범례에서 제외 (고가보다 약간 위에 표시)
+    for idx in spec.highlight_indices:
+        overlay.highlight_points.append((idx, df['High'].iloc[idx] * 1.03))
+    if spec.highlight_indices:
+        print(f"Added {len(spec.highlight_indices)} highlight markers")
+
+    # 패널 비율: RSI가 활성화된 경우 3개 패널 (메인 차트, 거래량, RSI), 아니면 2개 패널 (메인 차트, 거래량)
+    panel_ratios = (4, 1, 1) if has_rsi else (4, 1)
+
+    def build_chart(line_plots, mark_plots, show_legend):
+        """mpf.plot으로 차트를 그립니다. (기본 차트 캐시와 전체 렌더링에 공통으로 사용)"""
+        # returnfig=True를 사용하여 figure와 axes를 받아옴
+        fig, axes = mpf.plot(
+            df,
+            type='candle',
+            volume=True,
+            volume_panel=1,  # 거래량을 패널 1에 배치
+            addplot=line_plots + apds + mark_plots,
+            panel_ratios=panel_ratios,
+            figratio=(12, 10),
+            figscale=1.2,
+            title=f"{spec.ticker} - Technical Analysis (Candlestick)",
+            style='yahoo',
+            returnfig=True,  # figure와 axes 반환
+        )
+
+        # 메인 차트 패널에 범례 추가 (캔들차트 + 이동평균선 + 볼린저 밴드)
+        # 기본 차트에서는 덧그리는 이동평균선과 함께 범례를 그리므로 생략
+        if show_legend:
+            axes[0].legend(loc='upper left')
+
+        # 거래량 패널 제목 추가
+        axes[2].set_title('Volume', loc='left')
+
+        # RSI 패널에 범례 추가 (axes 배열에는 보조 축도 포함되어 있어 RSI 패널은 axes[4])
+        if has_rsi:
+            axes[4].legend(loc='upper left')
+        return fig, axes
+
+    # 기본 차트(캔들, 거래량, 볼린저 밴드, RSI)는 한 번만 그리고, 나머지는 덧그려서 저장
+    base_key = spec.data_key + (spec.show_bollinger, has_rsi)
+    cache.save(base_key, build_chart, overlay, spec.filename, len(df))
+    print(f"Chart saved as {spec.filename}")
+    return spec.filename
+
+
+class ChartQueue:
+    """
+    차트 표시 도구가 만든 ChartSpec을 모아 두었다가 한꺼번에 그리는 대기열
+
+    - submit: 사양과 봉 데이터를 보관 (같은 data_key의 데이터는 한 번만 보관)
+    - flush: 쌓인 사양을 render_charts로 그리고, 결과를 차트 매니페스트에 기록한 뒤 대기열을 비움
+
+    출력 파일 이름은 도구가 사양을 만들 때 manifest에서 할당받습니다.
+
+    Args:
+        manifest (ChartManifest): 파일 이름을 할당하고 렌더링 결과를 기록할 매니페스트
+    """
+
+    def __init__(self, manifest=None):
+        self.manifest = manifest or get_chart_manifest()
+        self._specs = []
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def submit(self, spec, df):
+        with self._lock:
+            self._data.setdefault(spec.data_key, df)
+            self._specs.append(spec)
+            print(f"Queued chart for {spec.ticker} as {spec.filename} ({len(self._specs)} pending)")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._specs)
+
+    def drain(self):
+        """쌓인 (사양 목록, data_key -> 봉 데이터)를 꺼내고 대기열을 비웁니다."""
+        with self._lock:
+            specs, data = self._specs, self._data
+            self._specs, self._data = [], {}
+            return specs, data
+
+    def flush(self, max_workers=None):
+        specs, data = self.drain()
+        results = render_charts(specs, data, max_workers=max_workers)
+        for spec, filename in zip(specs, results):
+            self.manifest.mark(spec.filename, "rendered" if filename else "failed")
+        return results
+
+
+_worker_data = None
+
+# 작업자 프로세스 없이 현재 프로세스에서 그릴 때 사용 (pyplot과 BaseChartCache는 스레드 간에 공유되므로,
+# 중기/단기 구간이 동시에 flush해도 한 번에 한 묶음씩 그림)
+_inprocess_lock = threading.Lock()
+
+
+def _init_render_worker(data):
+    """작업자 프로세스 초기화: Agg 백엔드를 쓰고, 봉 데이터를 프로세스에 한 번만 보관"""
+    global _worker_data
+    plt.switch_backend("Agg")
+    _worker_data = data
+
+
+def _render_batch(specs, data=None):
+    """같은 기본 차트를 공유하는 사양 묶음을 작업자 프로세스에서 그립니다. (data가 없으면 작업자 데이터 사용)"""
+    data = _worker_data if data is None else data
+    rendered = []
+    for spec in specs:
+        try:
+            rendered.append(render_chart(spec, data[spec.data_key]))
+        except Exception as e:
+            print(f"Error plotting chart for {spec.ticker}: {str(e)}")
+            traceback.print_exc()
+            rendered.append(None)
+    return rendered
+
+
+def render_charts(specs, data, max_workers=None):
+    """
+    여러 차트 사양을 작업자 프로세스 풀에서 나누어 그립니다.
+
+    같은 기본 차트(봉 데이터 + 볼린저/RSI 패널 구성)를 쓰는 사양끼리 묶어서 보내므로 작업자 안의
+    BaseChartCache가 덧그리기로 처리합니다. 묶음이 너무 크면 작업자 수에 맞춰 나눕니다.
+
+    Args:
+        specs (list[ChartSpec]): 그릴 차트 사양
+        data (dict): data_key -> 봉 데이터
+        max_workers (int): 작업자 프로세스 수 (기본값: CHART_RENDER_WORKERS 또는 CPU 코어 수)
+
+    Returns:
+        list: specs와 같은 순서의 저장된 파일 이름 (실패한 차트는 None)
+    """
+    if not specs:
+        return []
+    max_workers = min(max_workers or DEFAULT_RENDER_WORKERS, len(specs))
+
+    if max_workers <= 1:
+        with _inprocess_lock:
+            plt.switch_backend("Agg")
+            return _render_batch(specs, data)
+
+    groups = OrderedDict()
+    for position, spec in enumerate(specs):
+        groups.setdefault(spec.data_key + (spec.show_bollinger, spec.show_rsi), []).append(position)
+    chunk_size = max(1, math.ceil(len(specs) / max_workers))
+    batches = []
+    for positions in groups.values():
+        for start in range(0, len(positions), chunk_size):
+            batches.append(positions[start : start + chunk_size])
+
+    print(f"Rendering {len(specs)} charts in {len(batches)} batches with {max_workers} worker processes...")
+    results = [None] * len(specs)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_render_worker, initargs=(data,)) as pool:
+        batch_results = pool.map(_render_batch, [[specs[p] for p in batch] for batch in batches])
+        for batch, rendered in zip(batches, batch_results):
+            for position, filename in zip(batch, rendered):
+                results[position] = filename
+    return results
@@ -0,0 +1,26 @@
+"""
+ffmpeg 실행 도우미
+
+영상 렌더러(video_render.py)와 오디오 이어붙이기(audio_concat.py)가 함께 쓰는 ffmpeg 실행 파일 경로와
+concat demuxer 목록 파일 작성 함수입니다.
+
+환경 변수:
+- FFMPEG_BINARY: ffmpeg 실행 파일 경로 (기본값: ffmpeg)
+"""
+
+import os
+
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+
+def concat_file_line(path):
+    """concat demuxer 목록의 file 항목 (절대 경로, 작은따옴표 이스케이프)"""
+    return "file '{}'".format(os.path.abspath(path).replace("'", "'\\''"))
+
+
+def write_concat_list(paths, list_path):
+    """파일들을 순서대로 읽는 concat demuxer 목록 파일을 만들고 그 경로를 반환합니다."""
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(concat_file_line(path) for path in paths) + "\n")
+    return list_path
@@ -0,0 +1,660 @@
+"""
+주식 도구들이 공유하는 기술적 지표 계산 엔진
+
+ta 라이브러리처럼 지표마다 pandas Series 객체를 따로 만들지 않고, 연속된 float 종가 배열
+하나에서 모든 지표를 한 번에 계산합니다.
+- SMA: 누적합(cumsum) 차분
+- RSI: Wilder 평활(alpha = 1/window) 이동평균
+- 볼린저 밴드: 이동 합과 이동 제곱합으로 평균/표준편차(ddof=0) 계산
+
+결과는 ta(fillna=False)와 수치적으로 같습니다. 비교와 속도 측정은
+scripts/benchmark_indicators.py를 참고하세요.
+
+하루에도 여러 번 다시 계산하는 시간봉 분석을 위해, 봉을 하나씩 반영하는
+IndicatorState(누적 합과 Wilder 평균을 보관)와 캐시된 봉 데이터 옆에 상태를 저장해 두고
+새로 들어온 봉만 계산하는 streaming_indicators도 제공합니다.
+
+도구들은 memoized_indicators/streaming_indicators를 통해 지표를 계산합니다. 결과는
+(티커, 봉 간격, 봉 구간, 지표 파라미터) 단위로 프로세스 전체에서 공유하는 IndicatorMemo에
+저장되므로, 분석 도구가 계산한 지표를 차트 표시 도구가 문장마다 다시 계산하지 않습니다.
+
+환경 변수:
+- INDICATOR_MEMO_SIZE: 메모리에 보관할 지표 결과 개수 (기본값: 256)
+- INDICATOR_MEMO_DIR: 지정하면 지표 결과를 .npz 파일로도 저장 (기본값: 사용 안 함)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .market_data import get_market_data_cache
+
+
+DEFAULT_SMA_WINDOWS = (5, 20, 60, 120)
+DEFAULT_RSI_WINDOW = 14
+DEFAULT_BB_WINDOW = 20
+DEFAULT_BB_DEV = 2
+
+DEFAULT_MEMO_SIZE = int(os.getenv("INDICATOR_MEMO_SIZE", "256"))
+DEFAULT_MEMO_DIR = os.getenv("INDICATOR_MEMO_DIR") or None
+
+
+@dataclass
+class IndicatorResult:
+    """
+    compute_indicators의 결과. 모든 배열은 입력 종가와 길이가 같고,
+    창(window)이 채워지기 전 구간은 NaN입니다.
+    """
+
+    sma: Dict[int, np.ndarray] = field(default_factory=dict)
+    rsi: Optional[np.ndarray] = None
+    bb_high: Optional[np.ndarray] = None
+    bb_middle: Optional[np.ndarray] = None
+    bb_low: Optional[np.ndarray] = None
+
+    def columns(self):
+        """도구들이 DataFrame에 사용하는 컬럼 이름 -> 배열 딕셔너리를 반환합니다."""
+        columns = {f"SMA{window}": values for window, values in self.sma.items()}
+        if self.rsi is not None:
+            columns["RSI"] = self.rsi
+        if self.bb_high is not None:
+            columns["BB_High"] = self.bb_high
+            columns["BB_Middle"] = self.bb_middle
+            columns["BB_Low"] = self.bb_low
+        return columns
+
+    def latest(self):
+        """각 지표의 마지막 값을 반환합니다. (NaN이면 None)"""
+        latest = {}
+        for name, values in self.columns().items():
+            value = values[-1] if len(values) else np.nan
+            latest[name] = None if np.isnan(value) else float(value)
+        return latest
+
+    def select(self, sma_windows=(), rsi=True, bollinger=True):
+        """요청한 지표만 골라 복사한 IndicatorResult를 반환합니다. (메모에 저장된 배열은 공유하지 않음)"""
+        selected = IndicatorResult(sma={window: self.sma[window].copy() for window in sma_windows})
+        if rsi and self.rsi is not None:
+            selected.rsi = self.rsi.copy()
+        if bollinger and self.bb_high is not None:
+            selected.bb_high = self.bb_high.copy()
+            selected.bb_middle = self.bb_middle.copy()
+            selected.bb_low = self.bb_low.copy()
+        return selected
+
+    @classmethod
+    def from_columns(cls, columns, sma_windows=()):
+        """columns()와 같은 형태의 딕셔너리에서 IndicatorResult를 만듭니다."""
+        result = cls(sma={window: np.asarray(columns[f"SMA{window}"], dtype=float) for window in sma_windows})
+        if "RSI" in columns:
+            result.rsi = np.asarray(columns["RSI"], dtype=float)
+        if "BB_High" in columns:
+            result.bb_high = np.asarray(columns["BB_High"], dtype=float)
+            result.bb_middle = np.asarray(columns["BB_Middle"], dtype=float)
+            result.bb_low = np.asarray(columns["BB_Low"], dtype=float)
+        return result
+
+
+def _rolling_sums(cumsum, window, n):
+    """누적합 배열(앞에 0이 붙은 길이 n+1)에서 길이 window의 이동 합을 구합니다."""
+    out = np.full(n, np.nan)
+    if 0 < window <= n:
+        out[window - 1 :] = cumsum[window:] - cumsum[:-window]
+    return out
+
+
+def wilder_rsi(close, window=DEFAULT_RSI_WINDOW):
+    """
+    Wilder 방식 RSI. ta.momentum.RSIIndicator(fillna=False)와 같은 값을 반환합니다.
+    첫 번째 변화량은 0으로 보고, window-1 번째 값부터 유효합니다.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    n = len(close)
+    rsi = np.full(n, np.nan)
+    if n == 0 or n < window:
+        return rsi
+
+    diff = np.diff(close, prepend=close[0])
+    gains = np.maximum(diff, 0.0).tolist()
+    losses = np.maximum(-diff, 0.0).tolist()
+
+    # 재귀식이라 벡터화가 불가능하므로 파이썬 float로 한 번만 순회
+    alpha = 1.0 / window
+    decay = 1.0 - alpha
+    avg_gain = np.empty(n)
+    avg_loss = np.empty(n)
+    gain, loss = gains[0], losses[0]
+    avg_gain[0], avg_loss[0] = gain, loss
+    for i in range(1, n):
+        gain = decay * gain + alpha * gains[i]
+        loss = decay * loss + alpha * losses[i]
+        avg_gain[i] = gain
+        avg_loss[i] = loss
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    rsi[window - 1 :] = values[window - 1 :]
+    return rsi
+
+
+def compute_indicators(
+    close,
+    sma_windows=DEFAULT_SMA_WINDOWS,
+    rsi_window=DEFAULT_RSI_WINDOW,
+    bb_window=DEFAULT_BB_WINDOW,
+    bb_dev=DEFAULT_BB_DEV,
+):
+    """
+    종가 배열 하나로 SMA, RSI, 볼린저 밴드를 한 번에 계산합니다.
+
+    Args:
+        close: 종가 배열 (NaN이 없어야 함)
+        sma_windows: 계산할 SMA 기간 목록 (빈 튜플이면 생략)
+        rsi_window: RSI 기간 (None이면 생략)
+        bb_window: 볼린저 밴드 기간 (None이면 생략)
+        bb_dev: 볼린저 밴드 표준편차 배수
+
+    Returns:
+        IndicatorResult
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    n = len(close)
+    result = IndicatorResult()
+
+    # 큰 가격(예: 원화 종목)에서 제곱합의 자릿수 손실을 줄이기 위해 첫 값을 기준으로 이동
+    base = close[0] if n else 0.0
+    shifted = close - base
+    cumsum = np.concatenate(([0.0], np.cumsum(shifted)))
+
+    for window in sma_windows:
+        result.sma[window] = _rolling_sums(cumsum, window, n) / window + base
+
+    if rsi_window:
+        result.rsi = wilder_rsi(close, rsi_window)
+
+    if bb_window:
+        cumsum_sq = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+        mean = _rolling_sums(cumsum, bb_window, n) / bb_window
+        variance = _rolling_sums(cumsum_sq, bb_window, n) / bb_window - mean * mean
+        std = np.sqrt(np.maximum(variance, 0.0))
+        middle = mean + base
+        result.bb_middle = middle
+        result.bb_high = middle + bb_dev * std
+        result.bb_low = middle - bb_dev * std
+
+    return result
+
+
+class IndicatorState:
+    """
+    봉을 하나씩 추가하면서 SMA, RSI, 볼린저 밴드를 O(1)로 갱신하는 상태 객체
+
+    기간별 이동 합, 볼린저 밴드용 제곱합, Wilder 평균 상승/하락폭과 가장 긴 기간만큼의
+    최근 종가를 보관합니다. 처음부터 같은 종가를 넣으면 compute_indicators와 같은 값을
+    돌려주며, to_dict/from_dict로 JSON에 저장할 수 있습니다.
+    """
+
+    # 더하고 빼기를 반복하며 쌓이는 부동소수점 오차를 없애기 위해 주기적으로 합을 다시 계산
+    RESYNC_INTERVAL = 1000
+
+    def __init__(
+        self,
+        sma_windows=DEFAULT_SMA_WINDOWS,
+        rsi_window=DEFAULT_RSI_WINDOW,
+        bb_window=DEFAULT_BB_WINDOW,
+        bb_dev=DEFAULT_BB_DEV,
+    ):
+        self.sma_windows = tuple(sma_windows)
+        self.rsi_window = rsi_window
+        self.bb_window = bb_window
+        self.bb_dev = bb_dev
+
+        self.count = 0
+        self.base = None  # 제곱합 자릿수 손실을 줄이기 위한 기준값 (첫 종가)
+        self.prev_close = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.sums = {window: 0.0 for window in self._sum_windows()}
+        self.sum_sq = 0.0
+        self.recent = deque(maxlen=max(self._sum_windows(), default=1))  # 기준값을 뺀 최근 종가
+        self.last_timestamp = None
+
+    @property
+    def params(self):
+        return {
+            "sma_windows": list(self.sma_windows),
+            "rsi_window": self.rsi_window,
+            "bb_window": self.bb_window,
+            "bb_dev": self.bb_dev,
+        }
+
+    def _sum_windows(self):
+        windows = set(self.sma_windows)
+        if self.bb_window:
+            windows.add(self.bb_window)
+        return sorted(windows)
+
+    def _step(self, close):
+        """close를 다음 봉으로 추가했을 때의 (지표 값, 새 내부 상태)를 계산합니다. 상태는 바꾸지 않습니다."""
+        close = float(close)
+        base = close if self.base is None else self.base
+        value = close - base
+        count = self.count + 1
+
+        # 창에서 빠져나가는 값: window 봉 전의 종가
+        sums = {}
+        for window, total in self.sums.items():
+            leaving = self.recent[-window] if len(self.recent) >= window else 0.0
+            sums[window] = total + value - leaving
+
+        sum_sq = self.sum_sq
+        if self.bb_window:
+            leaving = self.recent[-self.bb_window] if len(self.recent) >= self.bb_window else 0.0
+            sum_sq = sum_sq + value * value - leaving * leaving
+
+        avg_gain, avg_loss = self.avg_gain, self.avg_loss
+        if self.rsi_window:
+            if self.prev_close is None:
+                avg_gain, avg_loss = 0.0, 0.0
+            else:
+                diff = close - self.prev_close
+                alpha = 1.0 / self.rsi_window
+                avg_gain = (1.0 - alpha) * avg_gain + alpha * max(diff, 0.0)
+                avg_loss = (1.0 - alpha) * avg_loss + alpha * max(-diff, 0.0)
+
+        values = {}
+        for window in self.sma_windows:
+            values[f"SMA{window}"] = sums[window] / window + base if count >= window else np.nan
+
+        if self.rsi_window:
+            if count < self.rsi_window:
+                values["RSI"] = np.nan
+            elif avg_loss == 0:
+                values["RSI"] = 100.0
+            else:
+                values["RSI"] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+        if self.bb_window:
+            if count >= self.bb_window:
+                mean = sums[self.bb_window] / self.bb_window
+                std = np.sqrt(max(sum_sq / self.bb_window - mean * mean, 0.0))
+                middle = mean + base
+                values["BB_High"] = middle + self.bb_dev * std
+                values["BB_Middle"] = middle
+                values["BB_Low"] = middle - self.bb_dev * std
+            else:
+                values["BB_High"] = values["BB_Middle"] = values["BB_Low"] = np.nan
+
+        new_state = (count, base, close, value, sums, sum_sq, avg_gain, avg_loss)
+        return values, new_state
+
+    def peek(self, close):
+        """close가 다음 봉이라면 지표가 어떻게 되는지 계산합니다. (아직 완성되지 않은 봉용, 상태 변경 없음)"""
+        return self._step(close)[0]
+
+    def update(self, close, timestamp=None):
+        """완성된 봉 하나를 상태에 반영하고 그 시점의 지표 값을 반환합니다."""
+        values, (count, base, close, value, sums, sum_sq, avg_gain, avg_loss) = self._step(close)
+        self.count, self.base, self.prev_close = count, base, close
+        self.sums, self.sum_sq = sums, sum_sq
+        self.avg_gain, self.avg_loss = avg_gain, avg_loss
+        self.recent.append(value)
+        if timestamp is not None:
+            self.last_timestamp = pd.Timestamp(timestamp).isoformat()
+        if count % self.RESYNC_INTERVAL == 0:
+            self._resync()
+        return values
+
+    def _resync(self):
+        recent = list(self.recent)
+        for window in self.sums:
+            self.sums[window] = float(sum(recent[-window:]))
+        if self.bb_window:
+            self.sum_sq = float(sum(v * v for v in recent[-self.bb_window :]))
+
+    def to_dict(self):
+        return {
+            "params": self.params,
+            "count": self.count,
+            "base": self.base,
+            "prev_close": self.prev_close,
+            "avg_gain": self.avg_gain,
+            "avg_loss": self.avg_loss,
+            "sums": {str(window): total for window, total in self.sums.items()},
+            "sum_sq": self.sum_sq,
+            "recent": list(self.recent),
+            "last_timestamp": self.last_timestamp,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(**data["params"])
+        state.count = data["count"]
+        state.base = data["base"]
+        state.prev_close = data["prev_close"]
+        state.avg_gain = data["avg_gain"]
+        state.avg_loss = data["avg_loss"]
+        state.sums = {int(window): total for window, total in data["sums"].items()}
+        state.sum_sq = data["sum_sq"]
+        state.recent.extend(data["recent"])
+        state.last_timestamp = data["last_timestamp"]
+        return state
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def _indicator_columns(params):
+    """지표 파라미터에 해당하는 컬럼 이름 목록"""
+    names = [f"SMA{window}" for window in params["sma_windows"]]
+    if params["rsi_window"]:
+        names.append("RSI")
+    if params["bb_window"]:
+        names += ["BB_High", "BB_Middle", "BB_Low"]
+    return names
+
+
+def _load_stream(state_path, history_path, params):
+    """저장된 지표 상태와 지표 이력을 불러옵니다. 파라미터가 다르거나 파일이 없으면 (None, None)."""
+    if not (os.path.exists(state_path) and os.path.exists(history_path)):
+        return None, None
+    try:
+        state = IndicatorState.load(state_path)
+        history = pd.read_parquet(history_path)
+    except Exception as e:
+        print(f"Failed to load indicator state {state_path}: {str(e)}")
+        return None, None
+    if state.params != params:
+        return None, None
+    return state, history
+
+
+def streaming_indicators(
+    df,
+    ticker,
+    period,
+    interval,
+    sma_windows=DEFAULT_SMA_WINDOWS,
+    rsi_window=DEFAULT_RSI_WINDOW,
+    bb_window=DEFAULT_BB_WINDOW,
+    bb_dev=DEFAULT_BB_DEV,
+    cache=None,
+    memo=None,
+):
+    """
+    캐시된 봉 데이터 옆에 저장한 IndicatorState를 이용해 새로 들어온 봉만 계산합니다.
+
+    - 완성된 봉(마지막 봉 제외)은 상태에 한 번만 반영하고, 그 값은 지표 이력 파일에 이어 붙임
+    - 마지막 봉은 아직 만들어지는 중일 수 있으므로 peek으로만 계산
+    - 저장된 마지막 봉을 찾을 수 없거나 종가가 바뀐 경우(수정주가 반영 등)에는 처음부터 다시 계산
+    - 같은 봉 구간에 대한 결과는 IndicatorMemo에서 바로 가져옴
+
+    Returns:
+        IndicatorResult: df와 같은 길이의 지표 배열
+    """
+    memo = memo or get_indicator_memo()
+    params = {
+        "method": "streaming",
+        "sma_windows": list(sma_windows),
+        "rsi_window": rsi_window,
+        "bb_window": bb_window,
+        "bb_dev": bb_dev,
+    }
+    return memo.get_or_compute(
+        ticker,
+        interval,
+        df.index,
+        df["Close"].to_numpy(dtype=float),
+        params,
+        lambda: _stream_indicators(df, ticker, period, interval, sma_windows, rsi_window, bb_window, bb_dev, cache),
+    ).select(sma_windows)
+
+
+_stream_locks = {}
+_stream_locks_lock = threading.Lock()
+
+
+def _stream_lock(state_path):
+    """지표 상태 파일 하나(종목/기간/간격)의 읽기-갱신-저장을 묶는 잠금"""
+    with _stream_locks_lock:
+        return _stream_locks.setdefault(state_path, threading.Lock())
+
+
+def _stream_indicators(df, ticker, period, interval, sma_windows, rsi_window, bb_window, bb_dev, cache):
+    cache = cache or get_market_data_cache()
+    state_path = cache.sidecar_path(ticker, period, interval, "indicator_state.json")
+    history_path = cache.sidecar_path(ticker, period, interval, "indicators.parquet")
+    # 같은 종목을 동시에 갱신하면 서로의 상태를 덮어쓰므로, 상태 파일별로 한 번에 하나씩 갱신
+    with _stream_lock(state_path):
+        return _update_stream(
+            df, ticker, interval, sma_windows, rsi_window, bb_window, bb_dev, state_path, history_path
+        )
+
+
+def _update_stream(df, ticker, interval, sma_windows, rsi_window, bb_window, bb_dev, state_path, history_path):
+    closes = df["Close"].to_numpy(dtype=float)
+    index = df.index
+    closed = len(df) - 1  # 마지막 봉을 제외한 완성된 봉의 개수
+    params = IndicatorState(sma_windows, rsi_window, bb_window, bb_dev).params
+
+    state, history = _load_stream(state_path, history_path, params)
+    start = 0
+    if state is not None and state.last_timestamp is not None:
+        position = index.get_indexer([pd.Timestamp(state.last_timestamp)])[0]
+        if 0 <= position < closed and np.isclose(closes[position], state.prev_close):
+            start = position + 1
+
+    if start == 0:
+        state = IndicatorState(sma_windows, rsi_window, bb_window, bb_dev)
+        history = None
+    print(f"{ticker} {interval}: updating indicator state with {max(closed - start, 0)} new closed bars")
+
+    rows = [state.update(closes[i], index[i]) for i in range(start, closed)]
+    if rows:
+        new_history = pd.DataFrame(rows, index=index[start:closed])
+        history = new_history if history is None else pd.concat([history[history.index < index[start]], new_history])
+    if history is not None:
+        history = history[history.index >= index[0]]
+        if rows:
+            state.save(state_path)
+            tmp_path = f"{history_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            history.to_parquet(tmp_path)
+            os.replace(tmp_path, history_path)
+
+    columns = {}
+    latest = state.peek(closes[-1]) if len(closes) else {}
+    for name in _indicator_columns(params):
+        if history is not None:
+            past = history[name].reindex(index[: max(closed, 0)]).to_numpy(dtype=float)
+        else:
+            past = np.full(max(closed, 0), np.nan)
+        columns[name] = np.append(past, latest.get(name, np.nan)) if len(closes) else past
+    return IndicatorResult.from_columns(columns, sma_windows)
+
+
+class IndicatorMemo:
+    """
+    지표 계산 결과를 프로세스 전체에서 공유하는 LRU 메모
+
+    키는 (티커, 봉 간격, 첫 봉 시각, 마지막 봉 시각, 봉 개수, 마지막 종가, 지표 파라미터)입니다.
+    마지막 종가를 포함하므로 아직 만들어지는 중인 봉의 가격이 바뀌면 다시 계산합니다.
+
+    Args:
+        maxsize (int): 메모리에 보관할 결과 개수. 넘치면 가장 오래 사용하지 않은 결과부터 제거
+        disk_dir (str): 지정하면 결과를 .npz 파일로도 저장해 다른 프로세스/실행에서 재사용
+    """
+
+    def __init__(self, maxsize=None, disk_dir=None):
+        self.maxsize = DEFAULT_MEMO_SIZE if maxsize is None else maxsize
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> IndicatorResult
+        self._lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(ticker, interval, timestamps, close, params):
+        n = len(close)
+        first = pd.Timestamp(timestamps[0]).isoformat() if n else None
+        last = pd.Timestamp(timestamps[-1]).isoformat() if n else None
+        last_close = float(close[-1]) if n else None
+        return (ticker.upper(), interval, first, last, n, last_close, json.dumps(params, sort_keys=True))
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.npz")
+
+    def _load_disk(self, key):
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                columns = {name: data[name] for name in data.files}
+        except Exception as e:
+            print(f"Failed to read memoized indicators {path}: {str(e)}")
+            return None
+        sma_windows = [int(name[3:]) for name in columns if name.startswith("SMA")]
+        return IndicatorResult.from_columns(columns, sma_windows)
+
+    def _save_disk(self, key, result):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, **result.columns())
+        os.replace(tmp_path, path)
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, ticker, interval, timestamps, close, params, compute):
+        """
+        메모에 결과가 있으면 반환하고, 없으면 compute()로 계산해 저장합니다.
+        반환된 결과는 메모와 배열을 공유하므로 호출하는 쪽에서 select()로 복사해서 사용합니다.
+        """
+        key = self.make_key(ticker, interval, timestamps, close, params)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                print(f"Using memoized indicators for {ticker} ({interval})")
+                return result
+
+        result = self._load_disk(key) if self.disk_dir else None
+        if result is None:
+            result = compute()
+            if self.disk_dir:
+                self._save_disk(key, result)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+            print(f"Using memoized indicators for {ticker} ({interval}) from disk")
+
+        with self._lock:
+            self._remember(key, result)
+        return result
+
+    def clear(self):
+        """메모리에 저장된 결과를 모두 비웁니다. (디스크 파일은 유지)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_default_memo = None
+_default_memo_lock = threading.Lock()
+
+
+def get_indicator_memo():
+    """프로세스 전체에서 공유하는 기본 지표 메모를 반환합니다."""
+    global _default_memo
+    with _default_memo_lock:
+        if _default_memo is None:
+            _default_memo = IndicatorMemo(disk_dir=DEFAULT_MEMO_DIR)
+        return _default_memo
+
+
+def memoized_indicators(
+    ticker,
+    interval,
+    timestamps,
+    close,
+    sma_windows=DEFAULT_SMA_WINDOWS,
+    rsi_window=DEFAULT_RSI_WINDOW,
+    bb_window=DEFAULT_BB_WINDOW,
+    bb_dev=DEFAULT_BB_DEV,
+    memo=None,
+):
+    """
+    compute_indicators와 같은 결과를 IndicatorMemo를 거쳐 반환합니다.
+
+    요청한 지표가 기본 지표 묶음(SMA 5/20/60/120, RSI 14, 볼린저 밴드 20/2)에 포함되면 기본 묶음
+    전체를 한 번 계산해 저장하고 필요한 지표만 골라 반환합니다. 그래서 분석 도구와 차트 표시
+    도구가 서로 다른 지표를 요청해도 같은 봉 구간에서는 한 번만 계산됩니다.
+
+    Args:
+        ticker (str): 티커 (메모 키에 사용)
+        interval (str): 봉 간격 (예: "1h", "1d")
+        timestamps: 각 봉의 시각 (DatetimeIndex 또는 날짜 컬럼)
+        close: 종가 배열
+        나머지 인자는 compute_indicators와 같음
+
+    Returns:
+        IndicatorResult
+    """
+    memo = memo or get_indicator_memo()
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    standard = (
+        set(sma_windows) <= set(DEFAULT_SMA_WINDOWS)
+        and rsi_window in (None, DEFAULT_RSI_WINDOW)
+        and bb_window in (None, DEFAULT_BB_WINDOW)
+        and (bb_window is None or bb_dev == DEFAULT_BB_DEV)
+    )
+    if standard:
+        params = {
+            "sma_windows": list(DEFAULT_SMA_WINDOWS),
+            "rsi_window": DEFAULT_RSI_WINDOW,
+            "bb_window": DEFAULT_BB_WINDOW,
+            "bb_dev": DEFAULT_BB_DEV,
+        }
+    else:
+        params = {"sma_windows": list(sma_windows), "rsi_window": rsi_window, "bb_window": bb_window, "bb_dev": bb_dev}
+
+    result = memo.get_or_compute(
+        ticker,
+        interval,
+        timestamps,
+        close,
+        params,
+        lambda: compute_indicators(
+            close,
+            sma_windows=params["sma_windows"],
+            rsi_window=params["rsi_window"],
+            bb_window=params["bb_window"],
+            bb_dev=params["bb_dev"],
+        ),
+    )
+    return result.select(sma_windows, rsi=rsi_window is not None, bollinger=bb_window is not None)
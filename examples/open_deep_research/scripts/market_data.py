@@ -0,0 +1,311 @@
+"""
+yfinance 기반 주식 도구들이 공유하는 OHLCV 캐시
+
+모든 주식 도구(StockAnalysisShort/Mid, Mid/ShortStockMarkTool, SentimentTool 등)는
+yf.download를 직접 호출하는 대신 이 모듈을 통해 데이터를 읽습니다.
+(ticker, interval, period) 단위로 봉 데이터를 Parquet(컬럼 기반) 파일로 저장하고,
+TTL이 지나기 전까지는 네트워크 요청 없이 디스크/메모리에서 바로 돌려줍니다.
+TTL이 지난 뒤에는 저장된 마지막 봉 이후의 데이터만 받아서 기존 데이터에 이어 붙입니다.
+
+환경 변수:
+- MARKET_DATA_CACHE_DIR: 캐시 디렉토리 (기본값: ./market_data_cache)
+- MARKET_DATA_CACHE_TTL: 캐시 유효 시간(초) (기본값: 600)
+- MARKET_DATA_REFRESH: 갱신 방식 "incremental"(기본값) 또는 "full"
+"""
+
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+import yfinance as yf
+
+
+DEFAULT_CACHE_DIR = os.path.abspath(os.getenv("MARKET_DATA_CACHE_DIR", "market_data_cache"))
+DEFAULT_TTL = float(os.getenv("MARKET_DATA_CACHE_TTL", "600"))
+DEFAULT_REFRESH = os.getenv("MARKET_DATA_REFRESH", "incremental")
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def normalize_ohlcv(df):
+    """
+    yf.download 결과를 도구들이 공통으로 쓰는 형태로 정리합니다.
+    - 멀티인덱스 컬럼을 첫 번째 레벨(가격 종류)로 평탄화
+    - 인덱스를 DatetimeIndex로 변환
+    - 종가가 없는 행 제거
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df.columns.name = None
+
+    if not isinstance(df.index, pd.DatetimeIndex):
+        df.index = pd.to_datetime(df.index)
+
+    if "Close" in df.columns:
+        df = df.dropna(subset=["Close"])
+    return df
+
+
+def split_batch(batch, tickers):
+    """
+    group_by="ticker"로 받은 묶음 응답을 티커별 DataFrame으로 나눕니다.
+    응답에 없는 티커는 빈 DataFrame으로 채워집니다.
+    """
+    frames = {}
+    if batch is None or batch.empty:
+        return {ticker: normalize_ohlcv(None) for ticker in tickers}
+
+    if not isinstance(batch.columns, pd.MultiIndex):
+        # 티커가 하나뿐이면 yfinance 버전에 따라 단일 레벨 컬럼으로 돌아올 수 있음
+        frames[tickers[0]] = normalize_ohlcv(batch)
+        return frames
+
+    available = {str(name).upper(): name for name in batch.columns.get_level_values(0).unique()}
+    for ticker in tickers:
+        name = available.get(ticker.upper())
+        if name is None:
+            frames[ticker] = normalize_ohlcv(None)
+            continue
+        # 다른 티커의 거래일 때문에 생긴 빈 행은 제거
+        frames[ticker] = normalize_ohlcv(batch[name].dropna(how="all"))
+    return frames
+
+
+def period_to_timedelta(period):
+    """yfinance의 period 문자열("150d", "1mo", "2y" 등)을 Timedelta로 변환합니다. ("max" 등은 None)"""
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        return None
+    value, unit = int(match.group(1)), match.group(2)
+    days = {"d": 1, "wk": 7, "mo": 30, "y": 365}[unit] * value
+    return pd.Timedelta(days=days)
+
+
+def merge_bars(stored, fresh, period):
+    """
+    저장된 봉 데이터에 새로 받은 봉을 이어 붙입니다.
+    - 새 데이터의 첫 시각부터는 새 값으로 덮어씀 (아직 완성되지 않은 마지막 봉 갱신)
+    - period 범위를 벗어난 오래된 봉은 잘라냄
+    """
+    if fresh.empty:
+        merged = stored
+    else:
+        merged = pd.concat([stored[stored.index < fresh.index[0]], fresh])
+        merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+
+    window = period_to_timedelta(period)
+    if window is not None and not merged.empty:
+        now = pd.Timestamp.now(tz=merged.index.tz)
+        merged = merged[merged.index >= now - window]
+    return merged
+
+
+class MarketDataCache:
+    """
+    (ticker, interval, period) 키로 OHLCV 봉 데이터를 저장하는 디스크 + 메모리 캐시
+
+    Args:
+        cache_dir (str): Parquet 파일을 저장할 디렉토리
+        ttl (float): 캐시 유효 시간(초). 이 시간이 지나면 다시 다운로드합니다.
+        refresh (str): TTL이 지난 데이터 갱신 방식
+            - "incremental": 저장된 마지막 봉 이후의 데이터만 받아서 이어 붙임
+            - "full": period 전체를 다시 다운로드
+    """
+
+    def __init__(self, cache_dir=None, ttl=None, refresh=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.refresh = refresh or DEFAULT_REFRESH
+        self._memory = {}  # key -> (저장 시각, DataFrame)
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _key(self, ticker, period, interval):
+        return (ticker.upper(), interval, period)
+
+    def _path(self, key):
+        ticker, interval, period = key
+        safe_ticker = re.sub(r"[^A-Za-z0-9._-]", "_", ticker)
+        return os.path.join(self.cache_dir, f"{safe_ticker}_{interval}_{period}.parquet")
+
+    def sidecar_path(self, ticker, period, interval, suffix):
+        """봉 데이터 파일 옆에 함께 저장하는 부가 파일(지표 상태 등)의 경로를 반환합니다."""
+        path = self._path(self._key(ticker, period, interval))
+        return f"{path[: -len('.parquet')]}.{suffix}"
+
+    def _is_fresh(self, stored_at):
+        return (time.time() - stored_at) < self.ttl
+
+    def _load(self, key):
+        """TTL과 관계없이 저장된 (저장 시각, DataFrame)을 반환합니다. 없으면 None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                return entry
+
+            path = self._path(key)
+            if not os.path.exists(path):
+                return None
+            try:
+                df = pd.read_parquet(path)
+            except Exception as e:
+                print(f"Failed to read cached data {path}: {str(e)}")
+                return None
+            entry = (os.path.getmtime(path), df)
+            self._memory[key] = entry
+            return entry
+
+    def get(self, ticker, period, interval):
+        """캐시에 유효한 데이터가 있으면 복사본을, 없으면 None을 반환합니다."""
+        entry = self._load(self._key(ticker, period, interval))
+        if entry is None or not self._is_fresh(entry[0]):
+            return None
+        return entry[1].copy()
+
+    def get_stale(self, ticker, period, interval):
+        """TTL이 지난 데이터라도 저장되어 있으면 복사본을 반환합니다. (증분 갱신의 기준 데이터)"""
+        entry = self._load(self._key(ticker, period, interval))
+        if entry is None or entry[1].empty:
+            return None
+        return entry[1].copy()
+
+    def last_timestamp(self, ticker, period, interval):
+        """(ticker, interval)별로 저장된 마지막 봉의 시각을 반환합니다."""
+        stored = self.get_stale(ticker, period, interval)
+        return None if stored is None else stored.index[-1]
+
+    def put(self, ticker, period, interval, df):
+        """봉 데이터를 메모리와 디스크(Parquet)에 저장합니다."""
+        key = self._key(ticker, period, interval)
+        path = self._path(key)
+        with self._lock:
+            # 다른 프로세스가 읽는 도중에 깨진 파일을 보지 않도록 임시 파일에 쓴 뒤 교체
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, path)
+            self._memory[key] = (os.path.getmtime(path), df.copy())
+
+    def download(self, ticker, period, interval="1d"):
+        """
+        yf.download(ticker, period=period, interval=interval)과 같은 결과를 반환하되,
+        TTL 안에서는 캐시된 데이터를 사용합니다.
+        """
+        return self.download_many([ticker], period=period, interval=interval).get(ticker, normalize_ohlcv(None))
+
+    def download_many(self, tickers, period, interval="1d"):
+        """
+        여러 티커를 한 번의 묶음 요청(group_by="ticker")으로 가져옵니다.
+
+        캐시에 없는 티커만 모아서 yf.download를 한 번 호출하고, 응답을 티커별 DataFrame으로
+        나눕니다. 데이터가 비어 있는 티커는 결과에서 빠지므로, 반환된 딕셔너리의 키가
+        곧 유효한 티커 목록입니다. (별도의 period="1d" 확인 요청이 필요 없음)
+
+        TTL이 지난 티커는 refresh="incremental"이면 마지막 봉 이후만 받아서 이어 붙입니다.
+
+        Returns:
+            dict: {요청한 티커 문자열: OHLCV DataFrame}
+        """
+        frames = {}
+        stale = {}
+        missing = []
+        for ticker in dict.fromkeys(tickers):
+            df = self.get(ticker, period, interval)
+            if df is not None and not df.empty:
+                print(f"Using cached {interval} data for {ticker} ({period})")
+                frames[ticker] = df
+                continue
+
+            stored = self.get_stale(ticker, period, interval) if self.refresh == "incremental" else None
+            if stored is not None:
+                stale[ticker] = stored
+            else:
+                missing.append(ticker)
+
+        if stale:
+            frames.update(self._refresh_incremental(stale, period, interval))
+
+        if not missing:
+            return frames
+
+        print(f"Fetching {interval} data for {', '.join(missing)} ({period}) in one batched request...")
+        try:
+            batch = yf.download(
+                missing, period=period, interval=interval, group_by="ticker", threads=True, progress=False
+            )
+        except Exception as e:
+            print(f"Batched download failed for {', '.join(missing)}: {str(e)}")
+            return frames
+
+        for ticker, df in split_batch(batch, missing).items():
+            if df.empty:
+                continue
+            self.put(ticker, period, interval, df)
+            frames[ticker] = df.copy()
+        return frames
+
+    def _refresh_incremental(self, stale, period, interval):
+        """
+        저장된 마지막 봉이 속한 날짜부터의 봉만 한 번의 묶음 요청으로 받아 기존 데이터와 합칩니다.
+        마지막 봉(아직 완성되지 않았을 수 있음)은 새로 받은 값으로 덮어씁니다.
+        """
+        tickers = list(stale)
+        last_timestamps = {ticker: df.index[-1] for ticker, df in stale.items()}
+        start = min(last_timestamps.values()).strftime("%Y-%m-%d")
+        print(f"Refreshing {interval} data for {', '.join(tickers)} since {start} (incremental)...")
+
+        try:
+            batch = yf.download(
+                tickers, start=start, interval=interval, group_by="ticker", threads=True, progress=False
+            )
+        except Exception as e:
+            # 갱신에 실패하면 저장된 데이터를 그대로 사용하고, TTL은 갱신하지 않아 다음 호출에서 다시 시도
+            print(f"Incremental refresh failed for {', '.join(tickers)}: {str(e)}")
+            return stale
+
+        frames = {}
+        for ticker, fresh in split_batch(batch, tickers).items():
+            merged = merge_bars(stale[ticker], fresh, period)
+            print(f"{ticker}: last stored bar {last_timestamps[ticker]}, received {len(fresh)} new/updated bars")
+            if merged.empty:
+                continue
+            self.put(ticker, period, interval, merged)
+            frames[ticker] = merged.copy()
+        return frames
+
+    def clear(self):
+        """메모리 캐시와 디스크 캐시(부가 파일 포함)를 모두 비웁니다."""
+        with self._lock:
+            self._memory.clear()
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if os.path.isfile(path):
+                    os.remove(path)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_market_data_cache():
+    """프로세스 전체에서 공유하는 기본 캐시 인스턴스를 반환합니다."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = MarketDataCache()
+        return _default_cache
+
+
+def download_bars(ticker, period, interval="1d"):
+    """기본 캐시를 통해 봉 데이터를 가져오는 편의 함수"""
+    return get_market_data_cache().download(ticker, period=period, interval=interval)
+
+
+def download_many(tickers, period, interval="1d"):
+    """기본 캐시를 통해 여러 티커를 한 번에 가져오는 편의 함수"""
+    return get_market_data_cache().download_many(tickers, period=period, interval=interval)
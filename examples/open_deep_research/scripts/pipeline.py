@@ -0,0 +1,272 @@
+"""
+선언형 단계(stage) 그래프 실행기 - 지연 평가 + 병렬 실행 + 내용 주소(content-addressed) 캐시
+
+stock_analysis_video.main과 stock_podcast.main은 긴 명령형 스크립트로, 중간 결과를 지역 변수와
+작업 디렉토리의 고정 파일(investment_report.txt 등)로 넘기고 모든 단계를 차례로 실행했습니다.
+Pipeline은 각 단계를 이름이 있는 노드로 등록해 두고, run(목표들)을 호출했을 때 목표와 그에 필요한
+앞 노드만 계산합니다.
+
+- 노드는 입력(앞 노드 이름들), 결과에 영향을 주는 설정값(params), 만들어내는 파일(outputs)을 선언합니다.
+- 서로 의존하지 않는 노드는 스레드 풀에서 동시에 실행합니다. (앞 노드가 끝나는 대로 다음 노드를 시작)
+- 노드의 캐시 키는 (노드 이름, 설정값, 앞 노드들의 캐시 키)의 해시입니다. 앞 노드의 값이 아니라 키로
+  계산하므로, 캐시에 있는 노드는 앞 노드를 계산하지 않고 바로 가져옵니다.
+- 캐시하지 않는 노드(cache=False, 예: 매번 새로 해야 하는 분석, 자체 체크포인트가 있는 단계)의 키는
+  계산한 값의 해시이므로, 그 뒤 노드들은 값이 같을 때만 재사용됩니다.
+- 결과값과 선언한 파일은 {캐시 디렉토리}/objects/{내용 sha256}에 한 번씩만 저장되고, {캐시 키}.json에는
+  그 해시만 기록됩니다. 재사용할 때 선언한 파일이 없거나 바뀌었으면 저장된 내용으로 되돌립니다.
+  선언한 파일은 실행 작업 디렉토리 기준 이름으로 기록되므로, 캐시를 공유하는 다른 실행에서 재사용하면
+  그 실행의 작업 디렉토리에 되돌립니다.
+- 노드별 실행 시간(계산 또는 캐시 읽기)을 timings에 기록하고 report()로 출력합니다.
+- 노드는 run()을 호출한 쪽의 실행(RunContext) 안에서 실행됩니다.
+
+환경 변수:
+- PIPELINE_CACHE_DIR: 노드 결과 캐시 디렉토리 (기본값: ./pipeline_cache)
+- PIPELINE_MAX_WORKERS: 동시에 실행할 노드 수 (기본값: 4)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from .run_context import bind_run_context, run_path
+from .run_manifest import file_sha256, hash_inputs
+
+
+DEFAULT_CACHE_DIR = os.getenv("PIPELINE_CACHE_DIR", "pipeline_cache")
+DEFAULT_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+
+
+@dataclass
+class PipelineNode:
+    """
+    파이프라인 단계 하나
+
+    Attributes:
+        name: 노드 이름
+        fn: 앞 노드들의 값을 deps 순서대로 받아 결과(JSON으로 저장 가능한 값)를 반환하는 함수
+        deps: 앞 노드 이름들
+        params: 결과에 영향을 주는 설정값 (모델 ID, 프롬프트 등). 바뀌면 다시 계산
+        outputs: 노드가 만드는 파일의 실행 작업 디렉토리 기준 이름들 (캐시에 함께 저장되고, 재사용할 때
+            현재 실행의 작업 디렉토리에 되돌림)
+        cache: 결과를 디스크 캐시에 저장할지 여부
+    """
+
+    name: str
+    fn: Optional[Callable] = None
+    deps: tuple = ()
+    params: tuple = ()
+    outputs: tuple = ()
+    cache: bool = True
+
+
+class Pipeline:
+    """
+    이름으로 등록한 노드를 필요할 때만, 가능한 한 동시에 계산하고 결과를 디스크에 캐시하는 파이프라인
+
+    Args:
+        cache_dir (str): 노드 결과 캐시 디렉토리 (기본값: PIPELINE_CACHE_DIR)
+        max_workers (int): 동시에 실행할 노드 수 (기본값: PIPELINE_MAX_WORKERS)
+    """
+
+    def __init__(self, cache_dir=None, max_workers=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.nodes = {}
+        self.computed = []
+        self.reused = []
+        self.timings = {}
+        self._keys = {}
+        self._values = {}
+        self._checked = set()
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def add(self, name, fn, deps=(), params=(), outputs=(), cache=True):
+        """노드를 등록합니다. (이 시점에는 계산하지 않음)"""
+        self.nodes[name] = PipelineNode(
+            name=name, fn=fn, deps=tuple(deps), params=tuple(params), outputs=tuple(outputs), cache=cache
+        )
+
+    def constant(self, name, value):
+        """값이 이미 정해진 입력 노드를 등록합니다. 캐시 키는 값의 해시입니다."""
+        self.nodes[name] = PipelineNode(name=name, cache=False)
+        self._keys[name] = hash_inputs(name, value)
+        self._values[name] = value
+
+    def key(self, name):
+        """
+        노드의 캐시 키 (앞 노드의 값을 계산하지 않고 키만으로 결정됨)
+        캐시하지 않는 노드에 의존해 아직 정할 수 없으면 None
+        """
+        if name not in self._keys:
+            node = self.nodes[name]
+            if not node.cache:
+                return None
+            dep_keys = [self.key(dep) for dep in node.deps]
+            if None in dep_keys:
+                return None
+            self._keys[name] = hash_inputs(name, node.params, dep_keys)
+        return self._keys[name]
+
+    def _unkeyed(self, name):
+        """key(name)을 정하려면 먼저 계산해야 하는 (캐시하지 않는) 노드들"""
+        if name in self._keys:
+            return set()
+        node = self.nodes[name]
+        if not node.cache:
+            return {name}
+        return set().union(*[self._unkeyed(dep) for dep in node.deps])
+
+    def _cache_path(self, name):
+        return os.path.join(self.cache_dir, f"{self.key(name)}.json")
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest)
+
+    def _write_atomic(self, path, write):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _put_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            def write(tmp_path):
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+            self._write_atomic(path, write)
+        return digest
+
+    def _put_file(self, source):
+        digest = file_sha256(source)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            self._write_atomic(path, lambda tmp_path: shutil.copyfile(source, tmp_path))
+        return digest
+
+    def _restore_file(self, path, digest):
+        if os.path.exists(path) and file_sha256(path) == digest:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._write_atomic(path, lambda tmp_path: shutil.copyfile(self._object_path(digest), tmp_path))
+
+    def _load(self, name):
+        start = time.perf_counter()
+        try:
+            with open(self._cache_path(name), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            with open(self._object_path(entry["value"]), "r", encoding="utf-8") as f:
+                value = json.load(f)
+            if not all(os.path.exists(self._object_path(digest)) for digest in entry["files"].values()):
+                return False
+            for output, digest in entry["files"].items():
+                self._restore_file(run_path(output), digest)
+        except (OSError, ValueError, KeyError):
+            return False
+
+        print(f"Reusing cached pipeline node '{name}'")
+        self._values[name] = value
+        self.reused.append(name)
+        self.timings[name] = time.perf_counter() - start
+        return True
+
+    def _store(self, name, value):
+        node = self.nodes[name]
+        entry = {
+            "name": name,
+            "value": self._put_bytes(json.dumps(value, ensure_ascii=False).encode("utf-8")),
+            "files": {output: self._put_file(run_path(output)) for output in node.outputs},
+        }
+        path = self._cache_path(name)
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+        self._write_atomic(path, write)
+
+    def _compute(self, name):
+        """작업자 스레드에서 노드 하나를 계산하고 (캐시하는 노드면) 저장합니다."""
+        node = self.nodes[name]
+        start = time.perf_counter()
+        value = node.fn(*[self._values[dep] for dep in node.deps])
+        if node.cache:
+            self._store(name, value)
+        seconds = time.perf_counter() - start
+        print(f"Computed pipeline node '{name}' in {seconds:.1f}s")
+        return value, seconds
+
+    def _schedule(self, wanted, running, executor):
+        """
+        필요한 노드 중 지금 시작할 수 있는 노드를 시작합니다.
+        캐시에 있으면 바로 가져오고, 없으면 필요한 앞 노드를 목록에 추가합니다.
+        """
+        changed = True
+        while changed:
+            changed = False
+            for name in list(wanted):
+                if name in self._values or name in running.values():
+                    continue
+                node = self.nodes[name]
+                needed = []
+                if node.cache:
+                    needed = self._unkeyed(name)
+                    if not needed and name not in self._checked:
+                        self._checked.add(name)
+                        if self._load(name):
+                            changed = True
+                            continue
+                if not needed:
+                    needed = [dep for dep in node.deps if dep not in self._values]
+                if needed:
+                    new = [dep for dep in needed if dep not in wanted]
+                    wanted.extend(new)
+                    changed = changed or bool(new)
+                    continue
+                running[executor.submit(bind_run_context(self._compute), name)] = name
+
+    def run(self, targets, max_workers=None):
+        """
+        목표 노드들의 값을 targets 순서대로 반환합니다.
+        이번 실행에서 이미 계산했거나 캐시에 있는 노드는 그대로 사용하고, 나머지는 필요한 앞 노드만
+        의존 관계 순서대로 계산합니다. (서로 의존하지 않는 노드는 동시에 실행)
+        노드 하나가 실패하면 실행 중인 노드가 끝나기를 기다린 뒤 그 예외를 전달합니다.
+        """
+        start = time.perf_counter()
+        wanted = list(targets)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            while True:
+                self._schedule(wanted, running, executor)
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    value, seconds = future.result()
+                    if not self.nodes[name].cache:
+                        self._keys[name] = hash_inputs(name, value)
+                    self._values[name] = value
+                    self.computed.append(name)
+                    self.timings[name] = seconds
+        print(f"Pipeline finished {', '.join(targets)} in {time.perf_counter() - start:.1f}s")
+        return [self._values[name] for name in targets]
+
+    def get(self, name):
+        """노드 하나의 값을 반환합니다. (run([name])과 같음)"""
+        return self.run([name])[0]
+
+    def report(self):
+        """노드별 실행 시간(계산 또는 캐시 읽기)을 실행 순서대로 출력합니다."""
+        print(f"{'stage':>24} | {'status':>8} | {'seconds':>8}")
+        for name in self.timings:
+            status = "reused" if name in self.reused else "computed"
+            print(f"{name:>24} | {status:>8} | {self.timings[name]:>8.1f}")
@@ -0,0 +1,98 @@
+"""
+실행(run) 단위 작업 디렉토리
+
+주식 도구와 영상/팟캐스트 파이프라인은 결과물을 현재 작업 디렉토리의 고정 이름
+(stock_technical_analysis.json, technical_analysis{n}.png, audio_{i}_{j}.mp3, temp_video.mp4,
+subtitles.srt 등)으로 저장하고, 끝나면 cleanup_analysis_files가 *analysis* 파일을 지웠습니다.
+그래서 한 호스트에서 두 종목을 동시에 처리하면 서로의 차트와 음성을 덮어쓰거나 지웠습니다.
+
+RunContext는 실행마다 runs/{실행 ID}/ 작업 디렉토리를 만들고, use_run_context로 지정한 동안
+도구, 차트 렌더링, TTS, 영상 조립이 run_path(이름)으로 그 디렉토리 안의 경로를 씁니다.
+
+- 현재 실행은 contextvars로 보관하므로 같은 프로세스의 다른 스레드에서 돌아가는 실행과 섞이지 않습니다.
+- 새 스레드는 실행을 물려받지 않으므로, 작업을 다른 스레드로 넘길 때는 bind_run_context로 감쌉니다.
+  (run_parallel, Pipeline, StreamingVideoPipeline은 이미 감싸서 실행)
+- 지정된 실행이 없으면 run_path는 기존과 같이 현재 작업 디렉토리의 경로를 반환합니다.
+
+시장 데이터/음성/단계 결과 캐시는 내용으로 구분되고 원자적으로 저장되므로 실행 간에 계속 공유합니다.
+"""
+
+import contextvars
+import glob
+import os
+from contextlib import contextmanager
+
+from .run_manifest import DEFAULT_RUNS_DIR, RunManifest, new_run_id
+
+
+_current_run_context = contextvars.ContextVar("run_context", default=None)
+
+
+class RunContext:
+    """
+    실행 하나의 작업 디렉토리와 체크포인트 매니페스트
+
+    Args:
+        run_id (str): 실행 ID. 같은 ID로 다시 실행하면 같은 디렉토리와 체크포인트를 사용 (기본값: 새 ID)
+        root (str): 실행별 디렉토리를 만들 위치 (기본값: RUN_MANIFEST_DIR)
+    """
+
+    def __init__(self, run_id=None, root=None):
+        self.run_id = run_id or new_run_id()
+        self.root = os.path.abspath(root or DEFAULT_RUNS_DIR)
+        self.dir = os.path.join(self.root, self.run_id)
+        os.makedirs(self.dir, exist_ok=True)
+        self.manifest = RunManifest(self.run_id, root=self.root)
+
+    def path(self, name):
+        """작업 디렉토리 안의 파일 경로 (하위 디렉토리가 있으면 만듦)"""
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def cleanup(self, patterns):
+        """작업 디렉토리에서 패턴과 맞는 파일들을 지우고, 지운 파일 목록을 반환합니다."""
+        deleted_files = []
+        for pattern in patterns:
+            for path in glob.glob(os.path.join(self.dir, pattern)):
+                try:
+                    os.remove(path)
+                    deleted_files.append(path)
+                    print(f"삭제됨: {path}")
+                except OSError as e:
+                    print(f"삭제 실패 {path}: {e}")
+        return deleted_files
+
+
+def current_run_context():
+    """현재 실행 (지정된 실행이 없으면 None)"""
+    return _current_run_context.get()
+
+
+@contextmanager
+def use_run_context(context):
+    """with 블록 안에서 (같은 스레드와 bind_run_context로 넘긴 작업에서) context를 현재 실행으로 지정"""
+    token = _current_run_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_run_context.reset(token)
+
+
+def bind_run_context(fn):
+    """지금의 실행을 기억해 두었다가, 다른 스레드에서 호출해도 그 실행 안에서 fn을 실행하는 함수를 반환"""
+    context = current_run_context()
+
+    def run(*args, **kwargs):
+        with use_run_context(context):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+def run_path(name):
+    """현재 실행의 작업 디렉토리 안의 경로 (지정된 실행이 없으면 현재 작업 디렉토리 기준)"""
+    context = current_run_context()
+    if context is None:
+        return os.path.join(os.getcwd(), name)
+    return context.path(name)
@@ -0,0 +1,123 @@
+"""
+실행(run) 단위 체크포인트 매니페스트
+
+stock_analysis_video.main은 분석 에이전트, 스크립트 작성, 차트 마킹, 음성 합성, 인코딩을 차례로
+실행하므로 뒤쪽 단계(ffmpeg, TTS 요청 한도, 차트 파일 누락 등)에서 실패하면 처음부터 다시 실행해야
+했습니다. RunManifest는 단계별 결과물(리포트, 스크립트, 문단별 차트, 문단별 영상 조각)을
+runs/{실행 ID}/manifest.json에 기록합니다.
+
+- 각 결과물은 입력 해시(무엇으로부터 만들었는지)와 파일별 내용 해시(sha256)를 함께 기록합니다.
+- 같은 실행 ID로 다시 실행하면 입력 해시가 같고 파일이 그대로 있는 결과물은 건너뛰고,
+  없거나 입력이 바뀐(stale) 결과물만 다시 만듭니다.
+
+환경 변수:
+- RUN_MANIFEST_DIR: 실행별 디렉토리를 만들 위치 (기본값: ./runs)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+
+DEFAULT_RUNS_DIR = os.getenv("RUN_MANIFEST_DIR", "runs")
+
+
+def hash_inputs(*values):
+    """결과물을 만든 입력값(문자열, 숫자, 리스트 등)의 sha256 해시"""
+    payload = json.dumps(values, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def new_run_id():
+    # 같은 초에 시작한 실행끼리 디렉토리가 겹치지 않도록 임의 접미사를 붙임
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class RunManifest:
+    """
+    실행 하나의 결과물과 내용 해시를 기록하는 체크포인트 매니페스트
+
+    Args:
+        run_id (str): 실행 ID. 같은 ID로 다시 실행하면 완료된 결과물을 재사용 (기본값: 현재 시각)
+        root (str): 실행별 디렉토리를 만들 위치 (기본값: RUN_MANIFEST_DIR)
+    """
+
+    def __init__(self, run_id=None, root=None):
+        self.run_id = run_id or new_run_id()
+        self.dir = os.path.join(root or DEFAULT_RUNS_DIR, self.run_id)
+        self.manifest_path = os.path.join(self.dir, "manifest.json")
+        self.artifacts = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.dir, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    self.artifacts = json.load(f).get("artifacts", {})
+                print(f"Resuming run {self.run_id} ({len(self.artifacts)} recorded artifacts)")
+            except Exception as e:
+                print(f"Failed to read run manifest {self.manifest_path}: {str(e)}")
+
+    def path(self, name):
+        """실행 디렉토리 안의 파일 경로"""
+        return os.path.join(self.dir, name)
+
+    def _save(self):
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"run_id": self.run_id, "artifacts": self.artifacts}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_fresh(self, name, inputs):
+        """
+        결과물이 같은 입력으로 만들어졌고, 기록된 파일이 모두 그대로 있으면 True를 반환합니다.
+        """
+        with self._lock:
+            artifact = self.artifacts.get(name)
+        if artifact is None or artifact["inputs"] != inputs:
+            return False
+        for path, digest in artifact["files"].items():
+            if not os.path.exists(path) or file_sha256(path) != digest:
+                return False
+        return True
+
+    def record(self, name, inputs, paths=()):
+        """결과물의 입력 해시와 파일별 내용 해시를 기록합니다."""
+        files = {path: file_sha256(path) for path in paths}
+        with self._lock:
+            self.artifacts[name] = {"inputs": inputs, "files": files, "recorded_at": time.time()}
+            self._save()
+
+    def text(self, name, inputs, compute):
+        """
+        텍스트 결과물을 재사용하거나 compute()로 만들어 기록합니다.
+
+        Args:
+            name (str): 결과물 이름 (실행 디렉토리 안의 {name}.txt로 저장)
+            inputs (tuple): 결과물을 만든 입력값 (바뀌면 다시 계산)
+            compute (callable): 결과 텍스트를 반환하는 함수
+        """
+        inputs = hash_inputs(*inputs)
+        path = self.path(f"{name}.txt")
+        if self.is_fresh(name, inputs):
+            print(f"Reusing {name} from run {self.run_id}")
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                return f.read()
+
+        result = str(compute())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(result)
+        self.record(name, inputs, [path])
+        return result
@@ -2,14 +2,18 @@ import yfinance as yf
 import pandas as pd
 import json
 import os
-import ta
+import threading
 from datetime import datetime, timedelta
-import mplfinance as mpf
-import matplotlib.pyplot as plt
 import numpy as np
 
 from smolagents import Tool  # Assuming the base Tool class is available
 
+from .chart_manifest import get_chart_manifest
+from .chart_render import ChartSpec, make_base_key, render_chart
+from .indicators import streaming_indicators
+from .market_data import download_many
+from .run_context import run_path
+
 class ShortStockMarkTool(Tool):
     name = "stock_analysis_tool"
     description = (
@@ -70,16 +74,41 @@ class ShortStockMarkTool(Tool):
     }
     output_type = "any"
 
-    def get_next_available_filename(self):
+    def __init__(self, chart_queue=None, chart_manifest=None):
+        """
+        Args:
+            chart_queue (ChartQueue): 지정하면 차트를 바로 그리지 않고 사양만 쌓아 둡니다.
+                (chart_queue.flush()에서 작업자 프로세스 풀로 한꺼번에 렌더링)
+            chart_manifest (ChartManifest): 차트 파일 번호를 할당받을 매니페스트
+                (기본값: chart_queue의 매니페스트 또는 프로세스 공유 매니페스트)
+        """
+        super().__init__()
+        self.chart_queue = chart_queue
+        self.chart_manifest = chart_manifest
+
+    def get_chart_manifest(self):
+        if self.chart_manifest is not None:
+            return self.chart_manifest
+        if self.chart_queue is not None:
+            return self.chart_queue.manifest
+        return get_chart_manifest()
+
+    def forward_batch(self, chart_plan, section=None, paragraph=None):
         """
-        Finds the next available technical_analysis[n].png filename
+        배치 차트 계획(ChartPlanner.plan 결과)의 차트를 한 번에 만듭니다.
+        각 항목의 "line"을 차트 매니페스트 위치로 지정하고, 나머지 값은 forward 인자로 사용합니다.
+        (chart_queue가 있으면 사양만 쌓이고, 문단이 끝날 때 chart_queue.flush()로 한꺼번에 렌더링)
+
+        Returns:
+            항목별 forward 결과(JSON 문자열) 목록
         """
-        index = 0
-        while True:
-            filename = f"technical_analysis{index}.png"
-            if not os.path.exists(filename):
-                return filename, index
-            index += 1
+        manifest = self.get_chart_manifest()
+        results = []
+        for entry in chart_plan:
+            manifest.set_context(section=section, paragraph=paragraph, line=entry["line"])
+            arguments = {name: value for name, value in entry.items() if name in self.inputs}
+            results.append(self.forward(**arguments))
+        return results
 
     def get_stock_price(self, ticker):
         """
@@ -168,20 +197,12 @@ class ShortStockMarkTool(Tool):
                 except ValueError:
                     print(f"Invalid resistance level value: {level}. Skipping this level.")
         
-        # 티커 유효성 검증
-        valid_tickers = []
-        invalid_tickers = []
-        for ticker in ticker_list:
-            try:
-                test_df = yf.download(ticker, period="1d", progress=False)
-                if not test_df.empty:
-                    valid_tickers.append(ticker)
-                else:
-                    invalid_tickers.append(ticker)
-                    print(f"Warning: Ticker {ticker} returned empty data. Skipping.")
-            except Exception as e:
-                invalid_tickers.append(ticker)
-                print(f"Invalid ticker: {ticker}. Error: {str(e)}")
+        # 모든 티커를 한 번의 묶음 요청으로 다운로드하고, 응답 데이터로 유효성 검증
+        frames = download_many(ticker_list, period="15d", interval="1h")
+        valid_tickers = [ticker for ticker in ticker_list if ticker in frames]
+        invalid_tickers = [ticker for ticker in ticker_list if ticker not in frames]
+        for ticker in invalid_tickers:
+            print(f"Warning: Ticker {ticker} returned empty data. Skipping.")
         
         if not valid_tickers:
             return "{}"
@@ -195,9 +216,8 @@ class ShortStockMarkTool(Tool):
                 # 실시간 주가 정보 조회
                 realtime_data = self.get_stock_price(ticker)
                 
-                # 모든 주식에 대해 동일한 설정으로 데이터 다운로드
-                print(f"Downloading stock data for {ticker}...")
-                df = yf.download(ticker, period="15d", interval="1h", progress=False)
+                # 묶음 요청으로 받아 둔 데이터 사용
+                df = frames[ticker]
                 
                 # 멀티인덱스 확인 및 처리
                 print(f"DataFrame shape for {ticker}: {df.shape}")
@@ -238,57 +258,49 @@ class ShortStockMarkTool(Tool):
                     print("Converting index to DatetimeIndex...")
                     df.index = pd.to_datetime(df.index)
                 
-                # 기술적 지표 계산
-                close_series = df['Close']
+                # 기술적 지표 계산 - 분석 도구와 같은 지표 상태를 공유하도록 전체 지표를 증분 계산한 뒤,
+                # 옵션으로 켠 지표만 사용
+                sma_windows = tuple(
+                    window for window, enabled in ((5, show_sma5), (20, show_sma20), (60, show_sma60)) if enabled
+                )
+                indicators = streaming_indicators(
+                    df, ticker, period="15d", interval="1h", sma_windows=(5, 20, 60), rsi_window=14, bb_window=20, bb_dev=2
+                )
+                enabled_columns = [f"SMA{window}" for window in sma_windows]
+                if show_rsi:
+                    enabled_columns.append('RSI')
+                if show_bollinger:
+                    enabled_columns += ['BB_High', 'BB_Low', 'BB_Middle']
+                computed = {
+                    column: values for column, values in indicators.columns().items() if column in enabled_columns
+                }
+                for window in (5, 20, 60):
+                    if window in sma_windows:
+                        print(f"Calculated {window}-hour SMA as requested")
+                    else:
+                        print(f"Skipping {window}-hour SMA calculation as per user request")
                 
-                # (1) 이동평균선 계산 (옵션에 따라 계산)
-                if show_sma5:
-                    print("Calculating 5-day SMA as requested...")
-                    df['SMA5'] = ta.trend.SMAIndicator(close=close_series, window=5).sma_indicator()
-                else:
-                    print("Skipping 5-day SMA calculation as per user request")
-                    df['SMA5'] = pd.Series([np.nan] * len(df), index=df.index)
-
-                if show_sma20:
-                    print("Calculating 20-day SMA as requested...")
-                    df['SMA20'] = ta.trend.SMAIndicator(close=close_series, window=20).sma_indicator()
-                else:
-                    print("Skipping 20-day SMA calculation as per user request")
-                    df['SMA20'] = pd.Series([np.nan] * len(df), index=df.index)
-
-                if show_sma60:
-                    print("Calculating 60-day SMA as requested...")
-                    df['SMA60'] = ta.trend.SMAIndicator(close=close_series, window=60).sma_indicator()
-                else:
-                    print("Skipping 60-day SMA calculation as per user request")
-                    df['SMA60'] = pd.Series([np.nan] * len(df), index=df.index)
+                # 차트 렌더링용 데이터 - 옵션과 관계없이 모든 지표를 포함하므로 같은 봉 구간의 차트끼리 공유
+                chart_df = df[['Open', 'High', 'Low', 'Close', 'Volume']].copy()
+                for column, values in indicators.columns().items():
+                    chart_df[column] = values
+                
+                # 계산하지 않은 지표는 NaN 컬럼으로 채워 이후 처리와 형태를 맞춤
+                for column in ['SMA5', 'SMA20', 'SMA60', 'RSI', 'BB_High', 'BB_Low', 'BB_Middle']:
+                    df[column] = computed.get(column, np.nan)
                 
-                # (2) RSI 계산 - 옵션이 활성화된 경우에만 계산
                 if show_rsi:
-                    print("Calculating RSI as requested...")
-                    rsi_indicator = ta.momentum.RSIIndicator(close=close_series, window=14)
-                    df['RSI'] = rsi_indicator.rsi()
-                    
                     # RSI 값 상태 확인
                     print("RSI values sample:")
                     print(df['RSI'].tail(10))
                     print(f"RSI NaN count: {df['RSI'].isna().sum()} out of {len(df)}")
                 else:
                     print("Skipping RSI calculation as per user request")
-                    df['RSI'] = pd.Series([np.nan] * len(df), index=df.index)
                 
-                # (3) 볼린저 밴드 계산 - 옵션이 활성화된 경우에만 계산
                 if show_bollinger:
-                    print("Calculating Bollinger Bands as requested...")
-                    bollinger = ta.volatility.BollingerBands(close=close_series, window=20, window_dev=2)
-                    df['BB_High'] = bollinger.bollinger_hband()
-                    df['BB_Low'] = bollinger.bollinger_lband()
-                    df['BB_Middle'] = bollinger.bollinger_mavg()
+                    print("Calculated Bollinger Bands as requested")
                 else:
                     print("Skipping Bollinger Bands calculation as per user request")
-                    df['BB_High'] = pd.Series([np.nan] * len(df), index=df.index)
-                    df['BB_Low'] = pd.Series([np.nan] * len(df), index=df.index)
-                    df['BB_Middle'] = pd.Series([np.nan] * len(df), index=df.index)
                 
                 # NaN 값 확인 및 처리
                 nan_count = df.isna().sum().sum()
@@ -328,101 +340,6 @@ class ShortStockMarkTool(Tool):
                 print(f"Data types for {ticker}:")
                 print(df.dtypes)
                 
-                # 캔들차트를 위한 데이터 준비
-                # addplot 리스트 생성
-                apds = []
-                
-                # 유효한 데이터가 있는지 확인하는 함수
-                def has_valid_data(series, min_valid_points=5):
-                    """
-                    시리즈에 최소한의 유효한 데이터 포인트가 있는지 확인합니다.
-                    min_valid_points: 시리즈가 유효하다고 판단할 최소 데이터 포인트 수
-                    """
-                    valid_count = (~pd.isna(series)).sum()
-                    print(f"Series {series.name} has {valid_count} valid data points out of {len(series)} total")
-                    return valid_count >= min_valid_points
-                
-                # 각 지표에 대해 유효한 데이터가 있는 경우에만 그래프에 추가 (범례 라벨 추가)
-                if show_sma5 and has_valid_data(df['SMA5']):
-                    apds.append(mpf.make_addplot(df['SMA5'], panel=0, color='green', width=1, label='SMA5'))
-                else:
-                    if show_sma5:
-                        print("SMA5 has no valid data points, skipping in plot")
-                    else:
-                        print("SMA5 skipped as per user request")
-                    
-                if show_sma20 and has_valid_data(df['SMA20']):
-                    apds.append(mpf.make_addplot(df['SMA20'], panel=0, color='purple', width=1, label='SMA20'))
-                else:
-                    if show_sma20:
-                        print("SMA20 has no valid data points, skipping in plot")
-                    else:
-                        print("SMA20 skipped as per user request")
-                    
-                if show_sma60 and has_valid_data(df['SMA60']):
-                    apds.append(mpf.make_addplot(df['SMA60'], panel=0, color='orange', width=1, label='SMA60'))
-                else:
-                    if show_sma60:
-                        print("SMA60 has no valid data points, skipping in plot")
-                    else:
-                        print("SMA60 skipped as per user request")
-                
-                # 볼린저 밴드는 옵션이 활성화된 경우에만 추가
-                if show_bollinger:
-                    if has_valid_data(df['BB_High']):
-                        apds.append(mpf.make_addplot(df['BB_High'], panel=0, color='gray', width=1, linestyle='--', label='BB High'))
-                    else:
-                        print("BB_High has no valid data points, skipping in plot")
-                        
-                    if has_valid_data(df['BB_Middle']):
-                        apds.append(mpf.make_addplot(df['BB_Middle'], panel=0, color='black', width=1, label='BB Middle'))
-                    else:
-                        print("BB_Middle has no valid data points, skipping in plot")
-                        
-                    if has_valid_data(df['BB_Low']):
-                        apds.append(mpf.make_addplot(df['BB_Low'], panel=0, color='gray', width=1, linestyle='--', label='BB Low'))
-                    else:
-                        print("BB_Low has no valid data points, skipping in plot")
-                
-                # 지지선 추가 (파란색) - 범례에서 제외
-                blue_color = (0, 0, 1, 0.8)  # RGB 파란색에 80% 불투명도
-                for level in support_values:
-                    apds.append(mpf.make_addplot(
-                        [level] * len(df), 
-                        panel=0, 
-                        color=blue_color, 
-                        width=2, 
-                        linestyle='-'
-                    ))
-                    print(f"Added support line at price: {level} with blue color")
-                
-                # 저항선 추가 (빨간색) - 범례에서 제외
-                red_color = (1, 0, 0, 0.8)  # RGB 빨간색에 80% 불투명도
-                for level in resistance_values:
-                    apds.append(mpf.make_addplot(
-                        [level] * len(df), 
-                        panel=0, 
-                        color=red_color, 
-                        width=2, 
-                        linestyle='-'
-                    ))
-                    print(f"Added resistance line at price: {level} with red color")
-                
-                # RSI 패널을 옵션에 따라 추가 또는 생략
-                has_rsi = False
-                if show_rsi and has_valid_data(df['RSI'], min_valid_points=10):
-                    # RSI를 패널 2로 변경 (거래량과 분리)
-                    apds.append(mpf.make_addplot(df['RSI'], panel=2, color='orange', ylabel='RSI', label='RSI'))
-                    apds.append(mpf.make_addplot([70] * len(df), panel=2, color='red', linestyle='dashed', label='Overbought (70)'))
-                    apds.append(mpf.make_addplot([30] * len(df), panel=2, color='green', linestyle='dashed', label='Oversold (30)'))
-                    has_rsi = True
-                    print("Added RSI panel to chart")
-                else:
-                    if show_rsi:
-                        print("RSI has no valid data points or insufficient points, skipping in plot")
-                    else:
-                        print("RSI panel skipped as per user request")
-                
                 # 하이라이트할 타임스탬프들이 있는지 확인하고, 해당 시간의 캔들에 마커 표시
                 highlight_indices = []
                 if highlight_datetimes:
@@ -462,64 +379,33 @@ class ShortStockMarkTool(Tool):
                                     print(f"Hour difference: {min_hour_diff}")
                             else:
                                 print(f"No data found for date {target_date}")
-                    
-                    # 모든 하이라이트할 날짜에 대해 마커 표시
-                    if highlight_indices:
-                        highlight_points = [np.nan] * len(df)
-                        for idx in highlight_indices:
-                            highlight_points[idx] = df['High'].iloc[idx] * 1.03  # 고가보다 약간 위에 표시
-                        
-                        # 마커 표시 - 범례에서 제외
-                        apds.append(mpf.make_addplot(highlight_points, panel=0, type='scatter', 
-                                                  marker='*', markersize=900, color=(0, 0, 1, 0.1)))
-                        
-                        print(f"Added {len(highlight_indices)} highlight markers")
                 
                 try:
-                    # 캔들차트 생성 및 저장
-                    # 여기서부터 수정: 순차적 파일 이름 사용
-                    plot_filename, plot_index = self.get_next_available_filename()
-                    print(f"Creating chart for {ticker}... Saving as {plot_filename}")
+                    # 캔들차트 생성 및 저장 - 차트 매니페스트에서 순차적 파일 번호를 할당받음
+                    # chart_queue가 있으면 사양을 쌓아 두었다가 나중에 한꺼번에 그림
+                    manifest = self.get_chart_manifest()
+                    plot_filename, plot_index = manifest.allocate(ticker=ticker, interval='1h')
                     
-                    # 패널 비율 및 설정 변경
-                    # RSI가 활성화된 경우 3개 패널 (메인 차트, 거래량, RSI), 아니면 2개 패널 (메인 차트, 거래량)
-                    if has_rsi:
-                        panel_ratios = (4, 1, 1)  # 메인 차트, 거래량, RSI
-                    else:
-                        panel_ratios = (4, 1)  # 메인 차트, 거래량만
-                    
-                    # returnfig=True를 사용하여 figure와 axes를 받아옴
-                    fig, axes = mpf.plot(
-                        df,
-                        type='candle',
-                        volume=True,
-                        volume_panel=1,  # 거래량을 패널 1에 배치
-                        addplot=apds,
-                        panel_ratios=panel_ratios,  # 수정된 패널 비율
-                        figratio=(12,10),  # 세로 크기 약간 증가
-                        figscale=1.2,
-                        title=f"{ticker} - Technical Analysis (Candlestick)",
-                        style='yahoo',
-                        returnfig=True  # figure와 axes 반환
+                    spec = ChartSpec(
+                        ticker=ticker,
+                        interval='1h',
+                        filename=plot_filename,
+                        index=plot_index,
+                        data_key=make_base_key(ticker, '1h', chart_df),
+                        show_sma5=show_sma5,
+                        show_sma20=show_sma20,
+                        show_sma60=show_sma60,
+                        show_rsi=show_rsi,
+                        show_bollinger=show_bollinger,
+                        support_levels=support_values,
+                        resistance_levels=resistance_values,
+                        highlight_indices=highlight_indices,
                     )
-                    
-                    # 메인 차트 패널에 범례 추가 (캔들차트 + 이동평균선 + 볼린저 밴드)
-                    axes[0].legend(loc='upper left')
-                    
-                    # 거래량 패널 제목 추가
-                    axes[2].set_title('Volume', loc='left')
-                    
-                    # RSI 패널에 범례 추가 (RSI가 있는 경우)
-                    if has_rsi:
-                        # 여기서 axes[4]는 RSI 패널 (mplfinance에서 패널 인덱스가 0부터 시작하지만 
-                        # 실제 axes 배열에서는 다른 요소들이 포함되어 있어 인덱스가 다를 수 있음)
-                        axes[4].legend(loc='upper left')  
-                    
-                    # 그림 저장
-                    fig.savefig(plot_filename)
-                    plt.close(fig)
-                    
-                    print(f"Chart saved as {plot_filename}")
+                    if self.chart_queue is not None:
+                        self.chart_queue.submit(spec, chart_df)
+                    else:
+                        render_chart(spec, chart_df)
+                        manifest.mark(plot_filename, "rendered")
                     
                     # 날짜 형식 변환을 위해 reset_index
                     df_with_date = df.reset_index()
@@ -611,9 +497,12 @@ class ShortStockMarkTool(Tool):
         if results:
             try:
                 results_json = json.dumps(results, indent=2)
-                additional_file_path = os.path.join(os.getcwd(), "stock_technical_analysis.json")
-                with open(additional_file_path, "w", encoding="utf-8") as f:
+                # 중기/단기 차트 마킹이 동시에 실행되므로 구간별 파일에 임시 파일을 거쳐 저장
+                additional_file_path = run_path("stock_technical_analysis_short_chart.json")
+                tmp_path = f"{additional_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
                     f.write(results_json)
+                os.replace(tmp_path, additional_file_path)
                 print(f"Results saved to {additional_file_path}")
                 return results_json
             except Exception as e:
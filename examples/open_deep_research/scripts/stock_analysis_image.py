@@ -1,11 +1,12 @@
-import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
-import ta
 import tempfile
-import os
 from smolagents import Tool  # Assuming the base Tool class is available in this module
 
+from .indicators import memoized_indicators
+from .market_data import download_many
+from .run_context import run_path
+
 class StockAnalysisTool(Tool):
     name = "stock_analysis_tool"
     description = (
@@ -36,27 +37,22 @@ class StockAnalysisTool(Tool):
         if num_tickers == 1:
             axes = [[axes[0]], [axes[1]], [axes[2]]]
         
+        # 모든 티커를 한 번의 묶음 요청으로 다운로드
+        frames = download_many(ticker_list, period="250d", interval="1d")
+
         for col, ticker in enumerate(ticker_list):
-            # 250일치 일일 주가 데이터를 다운로드
-            df = yf.download(ticker, period="250d", interval="1d")
+            # 묶음 요청으로 받아 둔 히스토리컬 데이터 사용
+            df = frames.get(ticker, pd.DataFrame())
             if df.empty:
                 raise ValueError(f"Data for {ticker} could not be found.")
             df.reset_index(inplace=True)
-            close_series = df["Close"].squeeze()
-            
-            # 14일 RSI 계산
-            rsi_indicator = ta.momentum.RSIIndicator(close=close_series, window=14)
-            df["RSI"] = rsi_indicator.rsi()
-            
-            # 20일 단순 이동평균(SMA) 계산
-            sma_indicator = ta.trend.SMAIndicator(close=close_series, window=20)
-            df["SMA20"] = sma_indicator.sma_indicator()
-            
-            # 볼린저 밴드 계산 (20일 창, 2 표준편차)
-            bollinger = ta.volatility.BollingerBands(close=close_series, window=20, window_dev=2)
-            df["BB_High"] = bollinger.bollinger_hband()
-            df["BB_Low"] = bollinger.bollinger_lband()
-            df["BB_Middle"] = bollinger.bollinger_mavg()
+            # 기술적 지표 계산 - RSI(14일), 20일 이동평균선, 볼린저 밴드(20일, 2표준편차)
+            indicators = memoized_indicators(
+                ticker, "1d", df["Date"], df["Close"].to_numpy(dtype=float),
+                sma_windows=(20,), rsi_window=14, bb_window=20, bb_dev=2
+            )
+            for column, values in indicators.columns().items():
+                df[column] = values
             
             # --- Plot 1: 주가와 볼린저 밴드 ---
             ax = axes[0][col]
@@ -93,8 +89,8 @@ class StockAnalysisTool(Tool):
         
         plt.tight_layout()
         
-        # 현재 작업 디렉토리에 "stock_analysis.png"로도 저장 (추가 저장)
-        additional_file_path = os.path.join(os.getcwd(), "stock_analysis.png")
+        # 실행 작업 디렉토리에 "stock_analysis.png"로도 저장 (추가 저장)
+        additional_file_path = run_path("stock_analysis.png")
         plt.savefig(additional_file_path)
         
         # 임시 파일로 저장 후 그 파일 경로를 반환 (기존 동작)
@@ -1,8 +1,6 @@
 import yfinance as yf
 import pandas as pd
 import json
-import os
-import ta
 from datetime import datetime
 import mplfinance as mpf
 import matplotlib.pyplot as plt
@@ -10,6 +8,10 @@ import numpy as np
 
 from smolagents import Tool  # Assuming the base Tool class is available
 
+from .indicators import streaming_indicators
+from .market_data import download_many
+from .run_context import run_path
+
 class StockAnalysisShort(Tool):
     name = "stock_analysis_tool"
     description = (
@@ -70,20 +72,12 @@ class StockAnalysisShort(Tool):
         if not ticker_list:
             raise ValueError("No valid tickers provided.")
         
-        # 티커 유효성 검증
-        valid_tickers = []
-        invalid_tickers = []
-        for ticker in ticker_list:
-            try:
-                test_df = yf.download(ticker, period="1d", progress=False)
-                if not test_df.empty:
-                    valid_tickers.append(ticker)
-                else:
-                    invalid_tickers.append(ticker)
-                    print(f"Warning: Ticker {ticker} returned empty data. Skipping.")
-            except Exception as e:
-                invalid_tickers.append(ticker)
-                print(f"Invalid ticker: {ticker}. Error: {str(e)}")
+        # 모든 티커를 한 번의 묶음 요청으로 다운로드하고, 응답 데이터로 유효성 검증
+        frames = download_many(ticker_list, period="15d", interval="1h")
+        valid_tickers = [ticker for ticker in ticker_list if ticker in frames]
+        invalid_tickers = [ticker for ticker in ticker_list if ticker not in frames]
+        for ticker in invalid_tickers:
+            print(f"Warning: Ticker {ticker} returned empty data. Skipping.")
         
         if not valid_tickers:
             return "{}"
@@ -97,9 +91,8 @@ class StockAnalysisShort(Tool):
                 # 실시간 주가 정보 조회
                 realtime_data = self.get_stock_price(ticker)
                 
-                # 모든 주식에 대해 동일한 파라미터로 데이터 다운로드
-                print(f"Downloading stock data for {ticker}...")
-                df = yf.download(ticker, period="15d", interval="1h", progress=False)
+                # 묶음 요청으로 받아 둔 데이터 사용
+                df = frames[ticker]
                 
                 # 멀티인덱스 확인 및 처리
                 print(f"DataFrame shape for {ticker}: {df.shape}")
@@ -140,29 +133,18 @@ class StockAnalysisShort(Tool):
                     print("Converting index to DatetimeIndex...")
                     df.index = pd.to_datetime(df.index)
                 
-                # 기술적 지표 계산
-                close_series = df['Close']
-                
-                # (1) RSI 계산 - fillna=True 옵션 추가
-                rsi_indicator = ta.momentum.RSIIndicator(close=close_series, window=14)
-                df['RSI'] = rsi_indicator.rsi()
+                # 기술적 지표 계산 - 저장된 지표 상태에 새로 완성된 시간봉만 반영 (마지막 봉은 임시 계산)
+                indicators = streaming_indicators(
+                    df, ticker, period="15d", interval="1h", sma_windows=(5, 20, 60), rsi_window=14, bb_window=20, bb_dev=2
+                )
+                for column, values in indicators.columns().items():
+                    df[column] = values
                 
                 # RSI 값 상태 확인
                 print("RSI values sample:")
                 print(df['RSI'].tail(10))
                 print(f"RSI NaN count: {df['RSI'].isna().sum()} out of {len(df)}")
                 
-                # (2) 이동평균선 계산
-                df['SMA5'] = ta.trend.SMAIndicator(close=close_series, window=5).sma_indicator()
-                df['SMA20'] = ta.trend.SMAIndicator(close=close_series, window=20).sma_indicator()
-                df['SMA60'] = ta.trend.SMAIndicator(close=close_series, window=60).sma_indicator()
-                
-                # (3) 볼린저 밴드 계산
-                bollinger = ta.volatility.BollingerBands(close=close_series, window=20, window_dev=2)
-                df['BB_High'] = bollinger.bollinger_hband()
-                df['BB_Low'] = bollinger.bollinger_lband()
-                df['BB_Middle'] = bollinger.bollinger_mavg()
-                
                 # NaN 값 확인 및 처리
                 nan_count = df.isna().sum().sum()
                 if nan_count > 0:
@@ -249,7 +231,7 @@ class StockAnalysisShort(Tool):
                 
                 try:
                     # 캔들차트 생성 및 저장
-                    plot_filename = f"technical_analysis_short_term.png"
+                    plot_filename = run_path("technical_analysis_short_term.png")
                     print(f"Creating chart for {ticker}...")
                     
                     # 패널 비율 변경: 메인 차트, 거래량, RSI를 위한 3개 패널로 변경 (비율 4:1:1)
@@ -334,7 +316,7 @@ class StockAnalysisShort(Tool):
         if results:
             try:
                 results_json = json.dumps(results, indent=2)
-                additional_file_path = os.path.join(os.getcwd(), "stock_technical_analysis_short_term.json")
+                additional_file_path = run_path("stock_technical_analysis_short_term.json")
                 with open(additional_file_path, "w", encoding="utf-8") as f:
                     f.write(results_json)
                 print(f"Results saved to {additional_file_path}")
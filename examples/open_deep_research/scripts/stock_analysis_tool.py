@@ -1,11 +1,13 @@
 import yfinance as yf
 import pandas as pd
 import json
-import os
-import ta
 from datetime import datetime
 from smolagents import Tool  # Assuming the base Tool class is available
 
+from .indicators import memoized_indicators
+from .market_data import download_many
+from .run_context import run_path
+
 class StockAnalysisTool(Tool):
     name = "stock_analysis_tool"
     description = (
@@ -85,40 +87,26 @@ class StockAnalysisTool(Tool):
             
         results = {}
         
+        # 모든 티커를 한 번의 묶음 요청으로 다운로드
+        frames = download_many(ticker_list, period="250d", interval="1d")
+
         for ticker in ticker_list:
             # 실시간 주가 정보 가져오기
             realtime_data = self.get_stock_price(ticker)
             
-            # 히스토리컬 데이터 가져오기
-            df = yf.download(ticker, period="250d", interval="1d", progress=False)
+            # 묶음 요청으로 받아 둔 히스토리컬 데이터 사용
+            df = frames.get(ticker, pd.DataFrame())
             if df.empty:
                 raise ValueError(f"Data for {ticker} could not be found.")
             df.reset_index(inplace=True)
             
-            # [핵심] RSI 계산에 사용할 종가를 1차원 Series로 만든다
-            close_series = df["Close"].squeeze()
-                
-            # RSI (14일)
-            rsi_indicator = ta.momentum.RSIIndicator(close=close_series, window=14)
-            df["RSI"] = rsi_indicator.rsi()
-            
-            # 20일 이동평균선
-            sma20 = ta.trend.SMAIndicator(close=close_series, window=20).sma_indicator()
-            df["SMA20"] = sma20
-            
-            # 60일 이동평균선
-            sma60 = ta.trend.SMAIndicator(close=close_series, window=60).sma_indicator()
-            df["SMA60"] = sma60
-            
-            # 120일 이동평균선
-            sma120 = ta.trend.SMAIndicator(close=close_series, window=120).sma_indicator()
-            df["SMA120"] = sma120
-            
-            # 볼린저 밴드 (20일, 2표준편차)
-            bollinger = ta.volatility.BollingerBands(close=close_series, window=20, window_dev=2)
-            df["BB_High"] = bollinger.bollinger_hband()
-            df["BB_Low"] = bollinger.bollinger_lband()
-            df["BB_Middle"] = bollinger.bollinger_mavg()
+            # 기술적 지표 계산 - RSI(14일), 이동평균선(20/60/120일), 볼린저 밴드(20일, 2표준편차)
+            indicators = memoized_indicators(
+                ticker, "1d", df["Date"], df["Close"].to_numpy(dtype=float),
+                sma_windows=(20, 60, 120), rsi_window=14, bb_window=20, bb_dev=2
+            )
+            for column, values in indicators.columns().items():
+                df[column] = values
             
             # 최근 기술적 지표 값 가져오기
             latest_indicators = {
@@ -153,7 +141,7 @@ class StockAnalysisTool(Tool):
             }
             
         results_json = json.dumps(results, indent=2)
-        additional_file_path = os.path.join(os.getcwd(), "stock_analysis.json")
+        additional_file_path = run_path("stock_analysis.json")
         with open(additional_file_path, "w", encoding="utf-8") as f:
             f.write(results_json)
             
@@ -1,14 +1,16 @@
 import yfinance as yf
 import pandas as pd
 import json
-import os
-import ta
 from datetime import datetime
 import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use('Agg')
 from smolagents import Tool  # Assuming the base Tool class is available
 
+from .indicators import memoized_indicators
+from .market_data import download_many
+from .run_context import run_path
+
 class StockDataImageTool(Tool):
     name = "stock_analysis_tool"
     description = (
@@ -75,25 +77,12 @@ class StockDataImageTool(Tool):
         if not ticker_list:
             raise ValueError("No valid tickers provided.")
             
-        # Validate tickers before processing
-        valid_tickers = []
-        invalid_tickers = []
-        
-        for ticker in ticker_list:
-            try:
-                # Try to retrieve basic info to verify the ticker exists
-                stock = yf.Ticker(ticker)
-                # Check if we can download at least one day of data
-                test_df = yf.download(ticker, period="1d", progress=False)
-                
-                if not test_df.empty:
-                    valid_tickers.append(ticker)
-                else:
-                    invalid_tickers.append(ticker)
-                    print(f"Warning: Ticker {ticker} returned empty data. Skipping.")
-            except Exception as e:
-                invalid_tickers.append(ticker)
-                print(f"Invalid ticker: {ticker}. Error: {str(e)}")
+        # 모든 티커를 한 번의 묶음 요청으로 다운로드하고, 응답 데이터로 유효성 검증
+        frames = download_many(ticker_list, period="250d", interval="1d")
+        valid_tickers = [ticker for ticker in ticker_list if ticker in frames]
+        invalid_tickers = [ticker for ticker in ticker_list if ticker not in frames]
+        for ticker in invalid_tickers:
+            print(f"Warning: Ticker {ticker} returned empty data. Skipping.")
         
         if not valid_tickers: ###############################해결하기
             print("All tickers are invalid.")
@@ -108,23 +97,19 @@ class StockDataImageTool(Tool):
             # 실시간 주가 정보
             realtime_data = self.get_stock_price(ticker)
             
-            # 250일간의 히스토리컬 데이터 다운로드
-            df = yf.download(ticker, period="250d", interval="1d", progress=False)
+            # 묶음 요청으로 받아 둔 히스토리컬 데이터 사용
+            df = frames.get(ticker, pd.DataFrame())
             if df.empty:
                 raise ValueError(f"Data for {ticker} could not be found.")
             df.reset_index(inplace=True)
             
-            close_series = df["Close"].squeeze()
-                
-            # 기술적 지표 계산 - RSI와 볼린저 밴드 제거됨
-            sma20 = ta.trend.SMAIndicator(close=close_series, window=20).sma_indicator()
-            df["SMA20"] = sma20
-            
-            sma60 = ta.trend.SMAIndicator(close=close_series, window=60).sma_indicator()
-            df["SMA60"] = sma60
-            
-            sma120 = ta.trend.SMAIndicator(close=close_series, window=120).sma_indicator()
-            df["SMA120"] = sma120
+            # 기술적 지표 계산 - SMA만 계산 (RSI와 볼린저 밴드 제외)
+            indicators = memoized_indicators(
+                ticker, "1d", df["Date"], df["Close"].to_numpy(dtype=float),
+                sma_windows=(20, 60, 120), rsi_window=None, bb_window=None
+            )
+            for column, values in indicators.columns().items():
+                df[column] = values
             
             latest_indicators = {
                 "SMA20": float(df["SMA20"].iloc[-1]) if not pd.isna(df["SMA20"].iloc[-1]) else None,
@@ -148,7 +133,7 @@ class StockDataImageTool(Tool):
             plt.tight_layout()
             
             # 그래프를 파일로 저장
-            plot_filename = f"{ticker}_analysis.png"
+            plot_filename = run_path(f"{ticker}_analysis.png")
             plt.savefig(plot_filename)
             plt.close()
             
@@ -167,7 +152,7 @@ class StockDataImageTool(Tool):
             }
             
         results_json = json.dumps(results, indent=2)
-        additional_file_path = os.path.join(os.getcwd(), "stock_analysis.json")
+        additional_file_path = run_path("stock_analysis.json")
         with open(additional_file_path, "w", encoding="utf-8") as f:
             f.write(results_json)
             
@@ -1,10 +1,12 @@
 import yfinance as yf
 import pandas as pd
 import json
-import os
 from datetime import datetime
 from smolagents import Tool  # Assuming the base Tool class is available
 
+from .market_data import download_many
+from .run_context import run_path
+
 class StockDataTool(Tool):
     name = "stock_data_tool"
     description = (
@@ -71,12 +73,15 @@ class StockDataTool(Tool):
             
         results = {}
         
+        # 모든 티커를 한 번의 묶음 요청으로 다운로드
+        frames = download_many(ticker_list, period="200d", interval="1d")
+
         for ticker in ticker_list:
             # 실시간 주가 정보
             realtime_data = self.get_stock_price(ticker)
             
-            # 250일간의 히스토리컬 데이터 다운로드
-            df = yf.download(ticker, period="200d", interval="1d", progress=False)
+            # 묶음 요청으로 받아 둔 히스토리컬 데이터 사용
+            df = frames.get(ticker, pd.DataFrame())
             if df.empty:
                 raise ValueError(f"Data for {ticker} could not be found.")
             df.reset_index(inplace=True)
@@ -93,7 +98,7 @@ class StockDataTool(Tool):
             }
             
         results_json = json.dumps(results, indent=2)
-        additional_file_path = os.path.join(os.getcwd(), "stock_data.json")
+        additional_file_path = run_path("stock_data.json")
         with open(additional_file_path, "w", encoding="utf-8") as f:
             f.write(results_json)
             
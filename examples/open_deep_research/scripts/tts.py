@@ -0,0 +1,364 @@
+"""
+TTS 음성 합성 도우미
+
+영상 한 편에는 보통 80~150개의 문장 조각(쉼표/마침표 단위)이 있고, 조각마다
+client.audio.speech.create를 하나씩 기다리면 네트워크 지연이 전체 제작 시간을 좌우합니다.
+synthesize_segments는 조각 요청을 스레드 풀에서 동시에 보내고(동시 요청 수 제한),
+일시적인 오류(요청 한도 초과, 연결 오류, 서버 오류)는 지수 백오프로 다시 시도합니다.
+결과는 항상 입력한 조각 순서대로 반환합니다.
+
+인트로, 면책 문구처럼 실행마다 같은 문장이 많으므로, 합성한 음성은 (모델, 목소리, 텍스트)의
+해시를 키로 TTSCache에 저장해 두고 API를 호출하기 전에 먼저 확인합니다. 캐시는 인코딩된
+오디오와 측정한 길이를 함께 보관하며, 용량 상한을 넘으면 가장 오래 사용하지 않은 항목부터
+지웁니다. 영상(stock_analysis_video.py)과 팟캐스트(stock_podcast.py)가 같은 캐시를 사용합니다.
+
+실제 음성은 TTS 백엔드가 만듭니다.
+- OpenAITTSBackend: OpenAI audio.speech API (기본값)
+- LocalTTSBackend: 네트워크 없이 텍스트 길이에 비례한 길이의 무음/사인파 WAV를 만드는 결정적 백엔드.
+  API 비용 없이 음성 이후의 영상/팟캐스트 조립 과정을 측정하거나 점검할 때 사용합니다.
+  (scripts/benchmark_media.py 참고)
+
+환경 변수:
+- TTS_BACKEND: 사용할 TTS 백엔드 ("openai" 또는 "local", 기본값: openai)
+- TTS_MAX_CONCURRENCY: 동시에 보낼 TTS 요청 수 (기본값: 8)
+- TTS_MAX_RETRIES: 일시적인 오류에 대한 재시도 횟수 (기본값: 4)
+- TTS_CACHE_DIR: 음성 캐시 디렉토리 (기본값: ./tts_cache)
+- TTS_CACHE_MAX_MB: 음성 캐시 용량 상한(MB) (기본값: 500)
+"""
+
+import abc
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from .audio_probe import probe_duration
+
+
+DEFAULT_BACKEND = os.getenv("TTS_BACKEND", "openai")
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "8"))
+DEFAULT_MAX_RETRIES = int(os.getenv("TTS_MAX_RETRIES", "4"))
+DEFAULT_CACHE_DIR = os.path.abspath(os.getenv("TTS_CACHE_DIR", "tts_cache"))
+DEFAULT_CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "500")) * 1024 * 1024)
+
+
+@dataclass
+class SpeechSegment:
+    """
+    음성으로 만들 문장 조각 하나
+
+    Attributes:
+        text: 읽을 텍스트
+        path: 저장할 오디오 파일 경로
+        voice: 목소리 (예: "nova", "onyx")
+        model: TTS 모델 (예: "tts-1-hd")
+        duration: 오디오 길이(초). 캐시를 사용하면 합성 후 채워짐
+    """
+
+    text: str
+    path: str
+    voice: str = "nova"
+    model: str = "tts-1-hd"
+    duration: Optional[float] = None
+
+
+class TTSBackend(abc.ABC):
+    """
+    TTS 백엔드 인터페이스
+
+    synthesize(segment)는 segment.text를 음성으로 만들어 segment.path에 저장합니다.
+    길이를 이미 알고 있으면 segment.duration을 채워도 됩니다. (채우지 않으면 필요할 때 헤더로 측정)
+    """
+
+    name = "base"
+    # 캐시에 저장할 만큼 비싼 결과인지 여부 (로컬 백엔드의 결과가 실제 음성 캐시에 섞이지 않도록 함)
+    cacheable = True
+    # synthesize_speech가 다시 시도할 일시적인 오류 (요청 한도 초과, 연결 오류, 서버 오류 등)
+    retryable_errors = ()
+
+    @abc.abstractmethod
+    def synthesize(self, segment):
+        """segment.text를 음성으로 만들어 segment.path에 저장합니다."""
+
+
+class OpenAITTSBackend(TTSBackend):
+    """OpenAI audio.speech API로 MP3 음성을 합성하는 백엔드"""
+
+    name = "openai"
+
+    def __init__(self, client=None):
+        # openai 패키지는 이 백엔드에서만 필요하므로 여기서 가져옴 (로컬 백엔드는 openai 없이 오프라인에서 동작)
+        from openai import APIConnectionError, APITimeoutError, InternalServerError, OpenAI, RateLimitError
+
+        self.client = client or OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.retryable_errors = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+    def synthesize(self, segment):
+        response = self.client.audio.speech.create(model=segment.model, voice=segment.voice, input=segment.text)
+        response.stream_to_file(segment.path)
+
+
+class LocalTTSBackend(TTSBackend):
+    """
+    네트워크 없이 텍스트 길이에 비례한 길이의 WAV를 만드는 결정적 백엔드
+
+    같은 텍스트는 항상 같은 길이, 같은 내용의 오디오가 됩니다.
+    파일 확장자와 관계없이 WAV로 저장하며, probe_duration과 ffmpeg는 내용으로 형식을 판별합니다.
+
+    Args:
+        seconds_per_char (float): 공백을 제외한 글자당 길이(초) (기본값: 0.15, 한국어 낭독 속도 정도)
+        min_seconds (float): 조각 하나의 최소 길이(초)
+        tone_hz (float): 사인파 주파수. None이면 무음
+        sample_rate (int): 샘플레이트 (OpenAI TTS 출력과 같은 24kHz)
+    """
+
+    name = "local"
+    cacheable = False
+
+    def __init__(self, seconds_per_char=0.15, min_seconds=0.3, tone_hz=440.0, sample_rate=24000):
+        self.seconds_per_char = seconds_per_char
+        self.min_seconds = min_seconds
+        self.tone_hz = tone_hz
+        self.sample_rate = sample_rate
+
+    def duration_for(self, text):
+        chars = len("".join(text.split()))
+        return max(self.min_seconds, chars * self.seconds_per_char)
+
+    def synthesize(self, segment):
+        samples = int(round(self.duration_for(segment.text) * self.sample_rate))
+        if self.tone_hz:
+            t = np.arange(samples) / self.sample_rate
+            pcm = (0.2 * 32767 * np.sin(2 * math.pi * self.tone_hz * t)).astype("<i2")
+        else:
+            pcm = np.zeros(samples, dtype="<i2")
+        data = pcm.tobytes()
+
+        header = b"".join(
+            [
+                b"RIFF",
+                struct.pack("<I", 36 + len(data)),
+                b"WAVEfmt ",
+                struct.pack("<IHHIIHH", 16, 1, 1, self.sample_rate, self.sample_rate * 2, 2, 16),
+                b"data",
+                struct.pack("<I", len(data)),
+            ]
+        )
+        with open(segment.path, "wb") as f:
+            f.write(header)
+            f.write(data)
+        segment.duration = samples / self.sample_rate
+
+
+def get_tts_backend(name=None):
+    """
+    이름으로 TTS 백엔드를 만듭니다.
+
+    Args:
+        name (str): "openai" 또는 "local" (기본값: TTS_BACKEND 환경 변수 또는 openai)
+    """
+    name = name or DEFAULT_BACKEND
+    if name == "openai":
+        return OpenAITTSBackend()
+    if name == "local":
+        return LocalTTSBackend()
+    raise ValueError(f"Unknown TTS backend: {name}")
+
+
+def as_tts_backend(backend):
+    """TTS 백엔드를 그대로 반환하고, OpenAI 클라이언트를 넘기면 OpenAITTSBackend로 감쌉니다."""
+    if isinstance(backend, TTSBackend):
+        return backend
+    return OpenAITTSBackend(backend)
+
+
+class TTSCache:
+    """
+    (모델, 목소리, 텍스트) 해시를 키로 합성한 음성을 저장하는 디스크 캐시
+
+    - {키}.mp3: 인코딩된 오디오
+    - {키}.json: 모델, 목소리, 측정한 길이(초)
+    파일의 수정 시각을 마지막 사용 시각으로 쓰며, 전체 크기가 max_bytes를 넘으면
+    가장 오래 사용하지 않은 항목부터 삭제합니다.
+
+    Args:
+        cache_dir (str): 캐시 디렉토리
+        max_bytes (int): 캐시 용량 상한(바이트)
+        measure_fn (callable): 오디오 파일 경로 -> 길이(초). 새로 저장할 때 한 번만 호출 (기본값: 헤더 기반 probe_duration)
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, measure_fn=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = DEFAULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.measure_fn = measure_fn or probe_duration
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model, voice, text):
+        return hashlib.sha256(f"{model}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.mp3", f"{base}.json"
+
+    def fetch(self, segment):
+        """
+        캐시에 있으면 오디오를 segment.path로 복사하고 segment.duration을 채운 뒤 True를 반환합니다.
+        """
+        audio_path, meta_path = self._paths(self.make_key(segment.model, segment.voice, segment.text))
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            shutil.copyfile(audio_path, segment.path)
+            os.utime(audio_path)  # LRU: 마지막 사용 시각 갱신
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return False
+        segment.duration = meta.get("duration")
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, segment):
+        """합성한 segment.path의 오디오와 측정한 길이를 캐시에 저장합니다."""
+        key = self.make_key(segment.model, segment.voice, segment.text)
+        audio_path, meta_path = self._paths(key)
+        if segment.duration is None:
+            segment.duration = self.measure_fn(segment.path)
+
+        # 다른 스레드/프로세스가 읽는 도중에 깨진 파일을 보지 않도록 임시 파일에 쓴 뒤 교체
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(segment.path, f"{audio_path}.{suffix}")
+        os.replace(f"{audio_path}.{suffix}", audio_path)
+        with open(f"{meta_path}.{suffix}", "w", encoding="utf-8") as f:
+            json.dump({"model": segment.model, "voice": segment.voice, "duration": segment.duration}, f)
+        os.replace(f"{meta_path}.{suffix}", meta_path)
+        self.evict()
+
+    def evict(self):
+        """전체 크기가 상한을 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다."""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".mp3"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                for stale in (path, f"{path[: -len('.mp3')]}.json"):
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                print(f"Evicted cached speech {os.path.basename(path)}")
+                if total <= self.max_bytes:
+                    break
+
+
+_default_tts_cache = None
+_default_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """프로세스 전체에서 공유하는 기본 음성 캐시를 반환합니다."""
+    global _default_tts_cache
+    with _default_tts_cache_lock:
+        if _default_tts_cache is None:
+            _default_tts_cache = TTSCache()
+        return _default_tts_cache
+
+
+def synthesize_speech(backend, segment, max_retries=None, backoff=1.0, cache=None):
+    """
+    문장 조각 하나를 합성해 segment.path에 저장합니다.
+    backend는 TTSBackend 또는 OpenAI 클라이언트입니다.
+    cache가 있으면 먼저 확인하고, 새로 합성한 음성은 캐시에 저장합니다. (캐시하지 않는 백엔드는 무시)
+    일시적인 오류는 backoff * 2^시도횟수(+무작위 지연)초 기다린 뒤 다시 시도합니다.
+    """
+    backend = as_tts_backend(backend)
+    if not backend.cacheable:
+        cache = None
+    if cache is not None and cache.fetch(segment):
+        return segment.path
+
+    max_retries = DEFAULT_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        try:
+            backend.synthesize(segment)
+            if cache is not None:
+                cache.store(segment)
+            return segment.path
+        except backend.retryable_errors as e:
+            if attempt >= max_retries:
+                raise
+            delay = backoff * (2**attempt) + random.uniform(0, backoff)
+            attempt += 1
+            print(f"TTS request failed ({type(e).__name__}), retrying in {delay:.1f}s ({attempt}/{max_retries})")
+            time.sleep(delay)
+
+
+def synthesize_segments(backend, segments, max_workers=None, max_retries=None, backoff=1.0, cache=None):
+    """
+    여러 문장 조각을 동시에 합성합니다.
+
+    Args:
+        backend: TTSBackend 또는 OpenAI 클라이언트
+        segments (list[SpeechSegment]): 합성할 조각 (스크립트 순서)
+        max_workers (int): 동시에 보낼 요청 수 (기본값: TTS_MAX_CONCURRENCY)
+        max_retries (int): 조각별 재시도 횟수 (기본값: TTS_MAX_RETRIES)
+        backoff (float): 첫 재시도 대기 시간(초)
+        cache (TTSCache): 음성 캐시 (None이면 사용 안 함)
+
+    Returns:
+        list[str]: segments와 같은 순서의 오디오 파일 경로
+    """
+    if not segments:
+        return []
+    backend = as_tts_backend(backend)
+    if not backend.cacheable:
+        cache = None
+    max_workers = max(1, min(max_workers or DEFAULT_MAX_CONCURRENCY, len(segments)))
+    print(f"Synthesizing {len(segments)} speech segments with up to {max_workers} concurrent requests...")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map은 입력 순서대로 결과를 돌려주며, 조각 하나라도 최종 실패하면 예외를 전달
+        paths = list(
+            executor.map(
+                lambda segment: synthesize_speech(
+                    backend, segment, max_retries=max_retries, backoff=backoff, cache=cache
+                ),
+                segments,
+            )
+        )
+    elapsed = time.perf_counter() - start
+    if cache is not None:
+        print(f"Synthesized {len(paths)} segments in {elapsed:.1f}s ({cache.hits} cache hits, {cache.misses} misses)")
+    else:
+        print(f"Synthesized {len(paths)} segments in {elapsed:.1f}s")
+    return paths
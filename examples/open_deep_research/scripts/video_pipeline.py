@@ -0,0 +1,388 @@
+"""
+문단 단위 스트리밍 영상 파이프라인
+
+기존 stock_analysis_video.main은 스크립트 작성 -> 모든 차트 마킹 -> 모든 음성 합성 -> 전체 인코딩을
+차례로 실행해서, 완성까지 걸리는 시간이 각 단계 시간의 합이었습니다. StreamingVideoPipeline은
+문단마다 아래 단계를 거치며, 단계 사이를 크기가 제한된 대기열로 연결해 앞 문단의 인코딩, 다음
+문단의 음성 합성, 차트 마킹이 동시에 진행되도록 합니다.
+
+    스크립트 계획 -> [음성 합성] -> [차트 대기/타임라인] -> [문단 조각 인코딩] -> stream copy 이어붙이기
+
+- 음성 합성: 문단의 문장 조각을 TTS 백엔드와 synthesize_segments로 동시에 합성 (음성 캐시 사용)
+- 차트 대기: ChartManifest.wait_for_line으로 문단 마지막 라인까지 차트가 렌더링될 때까지 기다림
+- 조각 인코딩: 문단 기준 자막(SRT)과 함께 video_part_{문단}.mp4로 인코딩. 조각은 별도 ffmpeg
+  프로세스에서 최대 encode_workers개까지 동시에 인코딩됨
+- 마지막에 조각 영상을 다시 인코딩하지 않고 이어붙이고, 문단 음성 전체를 한 번에 인코딩해 넣어 최종 영상을 만듦
+  (조각 경계는 음성 누적 시간을 프레임 단위로 반올림한 시점이라 뒤 문단으로 갈수록 어긋나지 않음)
+
+대기열이 가득 차면 앞 단계가 기다리므로(backpressure) 인코딩을 기다리는 문단이 한꺼번에 쌓이지
+않으며, 완성 시간은 가장 느린 단계(보통 차트 마킹 에이전트)에 가까워집니다.
+
+환경 변수:
+- VIDEO_PIPELINE_QUEUE_SIZE: 단계 사이 대기열 크기(문단 수) (기본값: 2)
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .audio_probe import probe_duration
+from .run_context import bind_run_context, run_path
+from .tts import SpeechSegment, as_tts_backend, get_tts_cache, synthesize_segments
+from .video_render import (
+    DEFAULT_ENCODE_WORKERS,
+    TimelineEntry,
+    concat_videos,
+    encode_chunk,
+    encoder_threads,
+    frame_aligned_durations,
+    frame_size,
+)
+
+
+DEFAULT_QUEUE_SIZE = int(os.getenv("VIDEO_PIPELINE_QUEUE_SIZE", "2"))
+
+_DONE = object()
+
+
+def split_script_lines(script):
+    """문자열 또는 문자열 리스트 형태의 스크립트를 빈 줄을 제외한 라인 목록으로 나눕니다."""
+    if isinstance(script, str):
+        return [line.strip() for line in script.split('\n') if line.strip()]
+    lines = []
+    for item in script:
+        if isinstance(item, str):
+            lines.extend(line.strip() for line in item.split('\n') if line.strip())
+    return lines
+
+
+def paragraph_line_counts(script):
+    """빈 줄로 구분된 문단마다 (빈 줄을 제외한) 라인 수를 반환합니다."""
+    counts = []
+    for paragraph in re.split(r'\n\s*\n', script.strip()):
+        count = len([line for line in paragraph.split('\n') if line.strip()])
+        if count:
+            counts.append(count)
+    return counts
+
+
+@dataclass
+class LinePlan:
+    """
+    영상의 라인 하나
+
+    Attributes:
+        index: 영상 전체 기준 라인 번호 (차트 매니페스트의 line과 같음)
+        audio_segments: TTS로 읽을 문장 조각
+        subtitle_segments: audio_segments와 짝을 이루는 자막 조각
+    """
+
+    index: int
+    audio_segments: list
+    subtitle_segments: list
+
+
+def plan_script_lines(audio_script, subtitle_script):
+    """
+    음성/자막 스크립트를 라인별 문장 조각으로 나눕니다.
+    문장부호(마침표, 쉼표) 기준으로 분할하며, 조각이 없는 라인은 건너뜁니다.
+    """
+    audio_lines = split_script_lines(audio_script)
+    subtitle_lines = split_script_lines(subtitle_script)
+
+    # Ensure both scripts have the same number of lines
+    if len(audio_lines) != len(subtitle_lines):
+        print(
+            f"Warning: Audio script has {len(audio_lines)} lines "
+            f"but subtitle script has {len(subtitle_lines)} lines."
+        )
+        # Use the minimum number of lines
+        min_lines = min(len(audio_lines), len(subtitle_lines))
+        audio_lines = audio_lines[:min_lines]
+        subtitle_lines = subtitle_lines[:min_lines]
+
+    plans = []
+    for i, (audio_line, subtitle_line) in enumerate(zip(audio_lines, subtitle_lines)):
+        print(f"Processing line {i+1}/{len(audio_lines)}: {subtitle_line[:30]}...")
+
+        # 문장부호(마침표, 쉼표) 기준으로 세그먼트 분할 - 자연스러운 음성 흐름을 위함
+        audio_segments = [seg.strip() for seg in re.split(r'(?<=[.,])\s+', audio_line) if seg.strip()]
+        subtitle_segments = [seg.strip() for seg in re.split(r'(?<=[.,])\s+', subtitle_line) if seg.strip()]
+
+        # Ensure both have the same number of segments
+        if len(audio_segments) != len(subtitle_segments):
+            print(
+                f"Warning: Line {i+1} has {len(audio_segments)} audio segments "
+                f"but {len(subtitle_segments)} subtitle segments."
+            )
+            min_segments = min(len(audio_segments), len(subtitle_segments))
+            audio_segments = audio_segments[:min_segments]
+            subtitle_segments = subtitle_segments[:min_segments]
+
+        if audio_segments:  # Skip if no valid segments
+            plans.append(LinePlan(i, audio_segments, subtitle_segments))
+    return plans
+
+
+def group_paragraphs(plans, subtitle_script):
+    """
+    라인 계획을 자막 스크립트의 문단(빈 줄로 구분) 단위로 묶습니다.
+    라인 번호는 차트 매니페스트와 같은 기준(빈 줄을 세지 않음)입니다.
+
+    Returns:
+        list[list[LinePlan]]: 문단 순서대로의 라인 계획 (라인이 없는 문단은 제외)
+    """
+    boundaries = []
+    total = 0
+    for count in paragraph_line_counts(subtitle_script):
+        total += count
+        boundaries.append(total)
+
+    paragraphs = {}
+    for plan in plans:
+        number = next((k for k, end in enumerate(boundaries) if plan.index < end), len(boundaries) - 1)
+        paragraphs.setdefault(max(number, 0), []).append(plan)
+    return [paragraphs[number] for number in sorted(paragraphs)]
+
+
+@dataclass
+class ParagraphJob:
+    """파이프라인을 흐르는 문단 하나와 단계별 결과"""
+
+    number: int
+    lines: list
+    segments: list = field(default_factory=list)
+    timeline: list = field(default_factory=list)
+
+    @property
+    def last_line(self):
+        return self.lines[-1].index
+
+
+class StreamingVideoPipeline:
+    """
+    문단마다 음성 합성 -> 차트 대기 -> 조각 인코딩을 겹쳐서 실행하는 영상 파이프라인
+
+    Args:
+        tts_backend (TTSBackend): TTS 백엔드 (OpenAI 클라이언트도 가능)
+        chart_manifest (ChartManifest): 차트 마킹 단계가 라인별 차트와 준비 상태를 기록하는 매니페스트
+        tts_concurrency (int): 문단 안에서 동시에 보낼 TTS 요청 수
+        tts_cache (TTSCache): 음성 캐시 (기본값: 공유 캐시)
+        queue_size (int): 단계 사이 대기열 크기 (기본값: VIDEO_PIPELINE_QUEUE_SIZE)
+        fps (int): 출력 프레임레이트 (기본값: VIDEO_STILL_FPS)
+        encode_workers (int): 동시에 인코딩할 문단 조각 수 (기본값: VIDEO_ENCODE_WORKERS)
+        run_manifest (RunManifest): 있으면 조각을 실행 디렉토리에 남겨 두고, 재실행 시 바뀌지 않은 조각은 재사용
+    """
+
+    def __init__(
+        self,
+        tts_backend,
+        chart_manifest,
+        tts_concurrency=None,
+        tts_cache=None,
+        queue_size=None,
+        fps=None,
+        encode_workers=None,
+        run_manifest=None,
+    ):
+        self.tts_backend = as_tts_backend(tts_backend)
+        self.run_manifest = run_manifest
+        self.chart_manifest = chart_manifest
+        self.tts_concurrency = tts_concurrency
+        self.tts_cache = tts_cache or (get_tts_cache() if self.tts_backend.cacheable else None)
+        self.fps = fps
+        queue_size = queue_size or DEFAULT_QUEUE_SIZE
+        self._plan_queue = queue.Queue(maxsize=queue_size)
+        self._chart_queue = queue.Queue(maxsize=queue_size)
+        self._encode_queue = queue.Queue(maxsize=queue_size)
+        self.encode_workers = encode_workers or DEFAULT_ENCODE_WORKERS
+        self._encoder = ThreadPoolExecutor(max_workers=self.encode_workers)
+        self._encoding = deque()
+        self._size = None
+        self._error = None
+        self._threads = []
+        self.parts = []
+        self.audio_paths = []
+        self._audio_time = 0.0
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def start(self, script_source):
+        """
+        파이프라인을 시작합니다.
+
+        Args:
+            script_source (callable): (음성 스크립트, 자막 스크립트)를 반환하는 함수.
+                별도 스레드에서 호출되므로 음성용 스크립트 생성(LLM 호출)이 차트 마킹과 동시에 진행됨
+        """
+        stages = [
+            ("plan", lambda: self._feed(script_source)),
+            ("tts", lambda: self._run_stage("tts", self._synthesize, self._plan_queue, self._chart_queue)),
+            ("charts", lambda: self._run_stage("charts", self._attach_charts, self._chart_queue, self._encode_queue)),
+            ("encode", lambda: self._run_stage("encode", self._encode, self._encode_queue, None)),
+        ]
+        self._started = time.perf_counter()
+        for name, target in stages:
+            # 단계 스레드는 파이프라인을 시작한 실행의 작업 디렉토리에 음성과 조각 영상을 만듦
+            thread = threading.Thread(target=bind_run_context(target), name=f"video-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _fail(self, stage, error):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        print(f"Video pipeline stage '{stage}' failed: {str(error)}")
+
+    def _feed(self, script_source):
+        try:
+            audio_script, subtitle_script = script_source()
+            plans = plan_script_lines(audio_script, subtitle_script)
+
+            # 자막 스크립트의 문단 구분대로 라인을 묶음
+            for number, lines in enumerate(group_paragraphs(plans, subtitle_script)):
+                if self._error is not None:
+                    break
+                self._plan_queue.put(ParagraphJob(number, lines))
+        except Exception as e:
+            self._fail("plan", e)
+        finally:
+            self._plan_queue.put(_DONE)
+
+    def _run_stage(self, name, work, in_queue, out_queue):
+        # 오류가 나도 앞 단계가 대기열에서 막히지 않도록 끝까지 꺼내고, 다음 단계에 종료를 전달
+        elapsed = 0.0
+        while True:
+            job = in_queue.get()
+            if job is _DONE:
+                break
+            if self._error is not None:
+                continue
+            start = time.perf_counter()
+            try:
+                result = work(job)
+            except Exception as e:
+                self._fail(name, e)
+                continue
+            elapsed += time.perf_counter() - start
+            if out_queue is not None:
+                out_queue.put(result)
+        self.timings[name] = elapsed
+        if out_queue is not None:
+            out_queue.put(_DONE)
+
+    def _synthesize(self, job):
+        for plan in job.lines:
+            for j, text in enumerate(plan.audio_segments):
+                job.segments.append(
+                    SpeechSegment(
+                        text=text, path=run_path(f"audio_{plan.index}_{j}.mp3"), voice="nova", model="tts-1-hd"
+                    )
+                )
+        synthesize_segments(self.tts_backend, job.segments, max_workers=self.tts_concurrency, cache=self.tts_cache)
+        for segment in job.segments:
+            if segment.duration is None:
+                segment.duration = probe_duration(segment.path)
+        return job
+
+    def _attach_charts(self, job):
+        # 차트 마킹 단계가 문단 마지막 라인까지 렌더링할 때까지 대기
+        self.chart_manifest.wait_for_line(job.last_line)
+
+        segments = iter(job.segments)
+        for plan in job.lines:
+            img_path = self.chart_manifest.chart_for_line(plan.index)
+            if img_path is None:
+                raise FileNotFoundError(f"라인 {plan.index + 1}에 해당하는 기술적 분석 이미지를 찾을 수 없습니다.")
+            print(f"라인 {plan.index + 1} 차트 이미지: {img_path}")
+
+            for subtitle_segment in plan.subtitle_segments:
+                segment = next(segments)
+                job.timeline.append(
+                    TimelineEntry(
+                        image_path=img_path,
+                        audio_path=segment.path,
+                        duration=segment.duration,
+                        subtitle=subtitle_segment,
+                    )
+                )
+        return job
+
+    def _encode(self, job):
+        # 조각 영상을 stream copy로 이어붙이려면 모든 조각의 크기가 같아야 하므로 첫 문단 기준으로 고정
+        if self._size is None:
+            self._size = frame_size(job.timeline[0].image_path)
+
+        # 동시에 인코딩 중인 조각이 작업자 수만큼 있으면 가장 오래된 조각이 끝나길 기다림 (backpressure)
+        while len(self._encoding) >= self.encode_workers:
+            self._encoding.popleft().result()
+
+        part_path = f"video_part_{job.number}.mp4"
+        if self.run_manifest is not None:
+            part_path = self.run_manifest.path(part_path)
+        else:
+            part_path = run_path(part_path)
+        self.parts.append(part_path)
+        # 문단은 재생 순서대로 들어오므로 지금까지의 음성 길이를 기준으로 조각 길이를 프레임 단위로 맞춤
+        # (음성은 조각에 넣지 않고 finish에서 한 번에 인코딩하므로 그때까지 남겨 둠)
+        paragraph_time = sum(entry.duration for entry in job.timeline)
+        duration = frame_aligned_durations([paragraph_time], self.fps, start=self._audio_time)[0]
+        self._audio_time += paragraph_time
+        self.audio_paths.extend(entry.audio_path for entry in job.timeline)
+        self._encoding.append(self._encoder.submit(self._encode_part, job, part_path, duration))
+        return job
+
+    def _encode_part(self, job, part_path, duration):
+        encode_chunk(
+            job.timeline,
+            part_path,
+            self._size,
+            fps=self.fps,
+            threads=encoder_threads(self.encode_workers),
+            run_manifest=self.run_manifest,
+            duration=duration,
+        )
+        print(f"문단 {job.number + 1} 영상 조각 완료: {part_path}")
+
+    def finish(self, output_path="investment_analysis_video.mp4"):
+        """
+        모든 단계가 끝나기를 기다린 뒤 조각 영상을 이어붙여 최종 영상을 만듭니다.
+
+        Returns:
+            최종 영상 경로 (만들 조각이 없으면 None)
+        """
+        for thread in self._threads:
+            thread.join()
+        try:
+            # 아직 인코딩 중인 조각을 기다림 (실패한 조각의 예외는 여기서 전달됨)
+            while self._encoding:
+                try:
+                    self._encoding.popleft().result()
+                except Exception as e:
+                    self._fail("encode", e)
+            self._encoder.shutdown()
+            if self._error is not None:
+                raise self._error
+            if not self.parts:
+                print("Error: No clips were created. Check your input scripts.")
+                return None
+            concat_videos(self.parts, output_path, audio_paths=self.audio_paths)
+        finally:
+            for audio_path in self.audio_paths:
+                if os.path.exists(audio_path):
+                    os.remove(audio_path)
+            # 실행 매니페스트가 있으면 재실행 때 재사용하도록 조각을 남겨 둠
+            if self.run_manifest is None:
+                for part in self.parts:
+                    if os.path.exists(part):
+                        os.remove(part)
+
+        total = time.perf_counter() - self._started
+        stage_times = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self.timings.items())
+        print(f"Streaming video pipeline finished in {total:.1f}s (time per stage: {stage_times})")
+        return output_path
@@ -0,0 +1,447 @@
+"""
+투자 분석 영상 렌더러
+
+기존에는 moviepy write_videofile(fps=24)로 temp_video.mp4를 한 번 인코딩한 뒤, ffmpeg subtitles
+필터로 전체 영상을 다시 디코딩/인코딩해 자막을 입혔습니다. render_video_ffmpeg는 차트 이미지,
+세그먼트 음성, SRT 자막을 ffmpeg 한 번의 실행으로 묶어 최종 MP4를 만들므로 전체 길이의 중간
+영상 파일이 없고 인코딩도 한 번만 합니다.
+
+영상은 세그먼트 음성 길이만큼 정지한 차트 이미지의 연속이므로, 프레임을 파이썬에서 만들지 않고
+ffmpeg concat demuxer로 조립합니다.
+- 이미지: 같은 이미지가 이어지는 세그먼트를 하나로 묶은 (이미지, 길이) 목록 파일
+- 음성: 세그먼트 음성 파일 목록 (디코더 하나로 스트림 단위로 이어붙임)
+- 인코딩: -tune stillimage, 낮은 프레임레이트(VIDEO_STILL_FPS). 화면이 바뀌는 시점은 자막과
+  차트 전환뿐이라 초당 몇 프레임이면 충분하고, 인코딩 시간과 메모리가 크게 줄어듭니다.
+ffmpeg 실행이 실패하면 render_video가 기존 moviepy 경로(render_video_moviepy)로 대체합니다.
+
+x264 프로세스 하나로 전체 영상을 인코딩하면 코어 수가 늘어도 빨라지지 않으므로, 영상은 문단(중기/단기
+구간의 문단) 단위 조각으로 나누어 동시에 인코딩하고(render_video_chunked, 스트리밍 파이프라인),
+concat_videos로 다시 인코딩하지 않고(stream copy) 이어붙입니다. 이어붙인 영상이 정상적으로 재생되도록
+모든 조각은 같은 크기, 프레임레이트, GOP 길이로 인코딩하며 각 조각은 키프레임으로 시작합니다.
+
+조각마다 음성을 따로 AAC로 인코딩하면 조각 끝의 AAC 프레임(priming/padding)과 프레임 단위 반올림,
+-shortest 때문에 조각의 길이가 영상/음성마다 조금씩 달라지고, 이어붙인 뒤에는 그 차이가 누적되어 뒤
+문단일수록 음성과 화면/자막이 어긋났습니다. 그래서 조각에는 영상만 담고, 음성은 이어붙일 때 전체
+세그먼트 음성을 한 번에 인코딩합니다. 조각 경계는 음성 누적 시간을 프레임 단위로 반올림한 시점
+(frame_aligned_durations)이라 영상과 음성의 차이는 어느 위치에서도 반 프레임을 넘지 않습니다.
+
+환경 변수:
+- VIDEO_RENDER_BACKEND: "ffmpeg"(기본값) 또는 "moviepy"
+- VIDEO_STILL_FPS: ffmpeg 방식의 출력 프레임레이트 (기본값: 6)
+- VIDEO_ENCODE_WORKERS: 동시에 인코딩할 조각 수 (기본값: CPU 코어 수)
+- FFMPEG_BINARY: ffmpeg 실행 파일 경로 (기본값: ffmpeg, scripts/ffmpeg_utils.py 참고)
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .ffmpeg_utils import FFMPEG_BINARY, concat_file_line, write_concat_list
+from .run_context import run_path
+from .run_manifest import file_sha256, hash_inputs
+
+
+DEFAULT_BACKEND = os.getenv("VIDEO_RENDER_BACKEND", "ffmpeg")
+DEFAULT_STILL_FPS = int(os.getenv("VIDEO_STILL_FPS", "6"))
+DEFAULT_ENCODE_WORKERS = int(os.getenv("VIDEO_ENCODE_WORKERS", "0")) or os.cpu_count() or 1
+
+# 조각 영상을 stream copy로 이어붙일 수 있도록 모든 조각에 같은 값을 사용
+GOP_SECONDS = 10
+AUDIO_SAMPLE_RATE = 24000  # OpenAI TTS 출력 샘플레이트
+AUDIO_CHANNELS = 1
+
+# 한글 자막 스타일 (기존 ffmpeg 자막 추가 단계와 동일)
+SUBTITLE_STYLE = "FontSize=18,BorderStyle=0,Outline=0.2,PrimaryColour=ffffff,MarginV=10"
+
+
+@dataclass
+class TimelineEntry:
+    """
+    영상의 세그먼트 하나 (차트 이미지 + 음성)
+
+    Attributes:
+        image_path: 세그먼트 동안 보여줄 차트 이미지
+        audio_path: 세그먼트 음성 파일
+        duration: 음성 길이(초). 자막 시간도 이 값의 누적값으로 계산됨
+        subtitle: 세그먼트 동안 표시할 자막
+    """
+
+    image_path: str
+    audio_path: str
+    duration: float
+    subtitle: str = ""
+
+
+def format_srt_time(seconds):
+    """Convert seconds to SRT format time (HH:MM:SS,mmm)"""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millisecs = int((seconds - int(seconds)) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
+
+
+def write_srt(timeline, srt_path):
+    """타임라인의 자막을 세그먼트 길이의 누적값으로 시간을 매겨 SRT 파일로 저장합니다."""
+    entries = []
+    current_time = 0.0
+    for number, entry in enumerate(timeline, 1):
+        start_str = format_srt_time(current_time)
+        end_str = format_srt_time(current_time + entry.duration)
+        entries.append(f"{number}\n{start_str} --> {end_str}\n{entry.subtitle}\n")
+        current_time += entry.duration
+    with open(srt_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(entries))
+    return srt_path
+
+
+def group_image_runs(timeline):
+    """
+    같은 이미지가 이어지는 세그먼트를 묶어 (이미지 경로, 길이(초)) 목록을 반환합니다.
+    """
+    runs = []
+    for entry in timeline:
+        if runs and runs[-1][0] == entry.image_path:
+            runs[-1][1] += entry.duration
+        else:
+            runs.append([entry.image_path, entry.duration])
+    return [(image_path, duration) for image_path, duration in runs if duration > 0]
+
+
+def frame_aligned_durations(durations, fps=None, start=0.0):
+    """
+    이어서 재생할 구간들의 길이(초)를 프레임 단위로 맞춘 길이 목록을 반환합니다.
+
+    구간마다 따로 반올림하지 않고 누적 시간(start부터)을 반올림한 시점을 경계로 삼으므로, 구간이
+    많아도 경계와 실제 누적 시간의 차이가 반 프레임을 넘지 않습니다.
+    """
+    fps = fps or DEFAULT_STILL_FPS
+    aligned = []
+    for duration in durations:
+        end = start + duration
+        aligned.append((round(end * fps) - round(start * fps)) / fps)
+        start = end
+    return aligned
+
+
+def write_concat_lists(timeline, list_dir):
+    """
+    concat demuxer용 이미지 목록과 음성 목록 파일을 만듭니다.
+
+    Returns:
+        (이미지 목록 경로, 음성 목록 경로)
+    """
+    runs = group_image_runs(timeline)
+    image_lines = []
+    for image_path, duration in runs:
+        image_lines += [concat_file_line(image_path), f"duration {duration:.6f}"]
+    # concat demuxer는 마지막 항목의 duration을 무시하므로 마지막 이미지를 한 번 더 적음
+    image_lines.append(concat_file_line(runs[-1][0]))
+
+    image_list = os.path.join(list_dir, "images.txt")
+    audio_list = os.path.join(list_dir, "audio.txt")
+    with open(image_list, "w", encoding="utf-8") as f:
+        f.write("\n".join(image_lines) + "\n")
+    write_concat_list([entry.audio_path for entry in timeline], audio_list)
+    return image_list, audio_list
+
+
+def _escape_filter_path(path):
+    """filtergraph 옵션 값으로 쓸 수 있도록 경로의 특수문자를 이스케이프합니다."""
+    return path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+
+def frame_size(image_path):
+    """yuv420p 인코딩에 맞게 짝수로 맞춘 이미지 크기 (너비, 높이)"""
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        width, height = img.size
+    return width - width % 2, height - height % 2
+
+
+def build_ffmpeg_command(
+    image_list,
+    audio_list,
+    srt_path,
+    output_path,
+    size,
+    fps=None,
+    threads=0,
+    subtitle_style=SUBTITLE_STYLE,
+    duration=None,
+):
+    """
+    concat 목록의 이미지/음성과 자막을 한 번에 인코딩하는 ffmpeg 명령을 만듭니다.
+
+    Args:
+        image_list (str): 이미지 concat 목록 파일
+        audio_list (str): 음성 concat 목록 파일 (None이면 영상만 인코딩)
+        srt_path (str): 입힐 SRT 자막 파일 (None이면 자막 없음)
+        output_path (str): 최종 MP4 경로
+        size (tuple): 출력 영상 크기 (너비, 높이)
+        fps (int): 출력 프레임레이트 (기본값: VIDEO_STILL_FPS)
+        threads (int): x264 스레드 수 (0이면 자동). 조각을 동시에 인코딩할 때 코어를 나누어 사용
+        duration (float): 영상 길이(초). 지정하면 마지막 프레임을 늘리거나 잘라 정확히 이 길이로 맞춤
+
+    Returns:
+        list[str]: subprocess에 넘길 명령
+    """
+    fps = fps or DEFAULT_STILL_FPS
+    width, height = size
+
+    # 차트마다 크기가 다를 수 있으므로 첫 이미지 크기에 맞춰 축소/여백 처리
+    # 크기/색공간 변환을 fps 필터 앞에 두어, 변환은 이미지마다 한 번만 하고 복제된 프레임은 그대로 사용
+    video_filter = (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,format=yuv420p,fps={fps}"
+    )
+    if srt_path:
+        video_filter += f",subtitles=filename='{_escape_filter_path(srt_path)}':force_style='{subtitle_style}'"
+    if duration is not None:
+        video_filter += ",tpad=stop_mode=clone:stop=-1"
+
+    if audio_list is None:
+        audio_input = []
+        audio_options = ["-an"]
+    else:
+        audio_input = ["-f", "concat", "-safe", "0", "-i", audio_list, "-map", "1:a"]
+        # TTS 음성은 24kHz 모노라 AAC 기본 비트레이트로 충분 (높게 지정하면 인코딩만 느려짐)
+        audio_options = ["-c:a", "aac", "-ar", str(AUDIO_SAMPLE_RATE), "-ac", str(AUDIO_CHANNELS), "-shortest"]
+    length_options = [] if duration is None else ["-t", f"{duration:.6f}"]
+
+    return [
+        FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", image_list,
+        "-map", "0:v",
+        *audio_input,
+        "-vf", video_filter,
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "stillimage", "-pix_fmt", "yuv420p", "-r", str(fps),
+        # 고정 GOP: 조각마다 키프레임 간격이 같아 이어붙인 뒤에도 탐색(seek) 간격이 일정함
+        "-g", str(fps * GOP_SECONDS), "-keyint_min", str(fps * GOP_SECONDS), "-sc_threshold", "0",
+        "-threads", str(threads),
+        *audio_options,
+        *length_options,
+        "-movflags", "+faststart",
+        output_path,
+    ]
+
+
+def render_video_ffmpeg(timeline, srt_path, output_path, fps=None, size=None, threads=0, duration=None, audio=True):
+    """
+    concat 목록으로 이미지와 음성을 이어붙여 자막이 입혀진 영상을 한 번에 인코딩합니다.
+    size를 지정하지 않으면 첫 이미지 크기를 사용합니다.
+    audio가 False면 영상만 인코딩하고, duration을 지정하면 영상 길이를 정확히 그 길이로 맞춥니다.
+    """
+    print(f"FFmpeg로 {len(timeline)}개 세그먼트를 한 번에 인코딩하는 중...")
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="video_concat_") as list_dir:
+        image_list, audio_list = write_concat_lists(timeline, list_dir)
+        command = build_ffmpeg_command(
+            image_list,
+            audio_list if audio else None,
+            srt_path,
+            output_path,
+            size or frame_size(timeline[0].image_path),
+            fps=fps,
+            threads=threads,
+            duration=duration,
+        )
+        subprocess.run(command, check=True)
+    print(f"Encoded {output_path} in {time.perf_counter() - start:.1f}s")
+    return output_path
+
+
+def chunk_fingerprint(timeline, size, fps=None, duration=None):
+    """조각 영상의 입력(차트 파일 내용, 세그먼트 길이, 자막, 조각 길이, 인코딩 설정) 해시"""
+    return hash_inputs(
+        list(size),
+        fps or DEFAULT_STILL_FPS,
+        GOP_SECONDS,
+        duration,
+        [(file_sha256(e.image_path), round(e.duration, 3), e.subtitle) for e in timeline],
+    )
+
+
+def encode_chunk(timeline, part_path, size, fps=None, threads=0, run_manifest=None, duration=None):
+    """
+    조각 하나의 영상을 조각 기준 시간의 자막과 함께 인코딩합니다. (자막 파일은 인코딩 후 삭제)
+    음성은 담지 않으며(concat_videos에서 한 번에 인코딩), duration(frame_aligned_durations로 계산한
+    조각 길이)을 지정하면 영상 길이를 그 길이로 맞춥니다.
+
+    run_manifest가 있으면 같은 입력으로 이미 인코딩한 조각은 건너뛰고, 새로 인코딩한 조각을 기록합니다.
+    """
+    if run_manifest is not None:
+        name = f"chunks/{os.path.basename(part_path)}"
+        inputs = chunk_fingerprint(timeline, size, fps, duration)
+        if run_manifest.is_fresh(name, inputs):
+            print(f"Reusing encoded chunk {part_path}")
+            return part_path
+
+    srt_path = write_srt(timeline, f"{os.path.splitext(part_path)[0]}.srt")
+    try:
+        render_video_ffmpeg(
+            timeline, srt_path, part_path, fps=fps, size=size, threads=threads, duration=duration, audio=False
+        )
+    finally:
+        os.remove(srt_path)
+    if run_manifest is not None:
+        run_manifest.record(name, inputs, [part_path])
+    return part_path
+
+
+def encoder_threads(max_workers):
+    """조각을 max_workers개 동시에 인코딩할 때 x264 프로세스 하나가 쓸 스레드 수"""
+    return max(1, (os.cpu_count() or 1) // max_workers)
+
+
+def render_video_chunked(chunks, output_path, fps=None, max_workers=None, run_manifest=None):
+    """
+    조각(문단)별 타임라인을 동시에 인코딩한 뒤 stream copy로 이어붙여 최종 영상을 만듭니다.
+
+    각 조각은 별도의 ffmpeg 프로세스에서 인코딩되므로 스레드 풀로 프로세스를 띄우기만 하면
+    코어 수만큼 동시에 인코딩됩니다.
+
+    Args:
+        chunks (list[list[TimelineEntry]]): 재생 순서대로의 조각별 타임라인
+        output_path (str): 최종 MP4 경로
+        fps (int): 출력 프레임레이트 (기본값: VIDEO_STILL_FPS)
+        max_workers (int): 동시에 인코딩할 조각 수 (기본값: VIDEO_ENCODE_WORKERS)
+        run_manifest (RunManifest): 있으면 조각을 실행 디렉토리에 남겨 두고, 재실행 시 바뀌지 않은 조각은 재사용
+    """
+    chunks = [chunk for chunk in chunks if chunk]
+    max_workers = max(1, min(max_workers or DEFAULT_ENCODE_WORKERS, len(chunks)))
+    size = frame_size(chunks[0][0].image_path)
+    threads = encoder_threads(max_workers)
+    # 조각은 실행 디렉토리(실행 매니페스트가 있으면 그 디렉토리, 없으면 현재 실행의 작업 디렉토리)에 저장
+    part_dir_path = run_manifest.path if run_manifest is not None else run_path
+    part_paths = [part_dir_path(f"video_part_{k}.mp4") for k in range(len(chunks))]
+    durations = frame_aligned_durations([sum(entry.duration for entry in chunk) for chunk in chunks], fps)
+    print(f"{len(chunks)}개 조각을 {max_workers}개씩 동시에 인코딩하는 중...")
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(
+                executor.map(
+                    lambda k: encode_chunk(
+                        chunks[k],
+                        part_paths[k],
+                        size,
+                        fps=fps,
+                        threads=threads,
+                        run_manifest=run_manifest,
+                        duration=durations[k],
+                    ),
+                    range(len(chunks)),
+                )
+            )
+        concat_videos(part_paths, output_path, audio_paths=[entry.audio_path for chunk in chunks for entry in chunk])
+    finally:
+        # 실행 매니페스트가 있으면 재실행 때 재사용하도록 조각을 남겨 둠
+        if run_manifest is None:
+            for part_path in part_paths:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+    print(f"Encoded {len(chunks)} chunks into {output_path} in {time.perf_counter() - start:.1f}s")
+    return output_path
+
+
+def concat_videos(video_paths, output_path, audio_paths=None):
+    """
+    같은 크기/코덱으로 인코딩한 조각 영상들을 다시 인코딩하지 않고(stream copy) 이어붙입니다.
+
+    audio_paths(재생 순서대로의 세그먼트 음성)를 주면 조각의 음성 대신 이 음성들을 이어붙여 한 번에
+    AAC로 인코딩해 넣습니다. 음성 인코딩은 영상 인코딩에 비해 매우 가벼워 전체 시간에 거의 영향이 없습니다.
+    """
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="video_concat_") as list_dir:
+        list_path = write_concat_list(video_paths, os.path.join(list_dir, "parts.txt"))
+        if audio_paths:
+            audio_list = write_concat_list(audio_paths, os.path.join(list_dir, "audio.txt"))
+            streams = [
+                "-f", "concat", "-safe", "0", "-i", audio_list,
+                "-map", "0:v", "-map", "1:a", "-c:v", "copy",
+                "-c:a", "aac", "-ar", str(AUDIO_SAMPLE_RATE), "-ac", str(AUDIO_CHANNELS),
+            ]
+        else:
+            streams = ["-c", "copy"]
+        subprocess.run(
+            [
+                FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                *streams, "-movflags", "+faststart",
+                output_path,
+            ],
+            check=True,
+        )
+    print(f"Joined {len(video_paths)} parts into {output_path} in {time.perf_counter() - start:.1f}s")
+    return output_path
+
+
+def render_video_moviepy(timeline, output_path, fps=None):
+    """
+    moviepy로 임시 영상을 만든 뒤 ffmpeg로 자막을 입히는 기존 방식 (ffmpeg 인코딩의 대체 경로)
+    """
+    from moviepy import AudioFileClip, ImageClip, concatenate_videoclips
+
+    clips = []
+    for entry in timeline:
+        audio_clip = AudioFileClip(entry.audio_path)
+        clips.append(ImageClip(entry.image_path).with_duration(entry.duration).with_audio(audio_clip))
+    final_video = concatenate_videoclips(clips)
+    fps = fps or 24
+
+    temp_video_path = run_path("temp_video.mp4")
+    print(f"임시 비디오를 {temp_video_path}에 저장 중...")
+    final_video.write_videofile(temp_video_path, fps=fps)
+
+    srt_path = write_srt(timeline, run_path("subtitles.srt"))
+    try:
+        print("FFmpeg로 자막 추가 중...")
+        # FFmpeg를 사용하여 자막을 비디오에 하드코딩 (한글 지원, 스타일 적용)
+        subprocess.run([
+            FFMPEG_BINARY, "-y",
+            "-i", temp_video_path,
+            "-vf", f"subtitles={srt_path}:force_style='{SUBTITLE_STYLE}'",
+            "-c:a", "copy",
+            output_path
+        ], check=True)
+        print("자막이 성공적으로 추가되었습니다!")
+    except Exception as e:
+        print(f"자막 추가 중 오류 발생: {e}")
+        print("자막 없는 비디오로 대체합니다...")
+        shutil.copy(temp_video_path, output_path)
+    finally:
+        os.remove(temp_video_path)
+        os.remove(srt_path)
+    return output_path
+
+
+def render_video(chunks, output_path, fps=None, backend=None, max_workers=None, run_manifest=None):
+    """
+    설정된 방식으로 최종 영상을 만듭니다. ffmpeg 방식이 실패하면 moviepy 방식으로 대체합니다.
+
+    Args:
+        chunks (list[list[TimelineEntry]]): 재생 순서대로의 조각(문단)별 타임라인
+        output_path (str): 최종 MP4 경로
+        fps (int): 출력 프레임레이트 (기본값: ffmpeg는 VIDEO_STILL_FPS, moviepy는 24)
+        backend (str): "ffmpeg" 또는 "moviepy" (기본값: VIDEO_RENDER_BACKEND)
+        max_workers (int): ffmpeg 방식에서 동시에 인코딩할 조각 수
+        run_manifest (RunManifest): ffmpeg 방식에서 조각을 재사용할 실행 매니페스트
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend == "ffmpeg":
+        try:
+            return render_video_chunked(
+                chunks, output_path, fps=fps, max_workers=max_workers, run_manifest=run_manifest
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"FFmpeg 조각 인코딩 실패: {e}")
+            print("moviepy 방식으로 대체합니다...")
+    timeline = [entry for chunk in chunks for entry in chunk]
+    return render_video_moviepy(timeline, output_path, fps=fps)
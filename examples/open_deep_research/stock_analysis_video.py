@@ -29,9 +29,19 @@ from scripts.stock_analysis_short import StockAnalysisShort
 from scripts.stock_analysis_mid import StockAnalysisMid
 from scripts.mid_stock_mark_tool import MidStockMarkTool
 from scripts.short_stock_mark_tool import ShortStockMarkTool
+from scripts.chart_render import ChartQueue
+from scripts.chart_manifest import ChartManifest, get_chart_manifest
+from scripts.chart_plan import ChartPlanner
+from scripts.run_manifest import hash_inputs
+from scripts.run_context import RunContext, run_path, use_run_context
+from scripts.pipeline import Pipeline
+from scripts.agent_runner import run_parallel
+from scripts.tts import SpeechSegment, get_tts_backend, get_tts_cache, synthesize_segments
+from scripts.audio_probe import probe_duration
+from scripts.video_render import DEFAULT_BACKEND, TimelineEntry, render_video
+from scripts.video_pipeline import StreamingVideoPipeline, group_paragraphs, plan_script_lines
 
 from pathlib import Path
-from openai import OpenAI
 from pydub import AudioSegment  # For audio processing
 from moviepy import *  # For video creation
 import re
@@ -46,6 +56,42 @@ def parse_args():
         help="for example: 'How many studio albums did Mercedes Sosa release before 2007?'"
     )
     parser.add_argument("--model-id", type=str, default="o3-mini")
+    parser.add_argument(
+        "--chart-workers", type=int, default=None,
+        help="차트 이미지를 그리는 작업자 프로세스 수 (기본값: CPU 코어 수)"
+    )
+    parser.add_argument(
+        "--tts-concurrency", type=int, default=None,
+        help="동시에 보낼 TTS 요청 수 (기본값: 8)"
+    )
+    parser.add_argument(
+        "--video-backend", type=str, choices=["ffmpeg", "moviepy"], default=None,
+        help="최종 영상 인코딩 방식 (기본값: ffmpeg로 문단 조각을 동시에 인코딩, 실패 시 moviepy)"
+    )
+    parser.add_argument(
+        "--chart-planning", type=str, choices=["batch", "per-line"], default="batch",
+        help="차트 마킹 방식 (batch: 문단마다 한 번의 호출로 라인별 차트 계획, per-line: 문장마다 에이전트 실행)"
+    )
+    parser.add_argument(
+        "--agent-workers", type=int, default=None,
+        help="서로 독립적인 에이전트(스크립트 변환, 문단 다듬기, 구간별 차트 마킹)를 동시에 실행할 수 (기본값: 4)"
+    )
+    parser.add_argument(
+        "--tts-backend", type=str, choices=["openai", "local"], default=None,
+        help="TTS 백엔드 (기본값: TTS_BACKEND 환경 변수 또는 openai). local은 API 없이 길이만 맞춘 음성을 생성"
+    )
+    parser.add_argument(
+        "--run-id", type=str, default=None,
+        help="실행 ID. 실패한 실행을 같은 ID로 다시 실행하면 완료된 단계는 건너뜀 (기본값: 현재 시각)"
+    )
+    parser.add_argument(
+        "--encode-workers", type=int, default=None,
+        help="동시에 인코딩할 문단 조각 수 (기본값: CPU 코어 수)"
+    )
+    parser.add_argument(
+        "--cleanup", action="store_true",
+        help="영상 완성 후 실행 디렉토리의 차트 이미지/분석 파일을 삭제 (같은 --run-id로 재실행하면 차트를 다시 만듦)"
+    )
     return parser.parse_args()
 
 
@@ -129,7 +175,7 @@ def create_agent(model_id="claude-3-7-sonnet-latest"):
 
 prompt = GRAPH_MARK_AGENT_PROMPT
 
-def create_midgraphmark_agent(model_id="claude-3-7-sonnet-latest"):
+def create_midgraphmark_agent(model_id="claude-3-7-sonnet-latest", chart_queue=None):
     """중기 분석용 차트 마킹 에이전트 - 분석 내용에 따라 차트에 기술적 지표를 표시"""
     text_limit = 100000
 
@@ -145,7 +191,7 @@ def create_midgraphmark_agent(model_id="claude-3-7-sonnet-latest"):
     # 중기 차트 마킹 도구를 사용하는 에이전트
     manager_agent = ToolCallingAgent(      
         model=model,
-        tools =[MidStockMarkTool()],  # 일봉 차트 마킹 도구
+        tools =[MidStockMarkTool(chart_queue=chart_queue)],  # 일봉 차트 마킹 도구
         max_steps=1,
         verbosity_level=2,
         planning_interval=10,
@@ -156,7 +202,7 @@ def create_midgraphmark_agent(model_id="claude-3-7-sonnet-latest"):
     manager_agent.prompt_templates["managed_agent"]["task"] = MANAGED_AGENT_TASK_TEMPLATE
     return manager_agent
 
-def create_shortgraphmark_agent(model_id="claude-3-7-sonnet-latest"):
+def create_shortgraphmark_agent(model_id="claude-3-7-sonnet-latest", chart_queue=None):
     """단기 분석용 차트 마킹 에이전트 - 단기 트레이딩 관점의 차트 마킹"""
     text_limit = 100000
 
@@ -172,7 +218,7 @@ def create_shortgraphmark_agent(model_id="claude-3-7-sonnet-latest"):
     # 단기 차트 마킹 도구를 사용하는 에이전트
     manager_agent = ToolCallingAgent(      
         model=model,
-        tools =[ShortStockMarkTool()],  # 시간봉 차트 마킹 도구
+        tools =[ShortStockMarkTool(chart_queue=chart_queue)],  # 시간봉 차트 마킹 도구
         max_steps=1,
         verbosity_level=2,
         planning_interval=10,
@@ -183,6 +229,28 @@ def create_shortgraphmark_agent(model_id="claude-3-7-sonnet-latest"):
     manager_agent.prompt_templates["managed_agent"]["task"] = MANAGED_AGENT_TASK_TEMPLATE
     return manager_agent
 
+def create_chart_planner_model():
+    """배치 차트 계획용 LLM 모델 (차트 마킹 에이전트와 같은 모델과 설정)"""
+    return LiteLLMModel(
+        model_id="anthropic/claude-3-7-sonnet-latest",
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        custom_role_conversions=custom_role_conversions,
+        max_completion_tokens=8192*2,
+        temperature = 0.001
+    )
+
+def create_midchart_planner(model_id="claude-3-7-sonnet-latest", chart_queue=None):
+    """중기 분석용 배치 차트 계획기 - 문단 하나의 라인별 일봉 차트 사양을 한 번의 호출로 생성"""
+    return ChartPlanner(
+        create_chart_planner_model(), MidStockMarkTool(chart_queue=chart_queue), GRAPH_MARK_BATCH_PROMPT
+    )
+
+def create_shortchart_planner(model_id="claude-3-7-sonnet-latest", chart_queue=None):
+    """단기 분석용 배치 차트 계획기 - 문단 하나의 라인별 시간봉 차트 사양을 한 번의 호출로 생성"""
+    return ChartPlanner(
+        create_chart_planner_model(), ShortStockMarkTool(chart_queue=chart_queue), GRAPH_MARK_BATCH_PROMPT
+    )
+
 ####################################################### 스크립트 생성 에이전트들 ###################################################################################
 # 분석 리포트를 비디오용 스크립트로 변환하는 에이전트들
 
@@ -266,7 +334,153 @@ def create_final_prompt_agent(model_id="claude-3-7-sonnet-latest"):
 
 ####################################################### 비디오 생성 함수 #####################################################################################
 
-def create_investment_video(audio_script, subtitle_script):
+def create_paragraph_charts(
+    graphmark_agent,
+    paragraph,
+    section,
+    paragraph_index,
+    first_line,
+    chart_manifest,
+    chart_queue,
+    run_manifest=None,
+    model_id=None,
+    chart_workers=None,
+    fallback_agent=None,
+):
+    """
+    스크립트 문단 하나에 대응하는 차트 이미지 생성
+    - graphmark_agent가 ChartPlanner면 문단 전체를 한 번에 넘겨 라인별 차트 사양을 받고(배치 계획),
+      차트 마킹 에이전트면 문장별로 누적한 텍스트를 넘김. 문단이 끝나면 쌓인 차트를 한꺼번에 렌더링
+    - 배치 계획 응답을 끝내 해석하지 못하면 fallback_agent()가 반환하는 문장별 차트 마킹 에이전트로 이 문단만
+      다시 마킹하고, fallback_agent가 없으면 이 문단을 건너뜀 (앞 라인의 차트를 이어서 사용하고, 기록하지
+      않으므로 재실행 때 다시 시도)
+    - run_manifest에 같은 문단의 차트가 기록되어 있고 파일이 그대로 있으면 에이전트를 다시 실행하지 않음
+    - 렌더링이 끝나면 영상 파이프라인에 이 문단의 라인들의 차트가 준비되었음을 알림
+
+    Returns:
+    - 다음 문단의 첫 라인 번호
+    """
+    ex = paragraph.split('\n')
+    last_line = first_line + len([line for line in ex if line.strip()]) - 1
+    name = f"charts/{section}_{paragraph_index}"
+    batch = isinstance(graphmark_agent, ChartPlanner)
+    inputs = hash_inputs(section, first_line, paragraph, model_id, "batch" if batch else "per-line")
+    
+    if run_manifest is not None and run_manifest.is_fresh(name, inputs):
+        print(f"Reusing charts for {section} paragraph {paragraph_index + 1}")
+    else:
+        # 이전 실행에서 이 문단 라인에 남은 차트 기록은 지우고 새로 만듦
+        chart_manifest.discard_lines(first_line, last_line)
+        line_agent = None if batch else graphmark_agent
+        skipped = False
+        if batch:
+            # 문단 전체를 한 번의 호출로 계획하고, 라인별 차트 사양을 도구에 한꺼번에 넘김
+            try:
+                chart_plan = graphmark_agent.plan([line for line in ex if line.strip()])
+            except ValueError as e:
+                # 응답 하나 때문에 영상 전체가 실패하지 않도록 이 문단만 문장별 마킹으로 대체 (없으면 건너뜀)
+                print(f"Chart planning failed for {section} paragraph {paragraph_index + 1}: {str(e)}")
+                if fallback_agent is not None:
+                    print("Falling back to per-line chart marking for this paragraph")
+                    line_agent = fallback_agent()
+                else:
+                    print("Skipping this paragraph's charts (the previous chart is reused)")
+                    skipped = True
+            else:
+                for entry in chart_plan:
+                    entry["line"] += first_line
+                graphmark_agent.tool.forward_batch(chart_plan, section=section, paragraph=paragraph_index)
+        if line_agent is not None:
+            line_index = first_line
+            for j in range(1, len(ex) + 1):  # 문장별로 누적하여 차트 마킹
+                chart_manifest.set_context(section=section, paragraph=paragraph_index, line=line_index)
+                accumulated_text = '\n'.join(ex[:j])
+                line_agent(accumulated_text)
+                if ex[j - 1].strip():
+                    line_index += 1
+        results = chart_queue.flush(max_workers=chart_workers)
+        
+        # 렌더링에 실패한 차트가 있거나 건너뛴 문단이면 기록하지 않아 재실행 때 다시 만듦
+        if run_manifest is not None and not skipped and all(results):
+            run_manifest.record(name, inputs, chart_manifest.filenames_for_lines(first_line, last_line))
+    
+    chart_manifest.mark_ready(last_line, first=first_line)
+    return last_line + 1
+
+def create_section_charts(
+    create_graphmark_agent,
+    section_script,
+    section,
+    first_line,
+    chart_manifest,
+    run_manifest=None,
+    model_id=None,
+    chart_workers=None,
+    create_fallback_agent=None,
+):
+    """
+    중기 또는 단기 구간 스크립트 전체의 차트 이미지를 문단별로 생성
+    - 구간마다 자기 차트 대기열과 차트 마킹 에이전트를 만들어, 두 구간을 동시에 처리해도
+      한 구간의 렌더링이 다른 구간의 차트를 가져가지 않음
+
+    Parameters:
+    - create_graphmark_agent: create_mid/shortchart_planner(배치 계획) 또는 create_mid/shortgraphmark_agent(문장별)
+    - first_line: 구간의 첫 라인 번호 (영상 전체 기준, 빈 줄은 세지 않음)
+    - create_fallback_agent: 배치 계획이 실패한 문단을 마킹할 create_mid/shortgraphmark_agent
+      (처음 실패했을 때 한 번만 만들어 같은 차트 대기열을 사용)
+    """
+    # 차트 마킹 도구는 차트 사양만 쌓아 두고, 문단이 끝날 때마다 작업자 프로세스 풀에서 한꺼번에 렌더링
+    chart_queue = ChartQueue(manifest=chart_manifest)
+    graphmark_agent = create_graphmark_agent(model_id=model_id, chart_queue=chart_queue)
+    fallback_agents = []
+    
+    def fallback_agent():
+        if not fallback_agents:
+            fallback_agents.append(create_fallback_agent(model_id=model_id, chart_queue=chart_queue))
+        return fallback_agents[0]
+    
+    line_index = first_line
+    paragraphs = re.split(r'\n\s*\n', section_script.strip())
+    for i in range(len(paragraphs)):   # 각 문단별로 처리
+        line_index = create_paragraph_charts(
+            graphmark_agent, paragraphs[i], section, i, line_index,
+            chart_manifest, chart_queue,
+            run_manifest=run_manifest, model_id=model_id, chart_workers=chart_workers,
+            fallback_agent=fallback_agent if create_fallback_agent is not None else None,
+        )
+    chart_manifest.clear_context()
+
+def create_audio_script(subtitle_script):
+    """
+    자막 스크립트를 TTS에 적합한 발음 친화적 스크립트로 변환
+    - 차트 이미지와 무관하므로 차트 마킹과 동시에 실행할 수 있음
+    """
+    # 음성 변환에 최적화된 스크립트 생성을 위한 LLM 모델
+    audio_llm = LiteLLMModel(
+        model_id="anthropic/claude-3-7-sonnet-latest",
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        max_completion_tokens=8192*4,
+        temperature=0.001  # Slightly more creative for natural dialogue
+    )
+    
+    audio_prompt = AUDIO_PROMPT_TEMPLATE.format(subtitle_script=subtitle_script)
+       
+    messages = [
+        {"role": "user", "content": audio_prompt}
+    ]
+    response = audio_llm(messages)
+    return response.content  # ChatMessage 객체에서 content를 추출
+
+def create_investment_video(
+    audio_script,
+    subtitle_script,
+    chart_manifest=None,
+    tts_concurrency=None,
+    video_backend=None,
+    encode_workers=None,
+    run_manifest=None,
+    tts_backend=None,
+):
     """
     투자 분석 비디오 생성 함수
     - 차트 이미지와 AI 음성을 결합하여 자막이 포함된 분석 동영상 제작
@@ -275,167 +489,93 @@ def create_investment_video(audio_script, subtitle_script):
     Parameters:
     - audio_script: TTS 음성 생성용 스크립트 (발음 최적화된 텍스트)
     - subtitle_script: 자막 표시용 스크립트 (원본 텍스트)
+    - chart_manifest: 라인별 차트 이미지가 기록된 ChartManifest (기본값: 현재 실행의 기본 매니페스트)
+    - tts_concurrency: 동시에 보낼 TTS 요청 수 (기본값: TTS_MAX_CONCURRENCY 환경 변수 또는 8)
+    - video_backend: "ffmpeg"(문단 조각을 동시에 인코딩 후 이어붙임) 또는 "moviepy" (기본값: VIDEO_RENDER_BACKEND 환경 변수 또는 ffmpeg)
+    - encode_workers: 동시에 인코딩할 문단 조각 수 (기본값: VIDEO_ENCODE_WORKERS 환경 변수 또는 CPU 코어 수)
+    - run_manifest: 실행 체크포인트. 있으면 바뀌지 않은 문단 조각 영상을 재사용
+    - tts_backend: TTS 백엔드 (기본값: TTS_BACKEND 환경 변수 또는 OpenAI)
     """
     print("Starting investment video creation...")
     import os
-    import re
     
-    # Initialize OpenAI client
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    # TTS 백엔드 초기화 (기본값: OpenAI TTS)
+    if tts_backend is None:
+        tts_backend = get_tts_backend()
     
-    # 오디오 스크립트와 자막 스크립트를 라인별로 분리 처리
-    # 문자열 또는 리스트 형태 모두 지원
-    if isinstance(audio_script, str):
-        audio_lines = [line.strip() for line in audio_script.split('\n') if line.strip()]
-    else:
-        audio_lines = []
-        for item in audio_script:
-            if isinstance(item, str):
-                lines = [line.strip() for line in item.split('\n') if line.strip()]
-                audio_lines.extend(lines)
-    
-    if isinstance(subtitle_script, str):
-        subtitle_lines = [line.strip() for line in subtitle_script.split('\n') if line.strip()]
-    else:
-        subtitle_lines = []
-        for item in subtitle_script:
-            if isinstance(item, str):
-                lines = [line.strip() for line in item.split('\n') if line.strip()]
-                subtitle_lines.extend(lines)
-    
-    # Ensure both scripts have the same number of lines
-    if len(audio_lines) != len(subtitle_lines):
-        print(f"Warning: Audio script has {len(audio_lines)} lines but subtitle script has {len(subtitle_lines)} lines.")
-        # Use the minimum number of lines
-        min_lines = min(len(audio_lines), len(subtitle_lines))
-        audio_lines = audio_lines[:min_lines]
-        subtitle_lines = subtitle_lines[:min_lines]
-    
-    all_clips = []
-    subtitle_entries = []
-    subtitle_index = 1
-    current_time = 0.0
-    
-    # 각 라인별로 오디오와 자막을 동시 처리
-    for i, (audio_line, subtitle_line) in enumerate(zip(audio_lines, subtitle_lines)):
-        print(f"Processing line {i+1}/{len(audio_lines)}: {subtitle_line[:30]}...")
-        
-        # 문장부호(마침표, 쉼표) 기준으로 세그먼트 분할 - 자연스러운 음성 흐름을 위함
-        audio_segments = re.split(r'(?<=[.,])\s+', audio_line)
-        subtitle_segments = re.split(r'(?<=[.,])\s+', subtitle_line)
-        
-        # Clean empty segments
-        audio_segments = [seg.strip() for seg in audio_segments if seg.strip()]
-        subtitle_segments = [seg.strip() for seg in subtitle_segments if seg.strip()]
-        
-        # Ensure both have the same number of segments
-        if len(audio_segments) != len(subtitle_segments):
-            print(f"Warning: Line {i+1} has {len(audio_segments)} audio segments but {len(subtitle_segments)} subtitle segments.")
-            # Use the minimum number of segments
-            min_segments = min(len(audio_segments), len(subtitle_segments))
-            audio_segments = audio_segments[:min_segments]
-            subtitle_segments = subtitle_segments[:min_segments]
-        
-        if not audio_segments:  # Skip if no valid segments
-            continue
-            
-        # 각 라인에 해당하는 차트 이미지 찾기 (차트 마킹 에이전트가 생성한 이미지)
-        img_path = f"technical_analysis{i}.png"
-        if not os.path.exists(img_path):
-            print(f"경고: 이미지 {img_path}를 찾을 수 없습니다. 대체 이미지를 사용합니다.")
-            potential_images = glob.glob("technical_analysis*.png")
-            if potential_images:
-                img_path = potential_images[0]
-                print(f"대체 이미지 사용: {img_path}")
-            else:
-                raise FileNotFoundError(f"라인 {i+1}에 해당하는 기술적 분석 이미지를 찾을 수 없습니다.")
+    # 차트 마킹 단계에서 기록한 매니페스트로 라인별 차트 이미지를 찾음
+    if chart_manifest is None:
+        chart_manifest = get_chart_manifest()
+    
+    # 1) 라인별로 세그먼트와 차트 이미지를 정리하고, 합성할 음성 목록을 만듦
+    #    (문장부호 기준 분할과 음성/자막 라인 수 맞추기는 스트리밍 파이프라인과 공유)
+    line_plans = []
+    speech_segments = []
+    for plan in plan_script_lines(audio_script, subtitle_script):
+        i = plan.index
         
-        segment_clips = []
+        # 각 라인에 해당하는 차트 이미지 찾기 (차트 마킹 에이전트가 매니페스트에 기록한 이미지)
+        # 해당 라인의 차트가 없으면 직전 라인의 차트를 이어서 사용
+        img_path = chart_manifest.chart_for_line(i)
+        if img_path is None:
+            raise FileNotFoundError(f"라인 {i+1}에 해당하는 기술적 분석 이미지를 찾을 수 없습니다.")
+        print(f"라인 {i+1} 차트 이미지: {img_path}")
         
-        # 각 세그먼트 쌍(오디오-자막) 처리
-        for j, (audio_segment, subtitle_segment) in enumerate(zip(audio_segments, subtitle_segments)):
-            # OpenAI TTS API를 사용하여 음성 생성
-            audio_path = f"audio_{i}_{j}.mp3"
-            print(f"라인 {i+1}의 세그먼트 {j+1}/{len(audio_segments)} 음성 변환 중: {audio_segment}")
-            
-            response = client.audio.speech.create(
-                model="tts-1-hd",
-                voice="nova",
-                input=audio_segment
+        for j, audio_segment in enumerate(plan.audio_segments):
+            speech_segments.append(
+                SpeechSegment(
+                    text=audio_segment, path=run_path(f"audio_{i}_{j}.mp3"), voice="nova", model="tts-1-hd"
+                )
             )
-            response.stream_to_file(audio_path)
-            
-            # Load audio and get duration
-            audio_clip = AudioFileClip(audio_path)
-            audio_duration = audio_clip.duration
-            print(f"Segment audio duration: {audio_duration:.2f} seconds")
-            
-            # Create clip with image and this segment's audio
-            img_clip = ImageClip(img_path).with_duration(audio_duration)
-            video_with_audio = img_clip.with_audio(audio_clip)
-            segment_clips.append(video_with_audio)
-            
-            # Add subtitle entry using subtitle segment
-            start_time = current_time
-            end_time = current_time + audio_duration
-            
-            start_str = format_srt_time(start_time)
-            end_str = format_srt_time(end_time)
-            
-            subtitle_entries.append(f"{subtitle_index}\n{start_str} --> {end_str}\n{subtitle_segment}\n")
-            subtitle_index += 1
-            
-            current_time += audio_duration
-        
-        # Concatenate all segments from this line
-        if segment_clips:
-            line_clip = concatenate_videoclips(segment_clips)
-            all_clips.append(line_clip)
-    
-    # 모든 클립을 최종 비디오로 결합
-    print("모든 클립을 최종 비디오로 결합하는 중...")
-    if all_clips:
-        final_video = concatenate_videoclips(all_clips)
-        
-        # 임시 비디오 파일로 출력
-        temp_video_path = "temp_video.mp4"
-        print(f"임시 비디오를 {temp_video_path}에 저장 중...")
-        final_video.write_videofile(temp_video_path, fps=24)
-        
-        # Write SRT file
-        with open("subtitles.srt", "w", encoding="utf-8") as f:
-            f.write("\n".join(subtitle_entries))
-        
-        # Use FFmpeg to add subtitles to the video
-        import subprocess
-        output_path = "investment_analysis_video.mp4"
-        
+        line_plans.append((plan, img_path))
+    
+    # 2) TTS 백엔드로 모든 세그먼트 음성을 동시에 생성 (동시 요청 수 제한, 실패 시 재시도)
+    #    이전 실행에서 같은 문장을 합성했다면 음성 캐시에서 가져옴
+    synthesize_segments(
+        tts_backend,
+        speech_segments,
+        max_workers=tts_concurrency,
+        cache=get_tts_cache() if tts_backend.cacheable else None,
+    )
+    
+    # 3) 문단(중기/단기 구간의 문단)별로 타임라인을 조립 - 자막 시간은 각 세그먼트 음성 길이의 누적값
+    images = {plan.index: img_path for plan, img_path in line_plans}
+    chunks = []
+    for paragraph in group_paragraphs([plan for plan, _ in line_plans], subtitle_script):
+        chunk = []
+        for plan in paragraph:
+            for j, subtitle_segment in enumerate(plan.subtitle_segments):
+                audio_path = run_path(f"audio_{plan.index}_{j}.mp3")
+                
+                # 오디오를 디코딩하지 않고 MP3 프레임 헤더로 길이 계산
+                audio_duration = probe_duration(audio_path)
+                print(f"Segment audio duration: {audio_duration:.2f} seconds")
+                
+                # 이 세그먼트 동안 차트 이미지, 음성, 자막을 재생
+                chunk.append(
+                    TimelineEntry(
+                        image_path=images[plan.index],
+                        audio_path=audio_path,
+                        duration=audio_duration,
+                        subtitle=subtitle_segment,
+                    )
+                )
+        chunks.append(chunk)
+    
+    # 4) 문단 조각을 동시에 인코딩한 뒤 다시 인코딩하지 않고 이어붙여 최종 비디오 생성
+    print("모든 세그먼트를 최종 비디오로 결합하는 중...")
+    if any(chunks):
+        output_path = run_path("investment_analysis_video.mp4")
         try:
-            print("FFmpeg로 자막 추가 중...")
-            # FFmpeg를 사용하여 자막을 비디오에 하드코딩 (한글 지원, 스타일 적용)
-            subprocess.run([
-                "ffmpeg", "-y",
-                "-i", temp_video_path,
-                "-vf", "subtitles=subtitles.srt:force_style='FontSize=18,BorderStyle=0,Outline=0.2,PrimaryColour=ffffff,MarginV=10'",
-                "-c:a", "copy",
-                output_path
-            ], check=True)
-            print("자막이 성공적으로 추가되었습니다!")
-        except Exception as e:
-            print(f"자막 추가 중 오류 발생: {e}")
-            print("자막 없는 비디오로 대체합니다...")
-            import shutil
-            shutil.copy(temp_video_path, output_path)
-        
-        # Clean up temporary files
-        os.remove(temp_video_path)
-        if os.path.exists("subtitles.srt"):
-            os.remove("subtitles.srt")
-        for i in range(len(audio_lines)):
-            for j in range(10):  # Assuming max 10 segments per line
-                audio_path = f"audio_{i}_{j}.mp3"
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
+            render_video(
+                chunks, output_path, backend=video_backend, max_workers=encode_workers, run_manifest=run_manifest
+            )
+        finally:
+            # Clean up temporary files
+            for chunk in chunks:
+                for entry in chunk:
+                    if os.path.exists(entry.audio_path):
+                        os.remove(entry.audio_path)
         
         print(f"Video creation complete! Output: {output_path}")
         return output_path
@@ -443,27 +583,19 @@ def create_investment_video(audio_script, subtitle_script):
         print("Error: No clips were created. Check your input scripts.")
         return None
 
-# Keep the existing format_srt_time function unchanged
-def format_srt_time(seconds):
-    """Convert seconds to SRT format time (HH:MM:SS,mmm)"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millisecs = int((seconds - int(seconds)) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
-
 def cleanup_analysis_files():
     """
     비디오 생성 과정에서 생성된 임시 분석 파일들(PNG, JSON)을 정리하는 함수
-    - 차트 이미지와 분석 데이터 파일들을 삭제하여 디스크 공간 확보
+    - 현재 실행의 작업 디렉토리에서 차트 이미지, 차트 매니페스트와 분석 데이터 파일들을 삭제하여 디스크 공간 확보
+      (다른 실행의 파일은 건드리지 않음)
     """
     print("임시 분석 파일들을 정리하는 중...")
     
     # analysis가 포함된 PNG 파일들 찾기
-    png_files = glob.glob("*analysis*.png")
+    png_files = glob.glob(run_path("*analysis*.png"))
     
-    # analysis가 포함된 JSON 파일들 찾기  
-    json_files = glob.glob("*analysis*.json")
+    # analysis가 포함된 JSON 파일들과 차트 매니페스트 찾기
+    json_files = glob.glob(run_path("*analysis*.json")) + glob.glob(run_path("chart_manifest.jsonl"))
     
     deleted_files = []
     
@@ -496,110 +628,204 @@ def cleanup_analysis_files():
 
 ################################################### 메인 실행 함수 ###################################################
 
-def main():
-    """주식 분석 비디오 생성 메인 프로세스
+def create_video_run(args, context):
+    """주식 분석 비디오 생성 과정 (모든 결과물은 context의 작업 디렉토리에 저장)
     1. 주식 분석 수행 (단기/중기)
     2. 분석 결과를 비디오 스크립트로 변환
-    3. 차트 이미지 생성
+    3. 차트 이미지 생성 (ffmpeg 방식이면 음성 스크립트 생성, 음성 합성, 문단별 인코딩과 동시에 진행)
     4. 음성 합성 및 비디오 제작
     """
-    args = parse_args()
+    # 실행 체크포인트 - 같은 --run-id로 다시 실행하면 완료된 단계의 결과물을 재사용하고 없거나 바뀐 것만 다시 만듦
+    run = context.manifest
     
-    # 1단계: 주식 분석 수행 - 단기/중기 분석을 총괄하는 관리자 에이전트 생성
-    agent = create_agent(model_id=args.model_id)
-    answer = agent.run(args.question)
-    print(f"분석 결과: {answer}")
+    # 단계 그래프 - 각 단계가 입력(앞 단계), 설정값, 출력 파일을 선언하고 서로 의존하지 않는 단계는 동시에 실행
+    # (실행 디렉토리에 캐시되어, 같은 --run-id로 다시 실행하면 완료된 단계를 재사용)
+    stages = Pipeline(cache_dir=run.path("stages"), max_workers=args.agent_workers)
     
-    # 분석 결과를 텍스트 파일로 저장
-    with open("investment_report.txt", "w", encoding="utf-8") as f:
-        f.write(answer)
+    # 1단계: 주식 분석 수행 - 단기/중기 분석을 총괄하는 관리자 에이전트 생성
+    def write_investment_report():
+        answer = str(create_agent(model_id=args.model_id).run(args.question))
+        print(f"분석 결과: {answer}")
+        
+        # 분석 결과를 텍스트 파일로 저장
+        with open(context.path("investment_report.txt"), "w", encoding="utf-8") as f:
+            f.write(answer)
+        return answer
+    
+    stages.add(
+        "investment_report", write_investment_report,
+        params=[args.question, args.model_id], outputs=["investment_report.txt"],
+    )
     
     ########################################### 2단계: 스크립트 변환 ##############################################
     
-    output_content = answer  
-    
-    # 중기 분석 리포트를 비디오 스크립트로 변환
-    midprompt_agent = create_midprompt_agent(model_id=args.model_id)
-    midterm_script = midprompt_agent.run(output_content)
-    
-    # 단기 분석 리포트를 비디오 스크립트로 변환
-    shortprompt_agent = create_shortprompt_agent(model_id=args.model_id)
-    shortterm_script = shortprompt_agent.run(output_content)
+    # 중기/단기 분석 리포트를 각각 비디오 스크립트로 변환 (서로 독립적이므로 동시에 실행됨)
+    stages.add(
+        "midterm_script",
+        lambda report: str(create_midprompt_agent(model_id=args.model_id).run(report)),
+        deps=["investment_report"], params=[args.model_id],
+    )
+    stages.add(
+        "shortterm_script",
+        lambda report: str(create_shortprompt_agent(model_id=args.model_id).run(report)),
+        deps=["investment_report"], params=[args.model_id],
+    )
     
     ########################################### 3단계: 최종 스크립트 다듬기 ############################################
     
-    # 자연스러운 음성 변환을 위한 최종 스크립트 에이전트
-    final_prompt_agent = create_final_prompt_agent(model_id=args.model_id)
-    
-    # 중기 스크립트를 문단별로 분할하여 각각 다듬기
-    midterm_paragraph = re.split(r'\n\s*\n', midterm_script.strip())
-    mid_final_script = ""
+    # 중기/단기 스크립트를 문단별로 분할하여 각각 다듬기 (문단별로 체크포인트)
+    # 문단끼리는 독립적이므로 동시에 실행하고, 문단마다 최종 스크립트 에이전트를 따로 만들어 메모리를 공유하지 않음
+    def refine_paragraph(name, paragraph):
+        return lambda: run.text(
+            name,
+            (paragraph, args.model_id),
+            lambda: create_final_prompt_agent(model_id=args.model_id).run(paragraph),
+        )
+    
+    def refine_script(script, section):
+        paragraphs = re.split(r'\n\s*\n', script.strip())
+        final_paragraphs = run_parallel(
+            [refine_paragraph(f"final/{section}_{i}", paragraph) for i, paragraph in enumerate(paragraphs)],
+            max_workers=args.agent_workers,
+            label=f"{section} final script paragraphs",
+        )
+        # 결과는 입력 순서대로이므로 순차 실행과 같은 스크립트가 만들어짐
+        return "".join(text + "\n\n" for text in final_paragraphs)
+    
+    # 문단별 체크포인트가 있으므로 단계 캐시는 쓰지 않음 (뒤 단계는 다듬은 스크립트 내용으로 재사용 여부 결정)
+    stages.add("mid_final_script", lambda script: refine_script(script, "mid"), deps=["midterm_script"], cache=False)
+    stages.add(
+        "short_final_script", lambda script: refine_script(script, "short"), deps=["shortterm_script"], cache=False
+    )
     
-    for i in range(len(midterm_paragraph)):    
-        mid_final_script += final_prompt_agent.run(midterm_paragraph[i]) + "\n\n"
-        
-    # 단기 스크립트를 문단별로 분할하여 각각 다듬기
-    shortterm_paragraph = re.split(r'\n\s*\n', shortterm_script.strip())
-    short_final_script = ""
+    # 중기 + 단기 스크립트를 하나로 합친 자막용 스크립트로 음성용 스크립트 생성 (차트 마킹과 동시에 실행됨)
+    stages.add(
+        "audio_script",
+        lambda mid_final_script, short_final_script: create_audio_script(mid_final_script + short_final_script),
+        deps=["mid_final_script", "short_final_script"],
+    )
     
-    for i in range(len(shortterm_paragraph)):    
-        short_final_script += final_prompt_agent.run(shortterm_paragraph[i]) + "\n\n"
-
+    # 이번 실행의 차트 매니페스트 - 차트 번호를 할당하고 각 차트가 어느 라인용인지 기록
+    # (실행 디렉토리에 저장되어, 재실행하면 이미 만든 문단의 차트 기록을 이어서 사용)
+    chart_manifest = ChartManifest(path=run.path("chart_manifest.jsonl"))
     
     ###############################################  4단계: 차트 이미지 생성  ###################################
-    # 스크립트 내용에 맞는 기술적 분석 차트 이미지들을 생성
-    
-    mid_graphmark_agent = create_midgraphmark_agent(model_id=args.model_id)
-    short_graphmark_agent = create_shortgraphmark_agent(model_id=args.model_id)
-    
-    # 중기 분석 스크립트에 대응하는 차트 이미지 생성
-    midterm_paragraph = re.split(r'\n\s*\n', mid_final_script.strip())
-    
-    for i in range(len(midterm_paragraph)):   # 각 문단별로 처리
-        ex = midterm_paragraph[i].split('\n')
-        for j in range(1, len(ex) + 1):  # 문장별로 누적하여 차트 마킹
-            accumulated_text = '\n'.join(ex[:j])
-            answer = mid_graphmark_agent(accumulated_text)
+    # 스크립트 내용에 맞는 기술적 분석 차트 이미지들을 중기/단기 구간별로 동시에 생성
+    # (각 구간은 자기 에이전트와 차트 대기열을 사용하고, 차트는 라인 번호로 매니페스트에 기록됨)
+    
+    # 배치 계획이면 문단마다 LLM 호출 한 번, 문장별이면 문장마다 차트 마킹 에이전트 실행
+    # (배치 계획 응답을 해석하지 못한 문단은 문장별 차트 마킹 에이전트로 대체)
+    create_mid_line_marker, create_short_line_marker = create_midgraphmark_agent, create_shortgraphmark_agent
+    if args.chart_planning == "batch":
+        create_mid_marker, create_short_marker = create_midchart_planner, create_shortchart_planner
+    else:
+        create_mid_marker, create_short_marker = create_mid_line_marker, create_short_line_marker
     
-    # 단기 분석 스크립트에 대응하는 차트 이미지 생성
-    shortterm_paragraph = re.split(r'\n\s*\n', short_final_script.strip())
+    def mark_section_charts(create_marker, create_line_marker, section_script, section, first_line):
+        try:
+            create_section_charts(
+                create_marker, section_script, section, first_line, chart_manifest,
+                run_manifest=run, model_id=args.model_id, chart_workers=args.chart_workers,
+                create_fallback_agent=create_line_marker if create_marker is not create_line_marker else None,
+            )
+        except Exception:
+            # 차트 마킹이 중간에 실패해도 영상 파이프라인이 무한히 기다리지 않도록 모든 라인을 준비 완료로 표시
+            chart_manifest.clear_context()
+            chart_manifest.mark_ready()
+            raise
+        return first_line
+    
+    # 영상 전체 기준 라인 번호 (create_investment_video의 라인 순서와 같이 빈 줄은 세지 않음)
+    # 단기 구간은 중기 구간의 라인 다음부터 시작하므로, 중기 스크립트로 계산해 두 구간을 동시에 마킹
+    # (차트는 문단별로 체크포인트되므로 단계 캐시는 쓰지 않음)
+    stages.add(
+        "mid_charts",
+        lambda mid_final_script: mark_section_charts(
+            create_mid_marker, create_mid_line_marker, mid_final_script, "mid", 0
+        ),
+        deps=["mid_final_script"], cache=False,
+    )
+    stages.add(
+        "short_charts",
+        lambda mid_final_script, short_final_script: mark_section_charts(
+            create_short_marker, create_short_line_marker, short_final_script, "short",
+            len([line for line in mid_final_script.split('\n') if line.strip()]),
+        ),
+        deps=["mid_final_script", "short_final_script"], cache=False,
+    )
     
-    for i in range(len(shortterm_paragraph)):   # 각 문단별로 처리
-        ex = shortterm_paragraph[i].split('\n')
-        for j in range(1, len(ex) + 1):  # 문장별로 누적하여 차트 마킹
-            accumulated_text2 = '\n'.join(ex[:j])
-            answer = short_graphmark_agent(accumulated_text2)
+    ###############################################  5단계: 음성 합성 및 최종 비디오 생성  ###################################
+    
+    # ffmpeg 방식이면 음성용 스크립트가 나오는 대로 음성 합성, 문단별 인코딩을 차트 마킹과 동시에 진행
+    # (차트 마킹이 끝난 문단부터 영상 조각으로 인코딩하고, 마지막에 조각들을 이어붙임)
+    streaming = (args.video_backend or DEFAULT_BACKEND) == "ffmpeg"
+    if streaming:
+        def start_video_stream(audio_script, mid_final_script, short_final_script):
+            pipeline = StreamingVideoPipeline(
+                get_tts_backend(args.tts_backend),
+                chart_manifest,
+                tts_concurrency=args.tts_concurrency,
+                encode_workers=args.encode_workers,
+                run_manifest=run,
+            )
+            pipeline.start(lambda: (audio_script, mid_final_script + short_final_script))
+            return pipeline
         
-    ###############################################  5단계: 음성용 스크립트 생성  ###################################
-    
-    # 중기 + 단기 스크립트를 하나로 합쳐서 자막용 스크립트 생성
-    subtitle_script = mid_final_script + short_final_script
+        def finish_video(pipeline, mid_charts, short_charts):
+            # 차트 마킹이 모두 끝났으므로 모든 라인을 준비 완료로 표시하고,
+            # 남은 문단의 음성 합성/인코딩을 마친 뒤 조각 영상을 이어붙임
+            chart_manifest.mark_ready()
+            return pipeline.finish(context.path("investment_analysis_video.mp4"))
+        
+        stages.add(
+            "video_stream", start_video_stream,
+            deps=["audio_script", "mid_final_script", "short_final_script"], cache=False,
+        )
+        stages.add("video", finish_video, deps=["video_stream", "mid_charts", "short_charts"], cache=False)
+    else:
+        def create_video(audio_script, mid_final_script, short_final_script, mid_charts, short_charts):
+            chart_manifest.mark_ready()
+            # 음성, 차트 이미지, 자막을 결합하여 최종 투자 분석 동영상 생성
+            return create_investment_video(
+                audio_script,
+                mid_final_script + short_final_script,
+                chart_manifest=chart_manifest,
+                tts_concurrency=args.tts_concurrency,
+                video_backend=args.video_backend,
+                encode_workers=args.encode_workers,
+                run_manifest=run,
+                tts_backend=get_tts_backend(args.tts_backend),
+            )
+        
+        stages.add(
+            "video", create_video,
+            deps=["audio_script", "mid_final_script", "short_final_script", "mid_charts", "short_charts"],
+            cache=False,
+        )
     
-    # 음성 변환에 최적화된 스크립트 생성을 위한 LLM 모델
-    audio_llm = LiteLLMModel(
-        model_id="anthropic/claude-3-7-sonnet-latest",
-        api_key=os.getenv("ANTHROPIC_API_KEY"),
-        max_completion_tokens=8192*4,
-        temperature=0.001  # Slightly more creative for natural dialogue
-    )
+    video_path = stages.get("video")
+    print(f"투자 분석 비디오가 생성되었습니다: {video_path}")
     
-    # 자막 스크립트를 TTS에 적합한 발음 친화적 스크립트로 변환
-    audio_prompt = AUDIO_PROMPT_TEMPLATE.format(subtitle_script=subtitle_script)
-       
-    messages = [
-        {"role": "user", "content": audio_prompt}
-    ]
-    response = audio_llm(messages)
-    audio_script = response.content  # ChatMessage 객체에서 content를 추출
+    # 단계별 실행 시간 (계산 또는 캐시 재사용)
+    stages.report()
     
-    ################################################################# 6단계: 최종 비디오 생성 ####################################################################################
+    # 차트 이미지와 차트 매니페스트는 문단별 체크포인트의 결과물이므로, 지우면 같은 --run-id로 재실행할 때
+    # 모든 문단의 차트를 다시 만들어야 함. 그래서 --cleanup을 지정했을 때만 정리 (디스크 공간 확보)
+    if args.cleanup:
+        cleanup_analysis_files()
+    return video_path
 
-    # 음성, 차트 이미지, 자막을 결합하여 최종 투자 분석 동영상 생성
-    video_path = create_investment_video(audio_script, subtitle_script)
-    print(f"투자 분석 비디오가 생성되었습니다: {video_path}")
+def main():
+    """주식 분석 비디오 생성 메인 프로세스
+    - 실행마다 runs/{실행 ID}/ 작업 디렉토리를 만들어, 도구/차트/음성/영상 파일을 그 안에 저장
+      (한 호스트에서 여러 종목의 영상을 동시에 만들어도 파일이 섞이지 않음)
+    """
+    args = parse_args()
     
-    # 비디오 생성 완료 후 임시 파일들 정리 (디스크 공간 확보)
-    cleanup_analysis_files()
+    context = RunContext(args.run_id)
+    print(f"Run ID: {context.run_id} (재실행: --run-id {context.run_id}, 작업 디렉토리: {context.dir})")
+    with use_run_context(context):
+        create_video_run(args, context)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
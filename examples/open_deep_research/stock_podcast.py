@@ -31,8 +31,10 @@ from scripts.stock_data_image_tool import StockDataImageTool  # 주식 데이터
 from scripts.sentiment_tool import SentimentTool  # 감정 분석 도구
 
 from pathlib import Path
-from openai import OpenAI
-from pydub import AudioSegment  # Added import for audio processing
+from scripts.pipeline import Pipeline  # 단계 그래프 실행 (지연 평가 + 병렬 실행 + 캐시)
+from scripts.run_context import RunContext, run_path, use_run_context  # 실행별 작업 디렉토리
+from scripts.audio_concat import concat_audio  # 대사 음성 이어붙이기 (ffmpeg concat, 인코딩 1회)
+from scripts.tts import SpeechSegment, get_tts_backend, get_tts_cache, synthesize_segments  # TTS 합성 + 음성 캐시
 from prompts.podcast_prompts import *
 
 load_dotenv(override=True)
@@ -42,7 +44,7 @@ def parse_args():
     """명령행 인자를 파싱하는 함수
     
     Returns:
-        argparse.Namespace: 파싱된 인자들 (질문, 모델ID, 팟캐스트 길이)
+        argparse.Namespace: 파싱된 인자들 (질문, 모델ID, 팟캐스트 길이, TTS 동시 요청 수, TTS 백엔드)
     """
     parser = argparse.ArgumentParser()
     # 분석할 주식 관련 질문 (필수 인자)
@@ -57,6 +59,16 @@ def parse_args():
         "--podcast-length", type=int, choices=[1, 2], default=1,
         help="팟캐스트 길이 선택: 1 = 3분 팟캐스트, 2 = 10분 팟캐스트"
     )
+    # 동시에 보낼 TTS 요청 수
+    parser.add_argument(
+        "--tts-concurrency", type=int, default=None,
+        help="동시에 보낼 TTS 요청 수 (기본값: TTS_MAX_CONCURRENCY 환경 변수 또는 8)"
+    )
+    # TTS 백엔드 선택 (local은 API 호출 없이 길이만 맞춘 음성을 생성)
+    parser.add_argument(
+        "--tts-backend", type=str, choices=["openai", "local"], default=None,
+        help="TTS 백엔드 (기본값: TTS_BACKEND 환경 변수 또는 openai)"
+    )
     return parser.parse_args()
 
 custom_role_conversions = {"tool-call": "assistant", "tool-response": "user"}
@@ -294,157 +306,185 @@ def create_podcast_agent(model_id="claude-3-7-sonnet-latest"):
 
     return script_generate_agent
 
-def main():
-    """메인 실행 함수 - 주식 분석부터 팟캐스트 생성까지 전체 파이프라인 실행
-    
-    전체 프로세스:
-    1. 멀티 에이전트로 주식 분석 리포트 생성
-    2. 리포트를 바탕으로 팟캐스트 대본 1차 생성
-    3. 대본을 10분 버전으로 개선 (2차)
-    4. 대본을 3분 버전으로 축약 (3차)
-    5. 사용자 선택에 따라 오디오 생성
-    6. 임시 파일들 정리
-    """
-    # 명령행 인자 파싱
-    args = parse_args()
-    
-    # === 1단계: 주식 분석 리포트 생성 ===
-    print(" 주식 분석을 시작합니다...")
-    agent = create_agent(model_id=args.model_id)
-    answer = agent.run(args.question)
-    print(f"Got this answer: {answer}")
-    
-    # 분석 결과를 파일로 저장 
-    with open("investment_report.txt", "w", encoding="utf-8") as f:
-        f.write(answer)
-    
-    # === 2단계: 1차 팟캐스트 대본 생성 ===
-    print("팟캐스트 대본 생성을 시작합니다")
-    
-    # 팟캐스트 에이전트로 1차 대본 생성 
-    podcast_agent = create_podcast_agent(model_id=args.model_id)
-    podcastscript_ver1 = podcast_agent.run(answer)
-    
-    print("1차 팟캐스트 대본 생성 완료")
-    
-    # === 3단계: 2차 팟캐스트 대본 생성 (10분 버전) ===
-    print("10분 팟캐스트 대본으로 개선 중")
-    
-    # 2차 개선용 LLM 모델 설정 
-    podcast_llm = LiteLLMModel(
-        model_id="anthropic/claude-3-7-sonnet-latest",
+# 대본 개선/축약에 사용하는 LLM
+PODCAST_LLM_ID = "anthropic/claude-3-7-sonnet-latest"
+
+def create_podcast_llm():
+    """대본 개선/축약용 LLM 모델 설정"""
+    return LiteLLMModel(
+        model_id=PODCAST_LLM_ID,
         api_key=os.getenv("ANTHROPIC_API_KEY"),
         max_completion_tokens=8192*4,
-        temperature=0.3  
+        temperature=0.3  # 자연스러운 대화 유지
     )
+
+def enhance_podcast_script(podcastscript_ver1):
+    """1차 대본을 10분 팟캐스트 대본(2차)으로 개선"""
+    print("10분 팟캐스트 대본으로 개선 중")
     
     # 10분 팟캐스트로 개선하는 프롬프트 생성
     podcast_prompt = PODCAST_ENHANCEMENT_PROMPT.format(podcastscript_ver1=podcastscript_ver1)
-       
     messages = [
         {"role": "user", "content": podcast_prompt}
     ]
-    response = podcast_llm(messages)
-    podcastscript_ver2 = response.content  # ChatMessage 객체에서 content 추출
+    response = create_podcast_llm()(messages)
     
     print("10분 팟캐스트 대본 생성 완료")
+    return response.content  # ChatMessage 객체에서 content 추출
 
-    # === 4단계: 3차 팟캐스트 대본 생성 (3분 버전) ===
+def condense_podcast_script(podcastscript_ver2):
+    """10분 대본을 3분 팟캐스트 대본(3차)으로 축약"""
     print("3분 팟캐스트 대본으로 축약 중")
-
-    # 3차 축약용 LLM 모델 설정
-    podcast_3m_llm = LiteLLMModel(
-        model_id="anthropic/claude-3-7-sonnet-latest",
-        api_key=os.getenv("ANTHROPIC_API_KEY"),
-        max_completion_tokens=8192*4,
-        temperature=0.3  # 자연스러운 대화 유지
-    )
     
     # 3분 팟캐스트로 축약하는 프롬프트 생성
     podcast_3m_prompt = PODCAST_CONDENSATION_PROMPT.format(podcastscript_ver2=podcastscript_ver2)
-       
     messages = [
         {"role": "user", "content": podcast_3m_prompt}
     ]
-    response = podcast_3m_llm(messages)
-    podcastscript_ver3 = response.content  # ChatMessage 객체에서 content 추출
+    response = create_podcast_llm()(messages)
     
     print("3분 팟캐스트 대본 생성 완료")
+    return response.content
 
-    # === 5단계: 팟캐스트 오디오 생성 ===
-    print("팟캐스트 오디오 생성을 시작합니다...")
-
-    # OpenAI TTS API 클라이언트 초기화
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
-    # 사용자 선택에 따라 사용할 대본 결정 (변수에서 직접 선택)
-    if args.podcast_length == 2:  # 10분 팟캐스트 선택
-        podcastscript = podcastscript_ver2
-        print("10분 팟캐스트 오디오를 생성합니다.")
-    else:  # 3분 팟캐스트 (기본값)
-        podcastscript = podcastscript_ver3
-        print("3분 팟캐스트 오디오를 생성합니다.")
+def create_investment_report(question, model_id="claude-3-7-sonnet-latest"):
+    """멀티 에이전트로 주식 분석 리포트를 생성하고 실행 작업 디렉토리의 investment_report.txt에 저장"""
+    print(" 주식 분석을 시작합니다...")
+    agent = create_agent(model_id=model_id)
+    answer = str(agent.run(question))
+    print(f"Got this answer: {answer}")
     
+    # 분석 결과를 파일로 저장 
+    with open(run_path("investment_report.txt"), "w", encoding="utf-8") as f:
+        f.write(answer)
+    return answer
+
+# 두 진행자의 음성 설정 (OpenAI TTS 음성)
+PODCAST_VOICES = ["nova", "onyx"]  # nova: 여성 목소리, onyx: 남성 목소리
+
+def create_podcast_audio(podcastscript, tts_backend, tts_concurrency=None, output_name="podcast_final.mp3"):
+    """
+    대본을 대사별로 음성 합성하고 대화 순서대로 이어붙여 실행 작업 디렉토리에 팟캐스트 오디오 생성
+    - 반환값은 작업 디렉토리 기준 이름 (캐시된 값을 다른 실행에서 재사용해도 그 실행의 파일을 가리킴)
+    """
+    output_path = run_path(output_name)
     # 대본을 대사별로 분리 (빈 줄 두 개를 기준으로 분리)
     scripts = [line for line in podcastscript.split('\n\n') if line.strip()]
     
-    # 두 진행자의 음성 설정 (OpenAI TTS 음성)
-    voices = ["nova", "onyx"]  # nova: 여성 목소리, onyx: 남성 목소리
-    
-    # 임시 오디오 파일들을 저장할 리스트
-    temp_files = []
-    
-    # 각 대사별로 음성 생성 및 TTS 변환
+    # 대사별 음성 조각 목록 (대화 순서)
+    speech_segments = []
     for i, script in enumerate(scripts):
-        # 빈 대사는 건너뛰기
-        if not script.strip():
-            continue
-            
         # 진행자 번호에 따라 음성 선택
         # 짝수 인덱스 = 첫번째 진행자(nova), 홀수 인덱스 = 두번째 진행자(onyx)
-        voice = voices[i % 2]
-        
-        # 임시 오디오 파일 경로 생성
-        temp_path = f"temp_speech_{i}.mp3"
-        temp_files.append(temp_path)
-        
-        print(f"🎤 대사 {i+1}/{len(scripts)} 음성 생성 중... ({voice} 목소리)")
-        
-        # OpenAI TTS로 음성 생성
-        response = client.audio.speech.create(
-            model="tts-1",  # OpenAI TTS 모델
-            voice=voice,     # 선택된 목소리
-            input=script     # 변환할 텍스트
+        speech_segments.append(
+            SpeechSegment(
+                text=script, path=run_path(f"temp_speech_{i}.mp3"), voice=PODCAST_VOICES[i % 2], model="tts-1"
+            )
         )
-        
-        # 임시 파일로 저장
-        response.stream_to_file(temp_path)
     
-    # 모든 오디오 파일을 순차적으로 합치기
-    print("오디오 파일들을 합치는 중...")
-    combined = AudioSegment.empty() 
-    
-    for temp_file in temp_files:
-        audio_segment = AudioSegment.from_mp3(temp_file)  # MP3 파일 로드
-        combined += audio_segment  # 기존 오디오에 이어붙이기
+    # 모든 대사를 동시에 음성으로 변환 (동시 요청 수 제한, 일시적인 오류는 재시도)
+    # 결과는 대화 순서대로 반환되며, 같은 대사가 캐시에 있으면 API 호출 생략
+    print(f"🎤 대사 {len(speech_segments)}개 음성 생성 중...")
+    temp_files = synthesize_segments(
+        tts_backend,
+        speech_segments,
+        max_workers=tts_concurrency,
+        cache=get_tts_cache() if tts_backend.cacheable else None,  # 영상 파이프라인과 공유하는 음성 캐시
+    )
     
-    # 최종 팟캐스트 오디오 파일로 내보내기
-    output_path = "podcast_final.mp3"
-    combined.export(output_path, format="mp3")
+    try:
+        # 모든 오디오 파일을 대화 순서대로 이어붙여 한 번만 인코딩
+        # (ffmpeg가 파일을 차례로 읽으므로 메모리에 전체를 올리지 않음)
+        print("오디오 파일들을 합치는 중...")
+        concat_audio(temp_files, output_path)
+    finally:
+        # 임시 음성 파일 정리
+        for temp_file in temp_files:
+            try:
+                os.remove(temp_file)
+                print(f"✅ 임시 오디오 파일 {temp_file} 삭제 완료")
+            except FileNotFoundError:
+                pass  
     
     print(f"✅ 팟캐스트 오디오 파일이 {output_path}에 저장되었습니다!")
+    return output_name
+
+def create_podcast_pipeline(question, model_id="claude-3-7-sonnet-latest", tts_backend=None, tts_concurrency=None):
+    """
+    리포트 -> 1차 대본 -> 10분 대본 -> 3분 대본 -> 오디오 단계를 노드로 등록한 파이프라인 생성
+    - get("podcast_audio_ver2")는 10분, get("podcast_audio_ver3")는 3분 팟캐스트와 그 앞 단계만 생성
+    - 리포트는 매번 새로 분석하고(캐시하지 않음), 그 뒤 단계는 리포트 내용과 모델 ID, 프롬프트가 같으면
+      실행 간에 재사용 (오디오 파일도 캐시에서 되돌림)
+    """
+    pipeline = Pipeline()
+    pipeline.add(
+        "report",
+        lambda: create_investment_report(question, model_id=model_id),
+        outputs=["investment_report.txt"],
+        cache=False,
+    )
+    pipeline.add(
+        "podcastscript_ver1",
+        lambda report: str(create_podcast_agent(model_id=model_id).run(report)),
+        deps=["report"],
+        params=[model_id, SCRIPT_GENERATE_AGENT_SYSTEM_PROMPT_ADDITION],
+    )
+    pipeline.add(
+        "podcastscript_ver2",
+        enhance_podcast_script,
+        deps=["podcastscript_ver1"],
+        params=[PODCAST_LLM_ID, PODCAST_ENHANCEMENT_PROMPT],
+    )
+    pipeline.add(
+        "podcastscript_ver3",
+        condense_podcast_script,
+        deps=["podcastscript_ver2"],
+        params=[PODCAST_LLM_ID, PODCAST_CONDENSATION_PROMPT],
+    )
+    # 10분(2차)/3분(3차) 대본별 오디오 - TTS 백엔드와 음성 설정이 같으면 같은 대본의 오디오를 재사용
+    for version in ("ver2", "ver3"):
+        pipeline.add(
+            f"podcast_audio_{version}",
+            lambda podcastscript: create_podcast_audio(podcastscript, tts_backend, tts_concurrency),
+            deps=[f"podcastscript_{version}"],
+            params=[tts_backend.name, PODCAST_VOICES, "tts-1"],
+            outputs=["podcast_final.mp3"],
+        )
+    return pipeline
+
+def create_podcast_run(args):
+    """현재 실행의 작업 디렉토리에서 주식 분석부터 팟캐스트 생성까지 전체 파이프라인 실행
+    
+    전체 프로세스 (각 단계는 파이프라인 노드로, 선택한 길이에 필요한 단계만 실행):
+    1. 멀티 에이전트로 주식 분석 리포트 생성
+    2. 리포트를 바탕으로 팟캐스트 대본 1차 생성
+    3. 대본을 10분 버전으로 개선 (2차)
+    4. 대본을 3분 버전으로 축약 (3차, 3분 팟캐스트를 선택한 경우에만)
+    5. 사용자 선택에 따라 오디오 생성
+    6. 임시 파일들 정리
+    """
+    # TTS 백엔드 초기화 (기본값: OpenAI TTS API)
+    tts_backend = get_tts_backend(args.tts_backend)
+    
+    # === 1~5단계: 리포트 -> 대본 -> 오디오 ===
+    # 단계별 입력/설정값/출력 파일을 선언한 파이프라인에서 선택한 길이의 오디오와 그 앞 단계만 실행
+    # (같은 리포트로 만든 대본과 오디오는 캐시에서 재사용)
+    pipeline = create_podcast_pipeline(
+        args.question, model_id=args.model_id, tts_backend=tts_backend, tts_concurrency=args.tts_concurrency
+    )
+    if args.podcast_length == 2:  # 10분 팟캐스트 선택
+        print("10분 팟캐스트 오디오를 생성합니다.")
+        output_path = run_path(pipeline.get("podcast_audio_ver2"))
+    else:  # 3분 팟캐스트 (기본값)
+        print("3분 팟캐스트 오디오를 생성합니다.")
+        output_path = run_path(pipeline.get("podcast_audio_ver3"))
+    
+    # 단계별 실행 시간 (계산 또는 캐시 재사용)
+    pipeline.report()
     
     # === 6단계: 임시 파일 정리 ===
     print("🧹 임시 파일들을 정리하는 중...")
     
-    for temp_file in temp_files:
-        try:
-            os.remove(temp_file)
-            print(f"✅ 임시 오디오 파일 {temp_file} 삭제 완료")
-        except FileNotFoundError:
-            pass  
-    
-    analysis_files = glob.glob("*analysis.png")
+    analysis_files = glob.glob(run_path("*analysis.png"))
     for analysis_file in analysis_files:
         try:
             os.remove(analysis_file)
@@ -452,7 +492,19 @@ def main():
         except FileNotFoundError:
             pass  
     
-    print("모든 작업이 완료되었습니다")
+    print(f"모든 작업이 완료되었습니다: {output_path}")
+
+def main():
+    """메인 실행 함수 - 실행별 작업 디렉토리를 만들고 그 안에서 팟캐스트 생성"""
+    # 명령행 인자 파싱
+    args = parse_args()
+    
+    # 실행별 작업 디렉토리 - 리포트, 도구가 만드는 분석 파일, 음성 파일과 최종 오디오를 그 안에 저장
+    # (한 호스트에서 여러 팟캐스트를 동시에 만들어도 파일이 섞이지 않음)
+    context = RunContext()
+    print(f"작업 디렉토리: {context.dir}")
+    with use_run_context(context):
+        create_podcast_run(args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file